@@ -328,6 +328,10 @@ class MetadataManager:
             logger.error("元数据管理器初始化失败", error=str(e))
             return False
     
+    async def close(self):
+        """关闭本地语义存储（写回缓冲并合并索引日志）"""
+        await self.local_storage.close()
+    
     async def _create_indexes_for_instance(self, instance_name: str):
         """为指定实例创建必要的索引"""
         try:
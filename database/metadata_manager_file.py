@@ -67,6 +67,11 @@ class FileBasedMetadataManager:
             logger.error("元数据管理器初始化失败", error=str(e))
             return False
     
+    async def close(self):
+        """关闭文件元数据存储与本地语义存储（写回缓冲并合并索引日志）"""
+        await self.file_metadata_manager.close()
+        await self.local_storage.close()
+    
     def _should_perform_full_scan(self, instance_name: str) -> bool:
         """判断是否应该执行全量扫描"""
         last_scan = self.last_scan_time.get(instance_name)
@@ -354,6 +354,17 @@ class QueryNestMCPServer:
         try:
             logger.info("Starting resource cleanup")
             
+            # 关闭持有本地语义存储的组件，写回缓冲并合并索引日志
+            unified_semantic = self.tools.get("unified_semantic_operations")
+            for component in (unified_semantic, self.semantic_analyzer, self.metadata_manager):
+                if component is None:
+                    continue
+                try:
+                    await component.close()
+                except Exception as e:
+                    logger.error("关闭语义存储失败", component=type(component).__name__, error=str(e))
+            logger.info("Semantic storage closed")
+            
             if self.connection_manager:
                 await self.connection_manager.shutdown()
                 logger.info("Connection manager closed")
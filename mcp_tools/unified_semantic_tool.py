@@ -37,6 +37,11 @@ class UnifiedSemanticTool:
         self.local_storage = LocalSemanticStorage(str(self.config.base_path))
         self.file_manager = SemanticFileManager(self.local_storage)
     
+    async def close(self):
+        """关闭本地语义存储（写回缓冲并合并索引日志）与文件管理器的锁文件"""
+        await self.local_storage.close()
+        await self.file_manager.close()
+    
     def get_tool_definition(self) -> Tool:
         """获取工具定义"""
         return Tool(
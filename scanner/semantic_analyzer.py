@@ -108,6 +108,11 @@ class SemanticAnalyzer:
             r'^[0-9]{6}$': '验证码/邮政编码',
         }
     
+    async def close(self):
+        """关闭本地语义存储（写回缓冲并合并索引日志）与文件管理器的锁文件"""
+        await self.local_storage.close()
+        await self.file_manager.close()
+    
     async def analyze_field_semantics(self, instance_id: str, database_name: str, 
                                     collection_name: str, field_path: str, 
                                     field_info: Dict[str, Any]) -> Dict[str, Any]:
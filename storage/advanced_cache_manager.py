@@ -6,11 +6,14 @@
 """
 
 import asyncio
+import functools
+import sys
 import time
 import threading
-from typing import Dict, Any, Optional, Tuple, Set, List
-from collections import OrderedDict, defaultdict
-from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, Set, List, Hashable, Callable
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from functools import cached_property
 from datetime import datetime, timedelta
 import structlog
 import weakref
@@ -19,21 +22,19 @@ import hashlib
 logger = structlog.get_logger(__name__)
 
 
-@dataclass
 class CacheEntry:
-    """缓存条目"""
-    data: Any
-    timestamp: float
-    ttl: float
-    access_count: int = 0
-    last_access: float = 0
-    size: int = 0
-    
-    def __post_init__(self):
-        self.last_access = self.timestamp
+    """缓存条目（使用__slots__减少每条目内存与属性访问开销）"""
+    
+    __slots__ = ('data', 'timestamp', 'ttl', 'access_count', 'last_access', 'size')
+    
+    def __init__(self, data: Any, timestamp: float, ttl: float):
+        self.data = data
+        self.timestamp = timestamp
+        self.ttl = ttl
+        self.access_count = 0
+        self.last_access = timestamp
         # 计算数据大小（简化版）
-        import sys
-        self.size = sys.getsizeof(self.data)
+        self.size = sys.getsizeof(data)
     
     @property
     def is_expired(self) -> bool:
@@ -45,10 +46,227 @@ class CacheEntry:
         """年龄（秒）"""
         return time.time() - self.timestamp
     
-    def touch(self):
+    def touch(self, now: Optional[float] = None):
         """更新访问时间"""
         self.access_count += 1
-        self.last_access = time.time()
+        self.last_access = time.time() if now is None else now
+
+
+def _freeze_query(value: Any) -> Hashable:
+    """
+    将查询参数递归转换为可哈希的规范形式（字典按键排序）
+
+    标量带上类型名：1、1.0 与 True 相等且哈希相同，不带类型时会在结果缓存中被视为同一查询
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((_freeze_query(k), _freeze_query(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return ('__seq__',) + tuple(_freeze_query(v) for v in value)
+    return (type(value).__name__, value)
+
+
+@functools.lru_cache(maxsize=8192)
+def _hash_frozen_query(frozen_query: Hashable) -> str:
+    """计算规范化查询参数的哈希（结果缓存）"""
+    return sys.intern(hashlib.md5(repr(frozen_query).encode()).hexdigest())
+
+
+def _purge_expired(cache: OrderedDict, now: float) -> Tuple[OrderedDict, List[Hashable]]:
+    """
+    单遍清理过期条目
+    
+    过期条目超过半数时整体重建字典（一次分配并清除哈希表墓碑），
+    否则原地删除。返回清理后的字典（可能是新对象）和被清理的键。
+    """
+    expired_keys = [k for k, v in cache.items() if v.timestamp + v.ttl < now]
+    if len(expired_keys) > len(cache) // 2:
+        return OrderedDict((k, v) for k, v in cache.items() if v.timestamp + v.ttl >= now), expired_keys
+    
+    for key in expired_keys:
+        del cache[key]
+    return cache, expired_keys
+
+
+_EMPTY_SLOT = object()
+
+
+class ClockCacheLevel:
+    """
+    CLOCK（二次机会）置换的缓存层
+    
+    命中只置位引用标记，不移动任何结构；写入满载时由时钟指针扫描，
+    清除已置位的标记，淘汰第一个未被引用的槽位。
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._index: Dict[Hashable, int] = {}  # key -> 槽位
+        self._keys: List[Any] = []
+        self._entries: List[Optional[CacheEntry]] = []
+        self._ref = bytearray()
+        self._free: List[int] = []
+        self._hand = 0
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+    
+    def __iter__(self):
+        return iter(list(self._index))
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取条目并置位引用标记"""
+        slot = self._index.get(key)
+        if slot is None:
+            return default
+        self._ref[slot] = 1
+        return self._entries[slot]
+    
+    def items(self) -> List[Tuple[Hashable, CacheEntry]]:
+        """返回条目快照"""
+        entries = self._entries
+        return [(key, entries[slot]) for key, slot in self._index.items()]
+    
+    def put(self, key: Hashable, entry: CacheEntry) -> Optional[Tuple[Hashable, CacheEntry]]:
+        """写入条目，满载时返回被淘汰的 (key, entry)"""
+        slot = self._index.get(key)
+        if slot is not None:
+            self._entries[slot] = entry
+            self._ref[slot] = 1
+            return None
+        
+        if self.capacity <= 0:
+            return key, entry
+        
+        evicted = None
+        if len(self._index) >= self.capacity:
+            evicted = self._evict()
+        
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+            self._entries[slot] = entry
+            self._ref[slot] = 0
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            self._entries.append(entry)
+            self._ref.append(0)
+        self._index[key] = slot
+        return evicted
+    
+    def _evict(self) -> Tuple[Hashable, CacheEntry]:
+        """推进时钟指针，淘汰第一个引用标记为0的槽位"""
+        keys = self._keys
+        ref = self._ref
+        size = len(keys)
+        while True:
+            slot = self._hand
+            self._hand = (slot + 1) % size
+            if keys[slot] is _EMPTY_SLOT:
+                continue
+            if ref[slot]:
+                ref[slot] = 0
+                continue
+            key = keys[slot]
+            return key, self.pop(key)
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """移除条目"""
+        slot = self._index.pop(key, None)
+        if slot is None:
+            return default
+        entry = self._entries[slot]
+        self._keys[slot] = _EMPTY_SLOT
+        self._entries[slot] = None
+        self._ref[slot] = 0
+        self._free.append(slot)
+        return entry
+    
+    def __delitem__(self, key: Hashable):
+        if key not in self._index:
+            raise KeyError(key)
+        self.pop(key)
+    
+    def purge_expired(self, now: float) -> List[Hashable]:
+        """原地清理过期条目，返回被清理的键"""
+        entries = self._entries
+        expired_keys = [key for key, slot in self._index.items()
+                        if entries[slot].timestamp + entries[slot].ttl < now]
+        for key in expired_keys:
+            self.pop(key)
+        return expired_keys
+    
+    def clear(self):
+        """清空"""
+        self._index.clear()
+        self._keys.clear()
+        self._entries.clear()
+        self._ref = bytearray()
+        self._free.clear()
+        self._hand = 0
+
+
+class ReadWriteLock:
+    """读写锁（写优先）
+    
+    允许多个读者并发持有，写者独占；有写者等待时新读者让行，避免写者饥饿。
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    def acquire_read(self):
+        """获取读锁"""
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_read(self):
+        """释放读锁"""
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+    
+    def acquire_write(self):
+        """获取写锁"""
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+    
+    def release_write(self):
+        """释放写锁"""
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+    
+    @contextmanager
+    def read_locked(self):
+        """读锁上下文"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write_locked(self):
+        """写锁上下文"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
 
 
 class MultiLevelCache:
@@ -60,17 +278,21 @@ class MultiLevelCache:
                  l2_size: int = 500,
                  l2_ttl: float = 1800,  # 30分钟
                  l3_size: int = 1000,
-                 l3_ttl: float = 3600):  # 1小时
+                 l3_ttl: float = 3600,  # 1小时
+                 on_evict: Optional[Callable[[Hashable], None]] = None):
         """
         初始化多层级缓存
         
         L1: 热点数据，高频访问
         L2: 温数据，中频访问  
         L3: 冷数据，低频访问
+        
+        on_evict: 条目因淘汰或过期完全离开缓存时的回调（显式remove/clear不触发）
         """
-        self.l1_cache = OrderedDict()  # LRU缓存
-        self.l2_cache = OrderedDict()
-        self.l3_cache = OrderedDict()
+        self.on_evict = on_evict
+        self.l1_cache = ClockCacheLevel(l1_size)  # CLOCK近似LRU
+        self.l2_cache = ClockCacheLevel(l2_size)
+        self.l3_cache = ClockCacheLevel(l3_size)
         
         self.l1_size = l1_size
         self.l1_ttl = l1_ttl
@@ -87,137 +309,227 @@ class MultiLevelCache:
             'promotions': 0, 'evictions': 0
         }
         
-        # 线程锁
-        self.lock = threading.RLock()
+        # 读写锁：L1命中走读锁，其余修改操作走写锁
+        self.lock = ReadWriteLock()
+        
+        # 读锁下记录的L1命中，访问统计延迟到写锁下批量更新
+        self._pending_hits = deque()
+        self._pending_hits_limit = max(l1_size, 1)
+        
+        # 批量提升：L2/L3命中先计数，达到阈值的条目成批提升
+        self.promotion_threshold = 2
+        self.promotion_watermark = 0.2  # L1空闲槽位低于该比例时改为批量提升
+        self.promotion_batch_size = max(l1_size // 10, 1)
+        self._promotion_candidates: Dict[Hashable, int] = {}
+        self._promotion_ready: Dict[Hashable, int] = {}  # key -> 所在层级
         
         logger.info("多层级缓存初始化完成",
                    l1_size=l1_size, l2_size=l2_size, l3_size=l3_size)
     
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: Hashable) -> Optional[Any]:
         """获取缓存数据"""
-        with self.lock:
+        # 快速路径：L1命中只需读锁（仅置位CLOCK引用标记）
+        now = time.time()
+        with self.lock.read_locked():
+            entry = self.l1_cache.get(key)
+            hit = entry is not None and entry.timestamp + entry.ttl >= now
+            if hit:
+                self._pending_hits.append(key)
+        
+        if hit:
+            if len(self._pending_hits) >= self._pending_hits_limit:
+                with self.lock.write_locked():
+                    self._drain_pending_hits()
+            return entry.data
+        
+        with self.lock.write_locked():
+            self._drain_pending_hits()
+            
             # L1 缓存查找
-            if key in self.l1_cache:
-                entry = self.l1_cache[key]
-                if not entry.is_expired:
-                    entry.touch()
-                    # 移到末尾（LRU）
-                    self.l1_cache.move_to_end(key)
+            entry = self.l1_cache.get(key)
+            if entry is not None:
+                if entry.timestamp + entry.ttl >= now:
+                    entry.touch(now)
                     self.stats['l1_hits'] += 1
                     return entry.data
                 else:
                     del self.l1_cache[key]
+                    self._notify_evicted(key)
             
             self.stats['l1_misses'] += 1
             
             # L2 缓存查找
-            if key in self.l2_cache:
-                entry = self.l2_cache[key]
-                if not entry.is_expired:
-                    entry.touch()
-                    # 提升到L1
-                    self._promote_to_l1(key, entry)
-                    del self.l2_cache[key]
+            entry = self.l2_cache.get(key)
+            if entry is not None:
+                if entry.timestamp + entry.ttl >= now:
+                    entry.touch(now)
                     self.stats['l2_hits'] += 1
-                    self.stats['promotions'] += 1
+                    # 记录提升候选（L2 -> L1）
+                    self._record_promotion_candidate(key, 2)
                     return entry.data
                 else:
                     del self.l2_cache[key]
+                    self._notify_evicted(key)
+                    self._forget_promotion_candidate(key)
             
             self.stats['l2_misses'] += 1
             
             # L3 缓存查找
-            if key in self.l3_cache:
-                entry = self.l3_cache[key]
-                if not entry.is_expired:
-                    entry.touch()
-                    # 提升到L2
-                    self._promote_to_l2(key, entry)
-                    del self.l3_cache[key]
+            entry = self.l3_cache.get(key)
+            if entry is not None:
+                if entry.timestamp + entry.ttl >= now:
+                    entry.touch(now)
                     self.stats['l3_hits'] += 1
-                    self.stats['promotions'] += 1
+                    # 记录提升候选（L3 -> L2）
+                    self._record_promotion_candidate(key, 3)
                     return entry.data
                 else:
                     del self.l3_cache[key]
+                    self._notify_evicted(key)
+                    self._forget_promotion_candidate(key)
             
             self.stats['l3_misses'] += 1
             return None
     
-    def put(self, key: str, data: Any, ttl: Optional[float] = None):
+    def _notify_evicted(self, key: Hashable):
+        """通知条目已完全离开缓存"""
+        if self.on_evict is not None:
+            self.on_evict(key)
+    
+    def _drain_pending_hits(self):
+        """批量应用读锁下记录的L1命中（需持有写锁）"""
+        pending = self._pending_hits
+        while pending:
+            key = pending.popleft()
+            self.stats['l1_hits'] += 1
+            entry = self.l1_cache.get(key)
+            if entry is not None:
+                entry.touch()
+    
+    def _record_promotion_candidate(self, key: Hashable, level: int):
+        """记录L2/L3命中，访问次数达到阈值后加入待提升集合（需持有写锁）"""
+        count = self._promotion_candidates.get(key, 0) + 1
+        self._promotion_candidates[key] = count
+        if count >= self.promotion_threshold:
+            self._promotion_ready[key] = level
+            self._maybe_promote()
+    
+    def _forget_promotion_candidate(self, key: Hashable):
+        """移除提升候选记录"""
+        self._promotion_candidates.pop(key, None)
+        self._promotion_ready.pop(key, None)
+    
+    def _maybe_promote(self):
+        """
+        执行待提升条目的提升（需持有写锁）
+        
+        L1空闲槽位充足时立即提升；接近满载时累积到一个批次后，
+        按访问次数挑选最热的条目一次性提升，被挤出的L1条目随之降级。
+        """
+        ready = self._promotion_ready
+        if not ready:
+            return
+        
+        l1_free = self.l1_size - len(self.l1_cache)
+        if l1_free > self.l1_size * self.promotion_watermark:
+            batch = list(ready)
+        elif len(ready) >= self.promotion_batch_size:
+            batch = sorted(ready, key=self._promotion_candidates.__getitem__,
+                           reverse=True)[:self.promotion_batch_size]
+        else:
+            return
+        
+        for key in batch:
+            level = ready.pop(key)
+            self._promotion_candidates.pop(key, None)
+            if level == 2:
+                entry = self.l2_cache.pop(key, None)
+                if entry is not None:
+                    self._promote_to_l1(key, entry)
+                    self.stats['promotions'] += 1
+            else:
+                entry = self.l3_cache.pop(key, None)
+                if entry is not None:
+                    self._promote_to_l2(key, entry)
+                    self.stats['promotions'] += 1
+    
+    def put(self, key: Hashable, data: Any, ttl: Optional[float] = None):
         """存储缓存数据"""
-        with self.lock:
+        with self.lock.write_locked():
+            self._drain_pending_hits()
+            
             # 根据访问频率决定存储层级
             if ttl is None:
                 ttl = self.l1_ttl
             
             entry = CacheEntry(data=data, timestamp=time.time(), ttl=ttl)
             
-            # 默认存储到L1
+            # 默认存储到L1，同时移除低层级中的旧副本
+            self._forget_promotion_candidate(key)
+            self.l2_cache.pop(key)
+            self.l3_cache.pop(key)
             self._put_to_l1(key, entry)
     
-    def _put_to_l1(self, key: str, entry: CacheEntry):
+    def _put_to_l1(self, key: Hashable, entry: CacheEntry):
         """存储到L1缓存"""
-        if key in self.l1_cache:
-            del self.l1_cache[key]
-        
-        self.l1_cache[key] = entry
+        evicted = self.l1_cache.put(key, entry)
         
-        # 检查容量限制
-        while len(self.l1_cache) > self.l1_size:
-            # 移除最老的条目到L2
-            lru_key, lru_entry = self.l1_cache.popitem(last=False)
-            if not lru_entry.is_expired:
-                self._demote_to_l2(lru_key, lru_entry)
+        # 容量已满时CLOCK淘汰的条目降级到L2
+        if evicted is not None:
+            evicted_key, evicted_entry = evicted
+            if not evicted_entry.is_expired:
+                self._demote_to_l2(evicted_key, evicted_entry)
+            else:
+                self._notify_evicted(evicted_key)
             self.stats['evictions'] += 1
     
-    def _promote_to_l1(self, key: str, entry: CacheEntry):
+    def _promote_to_l1(self, key: Hashable, entry: CacheEntry):
         """提升到L1缓存"""
         entry.ttl = self.l1_ttl
         self._put_to_l1(key, entry)
     
-    def _put_to_l2(self, key: str, entry: CacheEntry):
+    def _put_to_l2(self, key: Hashable, entry: CacheEntry):
         """存储到L2缓存"""
-        if key in self.l2_cache:
-            del self.l2_cache[key]
-        
         entry.ttl = self.l2_ttl
-        self.l2_cache[key] = entry
+        evicted = self.l2_cache.put(key, entry)
         
-        # 检查容量限制
-        while len(self.l2_cache) > self.l2_size:
-            lru_key, lru_entry = self.l2_cache.popitem(last=False)
-            if not lru_entry.is_expired:
-                self._demote_to_l3(lru_key, lru_entry)
+        # 容量已满时CLOCK淘汰的条目降级到L3
+        if evicted is not None:
+            evicted_key, evicted_entry = evicted
+            if not evicted_entry.is_expired:
+                self._demote_to_l3(evicted_key, evicted_entry)
+            else:
+                self._forget_promotion_candidate(evicted_key)
+                self._notify_evicted(evicted_key)
             self.stats['evictions'] += 1
     
-    def _promote_to_l2(self, key: str, entry: CacheEntry):
+    def _promote_to_l2(self, key: Hashable, entry: CacheEntry):
         """提升到L2缓存"""
         self._put_to_l2(key, entry)
     
-    def _demote_to_l2(self, key: str, entry: CacheEntry):
+    def _demote_to_l2(self, key: Hashable, entry: CacheEntry):
         """降级到L2缓存"""
         self._put_to_l2(key, entry)
     
-    def _put_to_l3(self, key: str, entry: CacheEntry):
+    def _put_to_l3(self, key: Hashable, entry: CacheEntry):
         """存储到L3缓存"""
-        if key in self.l3_cache:
-            del self.l3_cache[key]
-        
         entry.ttl = self.l3_ttl
-        self.l3_cache[key] = entry
+        evicted = self.l3_cache.put(key, entry)
         
-        # 检查容量限制
-        while len(self.l3_cache) > self.l3_size:
-            self.l3_cache.popitem(last=False)
+        if evicted is not None:
+            self._forget_promotion_candidate(evicted[0])
+            self._notify_evicted(evicted[0])
             self.stats['evictions'] += 1
     
-    def _demote_to_l3(self, key: str, entry: CacheEntry):
+    def _demote_to_l3(self, key: Hashable, entry: CacheEntry):
         """降级到L3缓存"""
         self._put_to_l3(key, entry)
     
-    def remove(self, key: str) -> bool:
+    def remove(self, key: Hashable) -> bool:
         """移除缓存条目"""
-        with self.lock:
+        with self.lock.write_locked():
+            self._drain_pending_hits()
+            self._forget_promotion_candidate(key)
             removed = False
             if key in self.l1_cache:
                 del self.l1_cache[key]
@@ -232,39 +544,37 @@ class MultiLevelCache:
     
     def clear(self):
         """清空所有缓存"""
-        with self.lock:
+        with self.lock.write_locked():
+            self._pending_hits.clear()
+            self._promotion_candidates.clear()
+            self._promotion_ready.clear()
             self.l1_cache.clear()
             self.l2_cache.clear()
             self.l3_cache.clear()
     
     def cleanup_expired(self) -> int:
         """清理过期条目"""
-        with self.lock:
-            cleaned = 0
+        with self.lock.write_locked():
+            self._drain_pending_hits()
+            now = time.time()
             
-            # 清理L1
-            expired_keys = [k for k, v in self.l1_cache.items() if v.is_expired]
+            expired_keys = self.l1_cache.purge_expired(now)
+            expired_keys += self.l2_cache.purge_expired(now)
+            expired_keys += self.l3_cache.purge_expired(now)
             for key in expired_keys:
-                del self.l1_cache[key]
-                cleaned += 1
+                self._notify_evicted(key)
             
-            # 清理L2
-            expired_keys = [k for k, v in self.l2_cache.items() if v.is_expired]
-            for key in expired_keys:
-                del self.l2_cache[key]
-                cleaned += 1
+            # 丢弃已不在L2/L3中的提升候选
+            for key in [k for k in self._promotion_candidates
+                        if k not in self.l2_cache and k not in self.l3_cache]:
+                self._forget_promotion_candidate(key)
             
-            # 清理L3
-            expired_keys = [k for k, v in self.l3_cache.items() if v.is_expired]
-            for key in expired_keys:
-                del self.l3_cache[key]
-                cleaned += 1
-            
-            return cleaned
+            return len(expired_keys)
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计"""
-        with self.lock:
+        with self.lock.write_locked():
+            self._drain_pending_hits()
             total_hits = self.stats['l1_hits'] + self.stats['l2_hits'] + self.stats['l3_hits']
             total_misses = self.stats['l1_misses'] + self.stats['l2_misses'] + self.stats['l3_misses']
             hit_rate = total_hits / (total_hits + total_misses) if (total_hits + total_misses) > 0 else 0
@@ -309,24 +619,29 @@ class SmartSemanticCache:
             self.main_cache = MultiLevelCache(
                 l1_size=cache_size // 10,
                 l2_size=cache_size // 5,
-                l3_size=cache_size
+                l3_size=cache_size,
+                on_evict=self._unindex_key
             )
         else:
             self.main_cache = OrderedDict()
             self.cache_size = cache_size
             self.cache_ttl = cache_ttl
         
-        # 查询缓存
-        self.query_cache = OrderedDict() if enable_query_cache else None
+        # 查询缓存、预取统计与依赖关系图均按需创建（见对应的 cached_property）
         self.query_cache_size = 500
         
-        # 预取缓存
-        self.prefetch_cache = OrderedDict() if enable_result_prefetch else None
-        self.prefetch_patterns = defaultdict(int)  # 访问模式统计
+        # 有界预取队列：单个worker消费，同一集合的待处理请求去重
+        self.prefetch_queue_size = 256
+        self._prefetch_queue: Optional[asyncio.Queue] = None
+        self._prefetch_pending: Set[Tuple[str, str, str]] = set()
+        self._prefetch_worker_task: Optional[asyncio.Task] = None
         
-        # 缓存依赖关系图
-        self.dependency_graph = defaultdict(set)
-        self.reverse_deps = defaultdict(set)
+        # 集合前缀驻留表：(instance, database, collection) -> prefix_id
+        self._prefix_ids: Dict[Tuple[str, str, str], int] = {}
+        # 按集合分组的已缓存字段：prefix_id -> {field}
+        self._by_prefix: Dict[int, Set[str]] = defaultdict(set)
+        # 字段缓存键记忆化，重复访问同一字段时直接复用键对象
+        self._field_key_cache = functools.lru_cache(maxsize=8192)(self._build_field_key)
         
         # 统计信息
         self.cache_stats = {
@@ -334,17 +649,68 @@ class SmartSemanticCache:
             'invalidations': 0, 'dependency_invalidations': 0
         }
         
-        # 清理任务
-        self.cleanup_task = None
-        self.start_cleanup_task()
+        # 清理定时器
+        self.cleanup_interval = 300  # 5分钟清理一次
+        self._cleanup_handle: Optional[asyncio.TimerHandle] = None
+        self._cleanup_started = False  # 首次在事件循环中使用时启动
         
         logger.info("智能语义缓存初始化完成",
                    multilevel=enable_multilevel,
                    query_cache=enable_query_cache,
                    prefetch=enable_result_prefetch)
     
+    @cached_property
+    def query_cache(self) -> Optional[OrderedDict]:
+        """查询结果缓存（未启用时为None）"""
+        return OrderedDict() if self.enable_query_cache else None
+    
+    @cached_property
+    def prefetch_cache(self) -> Optional[OrderedDict]:
+        """预取缓存（未启用时为None）"""
+        return OrderedDict() if self.enable_result_prefetch else None
+    
+    @cached_property
+    def prefetch_patterns(self) -> Dict[str, int]:
+        """访问模式统计"""
+        return defaultdict(int)
+    
+    @cached_property
+    def dependency_graph(self) -> Dict[int, Set[int]]:
+        """缓存依赖关系图：key_id -> 依赖的key_id集合"""
+        return {}
+    
+    @cached_property
+    def reverse_deps(self) -> Dict[int, Set[int]]:
+        """反向依赖：key_id -> 依赖它的key_id集合"""
+        return defaultdict(set)
+    
+    @cached_property
+    def _key_to_id(self) -> Dict[Hashable, int]:
+        """依赖图中缓存键到整数ID的映射"""
+        return {}
+    
+    @cached_property
+    def _id_to_key(self) -> List[Optional[Hashable]]:
+        """依赖图中整数ID到缓存键的映射（已释放的ID为None）"""
+        return []
+    
+    @cached_property
+    def _free_ids(self) -> List[int]:
+        """已释放、可复用的整数ID"""
+        return []
+    
+    def _is_created(self, name: str) -> bool:
+        """按需创建的属性是否已创建"""
+        return name in self.__dict__
+    
+    def _ensure_cleanup_task(self):
+        """首次在事件循环中使用时启动清理定时器"""
+        if not self._cleanup_started:
+            self.start_cleanup_task()
+    
     def get_field_semantic(self, instance: str, database: str, collection: str, field: str) -> Optional[Any]:
         """获取字段语义缓存"""
+        self._ensure_cleanup_task()
         cache_key = self._make_field_key(instance, database, collection, field)
         
         # 记录访问模式
@@ -363,6 +729,7 @@ class SmartSemanticCache:
             else:
                 if entry:
                     del self.main_cache[cache_key]
+                    self._unindex_key(cache_key)
                 result = None
         
         if result:
@@ -371,14 +738,16 @@ class SmartSemanticCache:
             self.cache_stats['misses'] += 1
             # 触发预取
             if self.enable_result_prefetch:
-                asyncio.create_task(self._prefetch_related(instance, database, collection, field))
+                self._schedule_prefetch(instance, database, collection, field)
         
         return result
     
     def put_field_semantic(self, instance: str, database: str, collection: str, 
-                          field: str, data: Any, dependencies: Set[str] = None):
+                          field: str, data: Any, dependencies: Set[Hashable] = None):
         """存储字段语义缓存"""
+        self._ensure_cleanup_task()
         cache_key = self._make_field_key(instance, database, collection, field)
+        self._by_prefix[cache_key[0]].add(field)
         
         # 存储到主缓存
         if self.enable_multilevel:
@@ -389,17 +758,28 @@ class SmartSemanticCache:
             
             # 检查容量限制
             while len(self.main_cache) > self.cache_size:
-                self.main_cache.popitem(last=False)
+                evicted_key, _ = self.main_cache.popitem(last=False)
+                self._unindex_key(evicted_key)
         
         # 建立依赖关系
         if dependencies:
-            self.dependency_graph[cache_key] = dependencies
-            for dep in dependencies:
-                self.reverse_deps[dep].add(cache_key)
+            key_id = self._intern_key(cache_key)
+            dep_ids = {self._intern_key(dep) for dep in dependencies}
+            
+            # 替换旧的依赖边
+            old_deps = self.dependency_graph.get(key_id, set())
+            for old_dep in old_deps:
+                self.reverse_deps[old_dep].discard(key_id)
+            
+            self.dependency_graph[key_id] = dep_ids
+            for dep_id in dep_ids:
+                self.reverse_deps[dep_id].add(key_id)
+            for old_dep in old_deps - dep_ids:
+                self._release_if_detached(old_dep)
     
     def get_query_result(self, query_hash: str) -> Optional[Any]:
         """获取查询结果缓存"""
-        if not self.enable_query_cache or not self.query_cache:
+        if self.query_cache is None:
             return None
         
         entry = self.query_cache.get(query_hash)
@@ -414,9 +794,11 @@ class SmartSemanticCache:
     
     def put_query_result(self, query_hash: str, result: Any, ttl: float = 600):
         """存储查询结果缓存"""
-        if not self.enable_query_cache or not self.query_cache:
+        if self.query_cache is None:
             return
         
+        self._ensure_cleanup_task()
+        
         entry = CacheEntry(data=result, timestamp=time.time(), ttl=ttl)
         self.query_cache[query_hash] = entry
         
@@ -434,6 +816,8 @@ class SmartSemanticCache:
         else:
             self.main_cache.pop(cache_key, None)
         
+        self._unindex_key(cache_key)
+        
         # 级联失效依赖项
         self._cascade_invalidate(cache_key)
         
@@ -441,21 +825,16 @@ class SmartSemanticCache:
     
     def invalidate_collection(self, instance: str, database: str, collection: str):
         """使集合相关缓存失效"""
-        prefix = f"{instance}:{database}:{collection}:"
+        prefix_id = self._prefix_ids.get((instance, database, collection))
+        if prefix_id is None:
+            return
         
-        # 查找所有相关缓存键
-        keys_to_invalidate = []
-        
-        if self.enable_multilevel:
-            # 多层级缓存需要检查所有层级
-            with self.main_cache.lock:
-                for cache_dict in [self.main_cache.l1_cache, self.main_cache.l2_cache, self.main_cache.l3_cache]:
-                    keys_to_invalidate.extend([k for k in cache_dict.keys() if k.startswith(prefix)])
-        else:
-            keys_to_invalidate = [k for k in self.main_cache.keys() if k.startswith(prefix)]
+        # 直接取出该集合下已缓存的字段，无需扫描全部缓存键
+        fields = self._by_prefix.pop(prefix_id, ())
         
         # 批量失效
-        for key in keys_to_invalidate:
+        for field in fields:
+            key = (prefix_id, field)
             if self.enable_multilevel:
                 self.main_cache.remove(key)
             else:
@@ -464,22 +843,82 @@ class SmartSemanticCache:
             # 级联失效
             self._cascade_invalidate(key)
         
-        self.cache_stats['invalidations'] += len(keys_to_invalidate)
+        self.cache_stats['invalidations'] += len(fields)
+    
+    def _unindex_key(self, key: Hashable):
+        """从集合字段索引与依赖图中移除已离开缓存的字段键"""
+        self._drop_dependencies(key)
+        if not (isinstance(key, tuple) and len(key) == 2):
+            return
+        prefix_id, field = key
+        fields = self._by_prefix.get(prefix_id)
+        if fields is not None:
+            fields.discard(field)
+            if not fields:
+                del self._by_prefix[prefix_id]
+    
+    def _intern_prefix(self, instance: str, database: str, collection: str) -> int:
+        """获取集合前缀的驻留ID"""
+        prefix = (instance, database, collection)
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = len(self._prefix_ids)
+            self._prefix_ids[tuple(sys.intern(part) for part in prefix)] = prefix_id
+        return prefix_id
     
-    def _make_field_key(self, instance: str, database: str, collection: str, field: str) -> str:
-        """生成字段缓存键"""
-        return f"{instance}:{database}:{collection}:{field}"
+    def _make_field_key(self, instance: str, database: str, collection: str, field: str) -> Tuple[int, str]:
+        """生成字段缓存键：(集合前缀ID, 驻留的字段名)"""
+        return self._field_key_cache(instance, database, collection, field)
+    
+    def _build_field_key(self, instance: str, database: str, collection: str, field: str) -> Tuple[int, str]:
+        """构造字段缓存键（未缓存路径）"""
+        return (self._intern_prefix(instance, database, collection), sys.intern(field))
     
     def _make_query_hash(self, query_params: Dict[str, Any]) -> str:
         """生成查询哈希"""
-        query_str = json.dumps(query_params, sort_keys=True)
-        return hashlib.md5(query_str.encode()).hexdigest()
+        return _hash_frozen_query(_freeze_query(query_params))
     
     def _record_access_pattern(self, instance: str, database: str, collection: str, field: str):
         """记录访问模式"""
         pattern_key = f"{instance}:{database}:{collection}"
         self.prefetch_patterns[pattern_key] += 1
     
+    def _schedule_prefetch(self, instance: str, database: str, collection: str, field: str):
+        """将预取请求放入有界队列，队列已满或同集合已有待处理请求时丢弃"""
+        pattern = (instance, database, collection)
+        if pattern in self._prefetch_pending:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        if self._prefetch_worker_task is None or self._prefetch_worker_task.done():
+            self._prefetch_queue = asyncio.Queue(maxsize=self.prefetch_queue_size)
+            self._prefetch_pending.clear()
+            self._prefetch_worker_task = loop.create_task(self._prefetch_worker())
+        
+        try:
+            self._prefetch_queue.put_nowait((instance, database, collection, field))
+        except asyncio.QueueFull:
+            return
+        
+        self._prefetch_pending.add(pattern)
+    
+    async def _prefetch_worker(self):
+        """预取队列消费者"""
+        queue = self._prefetch_queue
+        while True:
+            instance, database, collection, field = await queue.get()
+            try:
+                await self._prefetch_related(instance, database, collection, field)
+            except Exception as e:
+                logger.error("预取异常", error=str(e))
+            finally:
+                self._prefetch_pending.discard((instance, database, collection))
+                queue.task_done()
+    
     async def _prefetch_related(self, instance: str, database: str, collection: str, field: str):
         """预取相关数据"""
         if not self.enable_result_prefetch:
@@ -492,61 +931,128 @@ class SmartSemanticCache:
             # 简化实现，仅作示例
             logger.debug("触发预取", pattern=pattern_key)
     
-    def _cascade_invalidate(self, cache_key: str):
+    def _intern_key(self, key: Hashable) -> int:
+        """获取缓存键在依赖图中的整数ID（优先复用已释放的ID）"""
+        key_id = self._key_to_id.get(key)
+        if key_id is None:
+            if self._free_ids:
+                key_id = self._free_ids.pop()
+                self._id_to_key[key_id] = key
+            else:
+                key_id = len(self._id_to_key)
+                self._id_to_key.append(key)
+            self._key_to_id[key] = key_id
+        return key_id
+    
+    def _drop_dependencies(self, key: Hashable):
+        """移除已离开缓存的键的依赖边（依赖它的键保留，由级联失效处理）"""
+        if not self._is_created('_key_to_id'):
+            return
+        key_id = self._key_to_id.get(key)
+        if key_id is None:
+            return
+        for dep_id in self.dependency_graph.pop(key_id, ()):
+            dependents = self.reverse_deps.get(dep_id)
+            if dependents is not None:
+                dependents.discard(key_id)
+            self._release_if_detached(dep_id)
+        self._release_if_detached(key_id)
+    
+    def _release_if_detached(self, key_id: int):
+        """键既不依赖其他键、也不被其他键依赖时释放它的整数ID"""
+        key = self._id_to_key[key_id]
+        if key is None or key_id in self.dependency_graph or self.reverse_deps.get(key_id):
+            return
+        self.reverse_deps.pop(key_id, None)
+        del self._key_to_id[key]
+        self._id_to_key[key_id] = None
+        self._free_ids.append(key_id)
+    
+    def _cascade_invalidate(self, cache_key: Hashable):
         """级联失效依赖缓存"""
-        dependent_keys = self.reverse_deps.get(cache_key, set())
+        if not self._is_created('_key_to_id'):
+            return
+        
+        key_id = self._key_to_id.get(cache_key)
+        if key_id is None:
+            return
+        
+        # 在整数ID上遍历依赖图，收集所有受影响的条目
+        stack = [key_id]
+        visited = {key_id}
+        invalidated_ids = []
+        released_deps = []
+        while stack:
+            current = stack.pop()
+            for dependent_id in self.reverse_deps.pop(current, ()):
+                if dependent_id not in visited:
+                    visited.add(dependent_id)
+                    stack.append(dependent_id)
+                    invalidated_ids.append(dependent_id)
+            
+            # 清理依赖关系
+            for dep_id in self.dependency_graph.pop(current, ()):
+                dependents = self.reverse_deps.get(dep_id)
+                if dependents:
+                    dependents.discard(current)
+                released_deps.append(dep_id)
         
-        for dep_key in dependent_keys:
+        # 最后映射回缓存键执行失效（失效的键已不在依赖图中，同时释放ID）
+        for dependent_id in invalidated_ids:
+            dep_key = self._id_to_key[dependent_id]
             if self.enable_multilevel:
                 self.main_cache.remove(dep_key)
             else:
                 self.main_cache.pop(dep_key, None)
-            
-            # 递归失效
-            self._cascade_invalidate(dep_key)
+            self._unindex_key(dep_key)
             self.cache_stats['dependency_invalidations'] += 1
         
-        # 清理依赖关系
-        if cache_key in self.dependency_graph:
-            for dep in self.dependency_graph[cache_key]:
-                self.reverse_deps[dep].discard(cache_key)
-            del self.dependency_graph[cache_key]
-        
-        self.reverse_deps.pop(cache_key, None)
+        for dep_id in [key_id] + released_deps:
+            self._release_if_detached(dep_id)
     
     def start_cleanup_task(self):
-        """启动清理任务"""
-        async def cleanup_loop():
-            while True:
-                try:
-                    await asyncio.sleep(300)  # 5分钟清理一次
-                    cleaned = self.cleanup_expired()
-                    if cleaned > 0:
-                        logger.debug("缓存清理完成", cleaned=cleaned)
-                except Exception as e:
-                    logger.error("缓存清理异常", error=str(e))
-        
-        self.cleanup_task = asyncio.create_task(cleanup_loop())
+        """启动清理定时器（当前无运行中的事件循环时不启动）"""
+        if self._cleanup_handle is not None:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        self._cleanup_handle = loop.call_later(self.cleanup_interval, self._scheduled_cleanup)
+        self._cleanup_started = True
+    
+    def _scheduled_cleanup(self):
+        """定时清理回调，执行后重新挂载定时器"""
+        self._cleanup_handle = None
+        try:
+            cleaned = self.cleanup_expired()
+            if cleaned > 0:
+                logger.debug("缓存清理完成", cleaned=cleaned)
+        except Exception as e:
+            logger.error("缓存清理异常", error=str(e))
+        finally:
+            self.start_cleanup_task()
     
     def cleanup_expired(self) -> int:
         """清理过期缓存"""
         cleaned = 0
+        now = time.time()
         
         # 清理主缓存
         if self.enable_multilevel:
             cleaned += self.main_cache.cleanup_expired()
         else:
-            expired_keys = [k for k, v in self.main_cache.items() if v.is_expired]
+            self.main_cache, expired_keys = _purge_expired(self.main_cache, now)
             for key in expired_keys:
-                del self.main_cache[key]
-                cleaned += 1
+                self._unindex_key(key)
+            cleaned += len(expired_keys)
         
         # 清理查询缓存
-        if self.query_cache:
-            expired_keys = [k for k, v in self.query_cache.items() if v.is_expired]
-            for key in expired_keys:
-                del self.query_cache[key]
-                cleaned += 1
+        if self._is_created('query_cache') and self.query_cache:
+            self.query_cache, expired_keys = _purge_expired(self.query_cache, now)
+            cleaned += len(expired_keys)
         
         return cleaned
     
@@ -561,11 +1067,11 @@ class SmartSemanticCache:
             stats['hit_rate'] = stats['hits'] / total_requests if total_requests > 0 else 0
             stats['cache_size'] = len(self.main_cache)
         
-        if self.query_cache:
-            stats['query_cache_size'] = len(self.query_cache)
+        if self.enable_query_cache:
+            stats['query_cache_size'] = len(self.__dict__.get('query_cache', ()))
         
-        stats['prefetch_patterns'] = len(self.prefetch_patterns)
-        stats['dependencies'] = len(self.dependency_graph)
+        stats['prefetch_patterns'] = len(self.__dict__.get('prefetch_patterns', ()))
+        stats['dependencies'] = len(self.__dict__.get('dependency_graph', ()))
         
         return stats
     
@@ -592,16 +1098,26 @@ class SmartSemanticCache:
     
     def shutdown(self):
         """关闭缓存管理器"""
-        if self.cleanup_task:
-            self.cleanup_task.cancel()
+        if self._cleanup_handle is not None:
+            self._cleanup_handle.cancel()
+            self._cleanup_handle = None
+        
+        if self._prefetch_worker_task is not None:
+            self._prefetch_worker_task.cancel()
+            self._prefetch_worker_task = None
+        self._prefetch_pending.clear()
         
         # 清理所有缓存
         if self.enable_multilevel:
             self.main_cache.clear()
         else:
             self.main_cache.clear()
+        self._by_prefix.clear()
+        # 依赖图与整数ID表按需重建
+        for name in ('dependency_graph', 'reverse_deps', '_key_to_id', '_id_to_key', '_free_ids'):
+            self.__dict__.pop(name, None)
         
-        if self.query_cache:
+        if self._is_created('query_cache') and self.query_cache is not None:
             self.query_cache.clear()
         
         logger.info("智能语义缓存已关闭")
\ No newline at end of file
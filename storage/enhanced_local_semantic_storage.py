@@ -7,16 +7,33 @@
 """
 
 import os
-import json
+import sys
 import asyncio
+import functools
+import heapq
+import itertools
+import mmap
+import threading
+from array import array
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union, Tuple
+from typing import Dict, List, Optional, Any, Union, Tuple, Set, Callable
 from datetime import datetime, timedelta
 import structlog
 import hashlib
 import shutil
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
-import tempfile
+from contextlib import asynccontextmanager
+
+try:
+    import caio
+except ImportError:
+    caio = None  # 未安装caio时使用线程池执行文件IO
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None  # 未安装xxhash时使用MD5生成版本ID
 
 from storage.semantic_storage_interface import (
     SemanticStorageInterface,
@@ -25,9 +42,211 @@ from storage.semantic_storage_interface import (
     SemanticConflictInfo
 )
 from storage.semantic_file_manager import SemanticFileManager
+from storage import json_codec
 
 logger = structlog.get_logger(__name__)
 
+# 存储统计项
+_STAT_KEYS = ("total_instances", "total_databases", "total_collections", "total_fields",
+              "total_versions", "total_snapshots", "storage_size_bytes")
+
+
+def _scan_dir(path: Union[str, Path]) -> List[os.DirEntry]:
+    """列出目录项（目录不存在时返回空列表）"""
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _file_stamp(path: Union[str, Path]) -> Optional[Tuple[int, int]]:
+    """文件的 (mtime_ns, size)，文件不存在时返回None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _subdir_names(path: Union[str, Path]) -> List[str]:
+    """列出子目录名称"""
+    return [entry.name for entry in _scan_dir(path) if entry.is_dir(follow_symlinks=False)]
+
+
+@functools.lru_cache(maxsize=4096)
+def _safe_field_name(field_path: str) -> str:
+    """字段路径安全化处理，用作文件/目录名"""
+    return field_path.replace('/', '_').replace('\\', '_').replace('..', '_')
+
+
+@functools.lru_cache(maxsize=4096)
+def _collection_dir(base_path: Path, instance_name: str, database_name: str,
+                    collection_name: str) -> Path:
+    """集合目录路径"""
+    return (base_path / "instances" / instance_name /
+            "databases" / database_name / "collections" / collection_name)
+
+
+@functools.lru_cache(maxsize=4096)
+def _field_file(base_path: Path, instance_name: str, database_name: str,
+                collection_name: str, field_path: str) -> Path:
+    """旧版字段语义文件路径"""
+    return (_collection_dir(base_path, instance_name, database_name, collection_name) /
+            f"{_safe_field_name(field_path)}.json")
+
+
+@functools.lru_cache(maxsize=4096)
+def _version_dir(versions_path: Path, instance_name: str, database_name: str,
+                 collection_name: str, field_path: str) -> Path:
+    """字段版本目录路径"""
+    return (versions_path / instance_name / database_name /
+            collection_name / _safe_field_name(field_path))
+
+
+@functools.lru_cache(maxsize=4096)
+def _collection_file(base_path: Path, instance_name: str, database_name: str,
+                     collection_name: str) -> Path:
+    """集合级语义文件路径"""
+    return _collection_dir(base_path, instance_name, database_name,
+                           collection_name).with_name(f"{collection_name}.json")
+
+
+# 写入持久化策略
+_DURABILITY_MODES = ("per_call", "batch", "none")
+
+# 不小于该大小（字节）的文件通过mmap读取
+_MMAP_THRESHOLD = 4096
+
+# 版本内容池目录名（位于集合的版本目录下，按版本ID存放去重后的版本内容）
+_VERSION_POOL = ".pool"
+
+
+def _version_time(version_file: Path) -> datetime:
+    """从版本文件名（<时间戳>_<版本ID>.json）解析版本时间，无法解析时使用修改时间"""
+    stamp = version_file.stem.rsplit("_", 1)[0]
+    for fmt in ("%Y%m%d_%H%M%S_%f", "%Y%m%d_%H%M%S"):
+        try:
+            return datetime.strptime(stamp, fmt)
+        except ValueError:
+            continue
+    return datetime.fromtimestamp(version_file.stat().st_mtime)
+
+
+def _digest64(content: bytes) -> int:
+    """64位内容摘要（非密码学用途）"""
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(content)
+    return int.from_bytes(hashlib.blake2b(content, digest_size=8).digest(), "little")
+
+
+class _CollectionDigest:
+    """
+    集合的XOR分段摘要
+    
+    每个字段的摘要为 H(field_path) XOR H(语义JSON)，集合摘要为所有字段摘要的异或；
+    字段增删改时只需异或掉旧值、异或上新值即可增量更新。
+    写入时刷新的 updated_at 不计入摘要，恢复后的字段与快照中的版本仍然一致。
+    """
+    
+    __slots__ = ("fields", "value")
+    
+    def __init__(self, fields: Dict[str, Dict[str, Any]]):
+        self.fields: Dict[str, int] = {}
+        self.value = 0
+        for field_path, data in fields.items():
+            self.set(field_path, data)
+    
+    @staticmethod
+    def field_digest(field_path: str, data: Dict[str, Any]) -> int:
+        """计算单个字段的摘要（不含 updated_at）"""
+        if "updated_at" in data:
+            data = {key: value for key, value in data.items() if key != "updated_at"}
+        return (_digest64(field_path.encode("utf-8")) ^
+                _digest64(json_codec.dumps(data, sort_keys=True)))
+    
+    def set(self, field_path: str, data: Dict[str, Any]):
+        """更新字段摘要"""
+        digest = self.field_digest(field_path, data)
+        self.value ^= self.fields.get(field_path, 0) ^ digest
+        self.fields[field_path] = digest
+    
+    def discard(self, field_path: str):
+        """移除字段摘要"""
+        self.value ^= self.fields.pop(field_path, 0)
+
+
+class _SearchIndex:
+    """
+    集合的列式搜索索引
+    
+    按列保存搜索过滤用到的字段（小写文本、置信度、来源、标签），
+    过滤时只扫描这些列，仅对命中的字段构造SemanticField。
+    """
+    
+    __slots__ = ("paths", "records", "texts", "confidences", "sources", "tags")
+    
+    def __init__(self, fields: Dict[str, Dict[str, Any]]):
+        self.paths = list(fields)
+        self.records = list(fields.values())
+        # 搜索词在业务含义、示例、字段路径任一处出现即匹配，合并为一列以\x00分隔
+        self.texts = [
+            "\x00".join((data.get("business_meaning", ""),
+                         str(data.get("examples", [])),
+                         path)).lower()
+            for path, data in zip(self.paths, self.records)
+        ]
+        self.confidences = array("d", (data.get("confidence", 0.0) for data in self.records))
+        self.sources = [data.get("source", "") for data in self.records]
+        self.tags = [frozenset(data.get("tags") or ()) for data in self.records]
+
+
+def _compile_matcher(query: SemanticSearchQuery) -> Callable[[_SearchIndex], List[int]]:
+    """
+    按查询条件生成列过滤函数
+    
+    每次搜索只编译一次：只保留查询中实际设置的条件，搜索词小写化、标签集合等
+    预先计算好，对每个集合的索引依次按列过滤，返回命中的行号。
+    """
+    filters = []
+    
+    if query.search_term:
+        term = query.search_term.lower()
+        filters.append(lambda index, rows: [i for i in rows if term in index.texts[i]])
+    if query.confidence_min is not None:
+        low = query.confidence_min
+        filters.append(lambda index, rows: [i for i in rows if index.confidences[i] >= low])
+    if query.confidence_max is not None:
+        high = query.confidence_max
+        filters.append(lambda index, rows: [i for i in rows if index.confidences[i] <= high])
+    if query.source:
+        source = query.source
+        filters.append(lambda index, rows: [i for i in rows if index.sources[i] == source])
+    if query.tags:
+        wanted = frozenset(query.tags)
+        filters.append(lambda index, rows: [i for i in rows if not index.tags[i].isdisjoint(wanted)])
+    
+    def matcher(index: _SearchIndex) -> List[int]:
+        rows = range(len(index.paths))
+        for column_filter in filters:
+            if not rows:
+                break
+            rows = column_filter(index, rows)
+        return list(rows)
+    
+    return matcher
+
+
+def _walk_files(path: Union[str, Path]):
+    """递归遍历目录下的文件项，DirEntry复用目录读取时的类型信息"""
+    stack = [path]
+    while stack:
+        for entry in _scan_dir(stack.pop()):
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
 
 class EnhancedLocalSemanticStorage(SemanticStorageInterface):
     """增强版本地语义存储"""
@@ -38,7 +257,8 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
                  cache_ttl: int = 3600,
                  cache_size: int = 1000,
                  enable_versioning: bool = True,
-                 max_versions: int = 10):
+                 max_versions: int = 10,
+                 durability: str = "per_call"):
         """
         初始化增强版本地语义存储
         
@@ -50,8 +270,14 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
             cache_size: 缓存大小
             enable_versioning: 是否启用版本控制
             max_versions: 最大版本数
+            durability: 写入持久化策略，"per_call"（每次写入fsync，批量操作内改为结束时统一fsync）、
+                "batch"（在批量操作结束或close时统一fsync）或 "none"（不主动fsync）
         """
+        if durability not in _DURABILITY_MODES:
+            raise ValueError(f"不支持的持久化策略: {durability}")
+        
         self.base_path = Path(base_path)
+        self.durability = durability
         self.enable_compression = enable_compression
         self.enable_versioning = enable_versioning
         self.max_versions = max_versions
@@ -67,17 +293,53 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
         self.snapshots_path.mkdir(exist_ok=True)
         self.conflicts_path.mkdir(exist_ok=True)
         
+        # 已确认存在的目录，避免每次写入都重复mkdir
+        self._known_dirs: Set[Path] = {self.base_path, self.snapshots_path, self.conflicts_path}
+        
         # 初始化文件管理器
+        self.enable_cache = enable_cache
         self.file_manager = SemanticFileManager(
             self, 
-            enable_cache=enable_cache,
             cache_ttl=cache_ttl,
-            cache_size=cache_size
+            cache_size=cache_size,
+            cache_policy="clock"
         )
         
         # 线程池用于异步文件操作
         self.thread_pool = ThreadPoolExecutor(max_workers=4)
         
+        # Linux上优先使用caio（io_uring/libaio）提交内核异步IO，上下文按事件循环惰性创建
+        self.enable_native_aio = caio is not None and sys.platform.startswith("linux")
+        self._aio_context = None
+        self._aio_loop = None
+        self._temp_counter = itertools.count()
+        
+        # 集合级语义文件：已加载的集合文档 {集合文件: {field_path: 语义字典}}，按最近使用保留至多
+        # max_cached_collections 个未修改的集合（enable_cache=False 时写回后即丢弃）。
+        # 其他实例或进程可能写入同一集合文件：命中时以文件的 (mtime_ns, size) 校验，
+        # 写回前若文件已变化，以磁盘内容为准叠加本实例修改过的字段
+        self._collections: "OrderedDict[Path, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._collection_stamps: Dict[Path, Optional[Tuple[int, int]]] = {}
+        self._changed_fields: Dict[Path, Set[str]] = {}
+        self.max_cached_collections = 128
+        self._dirty_collections: Set[Path] = set()
+        self._collection_locks: Dict[Path, asyncio.Lock] = {}
+        self._search_indexes: Dict[Path, _SearchIndex] = {}
+        self._collection_digests: Dict[Path, _CollectionDigest] = {}
+        self._batch_depth = 0
+        
+        # 批量操作期间写入、待统一fsync的文件
+        self._pending_fsync: Set[Path] = set()
+        
+        # 字段级保存锁，按最近使用保留至多max_field_locks个
+        self._field_locks: "OrderedDict[str, asyncio.Lock]" = OrderedDict()
+        self.max_field_locks = 1024
+        
+        # 增量维护的存储统计；None表示尚未统计，首次查询时全量扫描
+        self._stats_path = self.base_path / "stats.json"
+        self._stats_lock = threading.Lock()
+        self._stats: Optional[Dict[str, int]] = self._take_persisted_stats()
+        
         logger.info("增强版本地语义存储初始化完成",
                    base_path=str(self.base_path),
                    enable_versioning=enable_versioning,
@@ -86,84 +348,432 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
     def _get_field_path(self, instance_name: str, database_name: str, 
                        collection_name: str, field_path: str) -> Path:
         """获取字段存储路径"""
-        # 对字段路径进行安全化处理
-        safe_field_path = field_path.replace('/', '_').replace('\\', '_')
-        safe_field_path = safe_field_path.replace('..', '_')
-        
-        return (self.base_path / "instances" / instance_name / 
-                "databases" / database_name / "collections" / 
-                collection_name / f"{safe_field_path}.json")
+        return _field_file(self.base_path, instance_name, database_name,
+                           collection_name, field_path)
     
     def _get_version_path(self, instance_name: str, database_name: str,
                          collection_name: str, field_path: str) -> Path:
         """获取版本存储路径"""
-        safe_field_path = field_path.replace('/', '_').replace('\\', '_')
-        safe_field_path = safe_field_path.replace('..', '_')
+        return _version_dir(self.versions_path, instance_name, database_name,
+                            collection_name, field_path)
+    
+    def _get_collection_path(self, instance_name: str, database_name: str,
+                            collection_name: str) -> Path:
+        """获取集合目录（旧版按字段分文件的存储位置）"""
+        return _collection_dir(self.base_path, instance_name, database_name, collection_name)
+    
+    def _get_collection_file(self, instance_name: str, database_name: str,
+                            collection_name: str) -> Path:
+        """获取集合级语义文件路径"""
+        return _collection_file(self.base_path, instance_name, database_name, collection_name)
+    
+    async def _load_collection(self, instance_name: str, database_name: str,
+                              collection_name: str) -> Dict[str, Dict[str, Any]]:
+        """
+        加载集合的全部字段语义（字段路径 -> 语义字典）
+        
+        集合文件不存在时按旧版布局逐个读取集合目录下的字段文件，
+        下次写入时即合并为集合文件。返回的字典可能在之后的await期间被换出缓存，
+        修改前需重新获取（获取与修改之间不能有await）。
+        """
+        collection_file = self._get_collection_file(instance_name, database_name, collection_name)
+        fields = self._collections.get(collection_file)
+        if fields is not None and (self._is_pinned(collection_file) or
+                                   _file_stamp(collection_file) == self._collection_stamps.get(collection_file)):
+            self._collections.move_to_end(collection_file)
+            return fields
+        
+        # 先取文件状态再读取，读取期间的变化会在下次校验时被发现
+        stamp = _file_stamp(collection_file)
+        data = await self._load_file_async(collection_file) if stamp is not None else None
+        if data is not None:
+            loaded = data.get("fields", {})
+        else:
+            loaded = await self._load_legacy_collection(
+                self._get_collection_path(instance_name, database_name, collection_name)
+            )
+        
+        fields = self._collections.get(collection_file)
+        if fields is None:
+            self._evict_collections()
+            fields = self._collections[collection_file] = loaded
+            self._collection_stamps[collection_file] = stamp
+        elif not self._is_pinned(collection_file):
+            # 磁盘内容已变化：原地刷新，仍持有该字典的调用方也能看到最新内容
+            fields.clear()
+            fields.update(loaded)
+            self._collection_stamps[collection_file] = stamp
+            self._search_indexes.pop(collection_file, None)
+            self._collection_digests.pop(collection_file, None)
+        return fields
+    
+    def _is_pinned(self, collection_file: Path) -> bool:
+        """集合有尚未写回的修改或正在写回，内存内容不能被磁盘内容替换或换出"""
+        if collection_file in self._changed_fields or collection_file in self._dirty_collections:
+            return True
+        lock = self._collection_locks.get(collection_file)
+        return lock is not None and lock.locked()
+    
+    def _evict_collections(self):
+        """换出最久未使用的未修改集合，使缓存的集合数不超过上限"""
+        capacity = self.max_cached_collections if self.enable_cache else 0
+        if len(self._collections) <= capacity:
+            return
+        for collection_file in list(self._collections):
+            if len(self._collections) <= capacity:
+                break
+            if self._is_pinned(collection_file):
+                continue
+            del self._collections[collection_file]
+            self._collection_stamps.pop(collection_file, None)
+            self._collection_locks.pop(collection_file, None)
+            self._search_indexes.pop(collection_file, None)
+            self._collection_digests.pop(collection_file, None)
+    
+    async def _load_legacy_collection(self, collection_path: Path) -> Dict[str, Dict[str, Any]]:
+        """
+        读取旧版按字段分文件存储的集合
+        
+        旧版文件名由字段路径把 / 替换为 _ 得到，无法还原；
+        以文件内容中记录的 field_path 为键，没有记录时使用文件名本身
+        """
+        fields = {}
+        for entry in _scan_dir(collection_path):
+            if not entry.name.endswith(".json"):
+                continue
+            data = await self._load_file_async(Path(entry.path))
+            if data:
+                fields[data.get("field_path") or entry.name[:-5]] = data
+        return fields
+    
+    async def _commit_collection(self, collection_file: Path, field_path: str) -> bool:
+        """标记集合中的字段已修改；不在批量操作中时立即写盘"""
+        self._dirty_collections.add(collection_file)
+        self._changed_fields.setdefault(collection_file, set()).add(field_path)
+        self._search_indexes.pop(collection_file, None)
+        
+        # 已建立摘要的集合增量更新该字段
+        digest = self._collection_digests.get(collection_file)
+        if digest is not None:
+            data = self._collections.get(collection_file, {}).get(field_path)
+            if data is None:
+                digest.discard(field_path)
+            else:
+                digest.set(field_path, data)
+        
+        if self._batch_depth:
+            return True
+        return await self._flush_collection(collection_file)
+    
+    async def _flush_collection(self, collection_file: Path) -> bool:
+        """将已修改的集合写回磁盘（同一集合的写入串行执行）"""
+        lock = self._collection_locks.setdefault(collection_file, asyncio.Lock())
+        async with lock:
+            if collection_file not in self._dirty_collections:
+                return True
+            self._dirty_collections.discard(collection_file)
+            
+            is_new = self._stats is not None and self._is_new_collection(collection_file)
+            
+            stamp = _file_stamp(collection_file)
+            disk_fields = None
+            if stamp is not None and stamp != self._collection_stamps.get(collection_file):
+                # 其他实例或进程写入过该集合
+                data = await self._load_file_async(collection_file)
+                disk_fields = data.get("fields", {}) if data is not None else None
+            
+            fields = self._collections.get(collection_file, {})
+            changed = self._changed_fields.pop(collection_file, set())
+            if disk_fields is not None:
+                # 以磁盘内容为准，叠加本实例修改过的字段
+                for field_path in changed:
+                    if field_path in fields:
+                        disk_fields[field_path] = fields[field_path]
+                    else:
+                        disk_fields.pop(field_path, None)
+                fields.clear()
+                fields.update(disk_fields)
+                self._search_indexes.pop(collection_file, None)
+                self._collection_digests.pop(collection_file, None)
+            
+            success = await self._save_file_async(collection_file, {"fields": dict(fields)})
+            if not success:
+                self._dirty_collections.add(collection_file)
+                self._changed_fields.setdefault(collection_file, set()).update(changed)
+                return False
+            if is_new:
+                self._bump_stat("total_collections", 1)
+        
+        self._evict_collections()
+        return True
+    
+    def _is_new_collection(self, collection_file: Path) -> bool:
+        """检查集合是否尚未落盘，同时计入新出现的实例与数据库"""
+        if collection_file.exists() or collection_file.with_suffix("").is_dir():
+            return False
+        
+        database_dir = collection_file.parent.parent
+        instance_dir = database_dir.parent.parent
+        if not database_dir.exists():
+            self._bump_stat("total_databases", 1)
+            if not instance_dir.exists():
+                self._bump_stat("total_instances", 1)
+        return True
+    
+    async def flush_collections(self) -> bool:
+        """写回所有已修改的集合"""
+        results = [await self._flush_collection(collection_file)
+                   for collection_file in list(self._dirty_collections)]
+        return all(results)
+    
+    @asynccontextmanager
+    async def batch_operation(self):
+        """
+        批量操作上下文：期间的修改只更新内存，退出时每个集合写盘一次
+        
+        持久化策略不为"none"时，批量期间的写入不逐个fsync，退出时统一fsync。
+        """
+        self._batch_depth += 1
+        try:
+            async with self.file_manager.batch_operation():
+                yield self
+        finally:
+            try:
+                if self._batch_depth == 1:
+                    # 仍处于批量模式下写回集合，随后统一fsync
+                    await self.flush_collections()
+                    await self._sync_pending()
+            finally:
+                self._batch_depth -= 1
+    
+    def _write_durability(self) -> str:
+        """当前写入应使用的持久化方式"""
+        if self.durability == "none":
+            return "none"
+        if self._batch_depth or self.durability == "batch":
+            return "batch"
+        return "per_call"
+    
+    async def _sync_pending(self):
+        """fsync批量期间写入的文件及其所在目录"""
+        if not self._pending_fsync:
+            return
+        
+        pending, self._pending_fsync = self._pending_fsync, set()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.thread_pool, self._fsync_paths, pending)
+    
+    @staticmethod
+    def _fsync_paths(paths: Set[Path]):
+        """对文件与其所在目录各执行一次fsync（目录fsync使重命名持久化）"""
+        for path in list(paths) + list({path.parent for path in paths}):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                logger.warning(f"fsync {path}失败", error=str(e))
+            finally:
+                os.close(fd)
+    
+    async def _get_search_index(self, instance_name: str, database_name: str,
+                               collection_name: str) -> _SearchIndex:
+        """获取集合的搜索索引（集合修改后重建）"""
+        collection_file = self._get_collection_file(instance_name, database_name, collection_name)
+        index = self._search_indexes.get(collection_file)
+        if index is None:
+            fields = await self._load_collection(instance_name, database_name, collection_name)
+            index = self._search_indexes[collection_file] = _SearchIndex(fields)
+        return index
+    
+    async def _get_collection_digest(self, instance_name: str, database_name: str,
+                                    collection_name: str) -> _CollectionDigest:
+        """获取集合摘要（首次使用时计算，之后随字段修改增量维护）"""
+        collection_file = self._get_collection_file(instance_name, database_name, collection_name)
+        digest = self._collection_digests.get(collection_file)
+        if digest is None:
+            fields = await self._load_collection(instance_name, database_name, collection_name)
+            digest = self._collection_digests[collection_file] = _CollectionDigest(fields)
+        return digest
+    
+    def _list_collections(self, instance_name: Optional[str] = None,
+                         database_name: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """列出存储中的集合 (instance, database, collection)"""
+        collections = []
+        instances_path = self.base_path / "instances"
+        instance_names = [instance_name] if instance_name else _subdir_names(instances_path)
+        
+        for inst in instance_names:
+            databases_path = instances_path / inst / "databases"
+            database_names = [database_name] if database_name else _subdir_names(databases_path)
+            
+            for db in database_names:
+                # 集合文件与旧版集合目录都算作集合
+                names = set()
+                for entry in _scan_dir(databases_path / db / "collections"):
+                    if entry.is_dir(follow_symlinks=False):
+                        names.add(entry.name)
+                    elif entry.name.endswith(".json"):
+                        names.add(entry.name[:-5])
+                collections.extend((inst, db, coll) for coll in sorted(names))
+        
+        return collections
+    
+    def _lock_for(self, key: str) -> asyncio.Lock:
+        """获取字段级锁，超出上限时批量丢弃最久未用且空闲的锁"""
+        lock = self._field_locks.get(key)
+        if lock is not None:
+            self._field_locks.move_to_end(key)
+            return lock
+        
+        if len(self._field_locks) >= self.max_field_locks:
+            target = self.max_field_locks * 3 // 4
+            for stale_key, stale_lock in list(self._field_locks.items()):
+                if len(self._field_locks) <= target:
+                    break
+                if not stale_lock.locked():
+                    del self._field_locks[stale_key]
+        
+        lock = self._field_locks[key] = asyncio.Lock()
+        return lock
+    
+    def _take_persisted_stats(self) -> Optional[Dict[str, int]]:
+        """
+        读取上次关闭时保存的统计信息
+        
+        读取后立即删除统计文件：进程异常退出时文件不存在，下次启动重新全量统计，
+        避免使用过期的计数。
+        """
+        stats = self._load_file_sync(self._stats_path)
+        try:
+            self._stats_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("删除统计文件失败", error=str(e))
+            return None
+        return stats
+    
+    def _bump_stat(self, name: str, delta: int):
+        """更新统计计数（尚未统计时跳过，首次全量扫描会包含本次变更）"""
+        if delta and self._stats is not None:
+            with self._stats_lock:
+                self._stats[name] = self._stats.get(name, 0) + delta
+    
+    def _replace_file(self, temp_path: Union[str, Path], file_path: Path, size: int):
+        """原子替换目标文件并计入存储大小变化（已缓存的集合同时记录写入内容的文件状态）"""
+        try:
+            old_size = os.stat(file_path).st_size
+        except FileNotFoundError:
+            old_size = 0
         
-        return (self.versions_path / instance_name / database_name / 
-                collection_name / safe_field_path)
+        if file_path in self._collection_stamps:
+            # 重命名不改变 mtime，临时文件的状态即写入后集合文件的状态
+            self._collection_stamps[file_path] = _file_stamp(temp_path)
+        os.replace(temp_path, file_path)
+        self._bump_stat("storage_size_bytes", size - old_size)
     
-    def _generate_version_id(self, semantic_field: SemanticField) -> str:
-        """生成版本ID"""
-        content = json.dumps(semantic_field.to_dict(), sort_keys=True)
-        return hashlib.md5(content.encode()).hexdigest()[:12]
+    def _unlink_file(self, file_path: Union[str, Path]):
+        """删除文件并计入存储大小变化"""
+        size = os.stat(file_path).st_size
+        os.unlink(file_path)
+        self._bump_stat("storage_size_bytes", -size)
+    
+    def _generate_version_id(self, semantic_field: Union[SemanticField, bytes]) -> str:
+        """生成版本ID（可直接传入已按键排序编码的内容）"""
+        if isinstance(semantic_field, SemanticField):
+            content = json_codec.dumps(semantic_field.to_dict(), sort_keys=True)
+        else:
+            content = semantic_field
+        
+        # 版本ID仅用于内容寻址，不需要密码学强度
+        if xxhash is not None:
+            return xxhash.xxh3_64_hexdigest(content)[:12]
+        return hashlib.md5(content).hexdigest()[:12]
     
     async def save_field_semantic(self, instance_name: str, database_name: str,
                                 collection_name: str, field_path: str,
                                 semantic_field: SemanticField) -> bool:
         """保存字段语义信息"""
-        try:
-            file_path = self._get_field_path(instance_name, database_name, 
-                                           collection_name, field_path)
-            
-            # 检查冲突
-            conflicts = await self.detect_conflicts(
-                instance_name, database_name, collection_name, 
-                field_path, semantic_field
-            )
-            
-            if conflicts:
-                logger.warning("检测到语义冲突", conflicts=len(conflicts))
-                # 记录冲突信息
-                await self._record_conflicts(conflicts)
-            
-            # 保存版本历史（如果启用）
-            if self.enable_versioning:
-                await self._save_version(instance_name, database_name, 
-                                       collection_name, field_path, semantic_field)
-            
-            # 更新时间戳
-            semantic_field.updated_at = datetime.now()
-            
-            # 保存到主文件
-            success = await self._save_file_async(file_path, semantic_field.to_dict())
-            
-            if success:
-                logger.debug("字段语义保存成功",
-                           instance=instance_name,
-                           database=database_name,
-                           collection=collection_name,
-                           field=field_path)
-            
-            return success
-            
-        except Exception as e:
-            logger.error("保存字段语义失败",
-                        instance=instance_name,
-                        database=database_name,
-                        collection=collection_name,
-                        field=field_path,
-                        error=str(e))
-            return False
+        updated_at = datetime.now()
+        success = await self._save_raw_field(
+            instance_name, database_name, collection_name, field_path,
+            semantic_field.to_dict(), updated_at
+        )
+        if success:
+            semantic_field.updated_at = updated_at
+        return success
+    
+    async def _save_raw_field(self, instance_name: str, database_name: str,
+                             collection_name: str, field_path: str,
+                             data: Dict[str, Any], updated_at: Optional[datetime] = None) -> bool:
+        """
+        直接保存字典形式的字段语义（不经过SemanticField转换）
+        
+        data 的所有权转移给集合文档，调用方之后不应再修改。
+        """
+        field_key = f"{instance_name}/{database_name}/{collection_name}/{field_path}"
+        # 同一字段的保存串行执行，避免重复写入版本文件和冲突检测的竞态
+        async with self._lock_for(field_key):
+            try:
+                fields = await self._load_collection(instance_name, database_name, collection_name)
+                
+                # 检查冲突（现有语义直接取自已加载的集合文档）
+                conflicts = self._find_conflicts(
+                    field_path, fields.get(field_path),
+                    data.get("business_meaning", ""), data.get("confidence", 0.0)
+                )
+                
+                if conflicts:
+                    logger.warning("检测到语义冲突", conflicts=len(conflicts))
+                    # 记录冲突信息
+                    await self._record_conflicts(conflicts)
+                
+                # 保存版本历史（如果启用）
+                if self.enable_versioning:
+                    await self._save_version(instance_name, database_name, 
+                                           collection_name, field_path, data)
+                
+                # 更新时间戳
+                data["updated_at"] = (updated_at or datetime.now()).isoformat()
+                
+                # 更新集合文档并写盘（批量操作中延迟到结束时统一写入）；
+                # 集合可能在上面的await期间被刷新或换出，修改前重新获取
+                fields = await self._load_collection(instance_name, database_name, collection_name)
+                if field_path not in fields:
+                    self._bump_stat("total_fields", 1)
+                fields[field_path] = data
+                success = await self._commit_collection(
+                    self._get_collection_file(instance_name, database_name, collection_name),
+                    field_path
+                )
+                
+                if success:
+                    logger.debug("字段语义保存成功",
+                               instance=instance_name,
+                               database=database_name,
+                               collection=collection_name,
+                               field=field_path)
+                
+                return success
+                
+            except Exception as e:
+                logger.error("保存字段语义失败",
+                            instance=instance_name,
+                            database=database_name,
+                            collection=collection_name,
+                            field=field_path,
+                            error=str(e))
+                return False
     
     async def get_field_semantic(self, instance_name: str, database_name: str,
                                collection_name: str, field_path: str) -> Optional[SemanticField]:
         """获取字段语义信息"""
         try:
-            file_path = self._get_field_path(instance_name, database_name,
-                                           collection_name, field_path)
-            
-            data = await self._load_file_async(file_path)
+            fields = await self._load_collection(instance_name, database_name, collection_name)
+            data = fields.get(field_path)
             if data:
                 return SemanticField.from_dict(data)
             
@@ -184,25 +794,29 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
         """批量保存字段语义信息"""
         results = {}
         
-        # 使用文件管理器的批量操作上下文
-        async with self.file_manager.batch_operation():
+        collection_file = self._get_collection_file(instance_name, database_name, collection_name)
+        
+        # 批量操作期间只更新内存中的集合文档，结束时写盘一次
+        async with self.batch_operation():
             # 并发执行保存操作
-            tasks = []
-            for field_path, semantic_field in semantic_data.items():
-                task = self.save_field_semantic(
+            outcomes = await asyncio.gather(*(
+                self.save_field_semantic(
                     instance_name, database_name, collection_name,
                     field_path, semantic_field
                 )
-                tasks.append((field_path, task))
+                for field_path, semantic_field in semantic_data.items()
+            ), return_exceptions=True)
             
-            # 等待所有任务完成
-            for field_path, task in tasks:
-                try:
-                    success = await task
-                    results[field_path] = success
-                except Exception as e:
-                    logger.error(f"批量保存字段{field_path}失败", error=str(e))
+            for field_path, outcome in zip(semantic_data, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.error(f"批量保存字段{field_path}失败", error=str(outcome))
                     results[field_path] = False
+                else:
+                    results[field_path] = outcome
+        
+        # 集合写盘失败时本批次的保存均视为失败
+        if collection_file in self._dirty_collections and self._batch_depth == 0:
+            results = {field_path: False for field_path in results}
         
         logger.info("批量保存语义完成",
                    instance=instance_name,
@@ -220,21 +834,17 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
         results = {}
         
         # 并发执行获取操作
-        tasks = []
-        for field_path in field_paths:
-            task = self.get_field_semantic(
-                instance_name, database_name, collection_name, field_path
-            )
-            tasks.append((field_path, task))
+        outcomes = await asyncio.gather(*(
+            self.get_field_semantic(instance_name, database_name, collection_name, field_path)
+            for field_path in field_paths
+        ), return_exceptions=True)
         
-        # 等待所有任务完成
-        for field_path, task in tasks:
-            try:
-                semantic_field = await task
-                results[field_path] = semantic_field
-            except Exception as e:
-                logger.error(f"批量获取字段{field_path}失败", error=str(e))
+        for field_path, outcome in zip(field_paths, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"批量获取字段{field_path}失败", error=str(outcome))
                 results[field_path] = None
+            else:
+                results[field_path] = outcome
         
         return results
     
@@ -243,116 +853,69 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
         results = []
         
         try:
-            # 构建搜索路径
-            search_paths = []
-            
+            # 确定搜索范围
             if query.instance_name and query.database_name and query.collection_name:
                 # 精确集合搜索
-                collection_path = (self.base_path / "instances" / query.instance_name /
-                                 "databases" / query.database_name / "collections" /
-                                 query.collection_name)
-                if collection_path.exists():
-                    search_paths.append(collection_path)
+                collections = [(query.instance_name, query.database_name, query.collection_name)]
             elif query.instance_name and query.database_name:
                 # 数据库级搜索
-                database_path = (self.base_path / "instances" / query.instance_name /
-                               "databases" / query.database_name / "collections")
-                if database_path.exists():
-                    search_paths.extend(database_path.iterdir())
+                collections = self._list_collections(query.instance_name, query.database_name)
             elif query.instance_name:
                 # 实例级搜索
-                instance_path = (self.base_path / "instances" / query.instance_name /
-                               "databases")
-                if instance_path.exists():
-                    for db_path in instance_path.iterdir():
-                        collections_path = db_path / "collections"
-                        if collections_path.exists():
-                            search_paths.extend(collections_path.iterdir())
+                collections = self._list_collections(query.instance_name)
             else:
                 # 全局搜索
-                instances_path = self.base_path / "instances"
-                if instances_path.exists():
-                    for instance_path in instances_path.iterdir():
-                        databases_path = instance_path / "databases"
-                        if databases_path.exists():
-                            for db_path in databases_path.iterdir():
-                                collections_path = db_path / "collections"
-                                if collections_path.exists():
-                                    search_paths.extend(collections_path.iterdir())
-            
-            # 在找到的路径中搜索
-            for search_path in search_paths:
-                if not search_path.is_dir():
+                collections = self._list_collections()
+            
+            # 在找到的集合中搜索：先按列过滤，只为命中的字段构造对象
+            matcher = _compile_matcher(query)
+            for instance_name, database_name, collection_name in collections:
+                try:
+                    index = await self._get_search_index(instance_name, database_name, collection_name)
+                except Exception as e:
+                    logger.warning(f"搜索集合{collection_name}时出错", error=str(e))
                     continue
                 
-                for field_file in search_path.glob("*.json"):
+                for row in matcher(index):
+                    field_path = index.paths[row]
                     try:
-                        data = await self._load_file_async(field_file)
-                        if not data:
-                            continue
-                        
-                        semantic_field = SemanticField.from_dict(data)
-                        
-                        # 应用查询过滤器
-                        if self._matches_query(semantic_field, field_file, query):
-                            field_path = field_file.stem.replace('_', '/')
-                            results.append((field_path, semantic_field))
-                    
+                        results.append((field_path, SemanticField.from_dict(index.records[row])))
                     except Exception as e:
-                        logger.warning(f"搜索文件{field_file}时出错", error=str(e))
+                        logger.warning(f"搜索字段{field_path}时出错", error=str(e))
             
-            # 排序和限制结果
-            results.sort(key=lambda x: x[1].confidence, reverse=True)
-            results = results[:query.limit]
+            # 按置信度取前limit个结果
+            results = heapq.nlargest(query.limit, results, key=lambda x: x[1].confidence)
             
         except Exception as e:
             logger.error("语义搜索失败", error=str(e))
         
         return results
     
-    def _matches_query(self, semantic_field: SemanticField, 
-                      file_path: Path, query: SemanticSearchQuery) -> bool:
-        """检查语义字段是否匹配查询条件"""
-        # 搜索词匹配
-        if query.search_term:
-            search_term = query.search_term.lower()
-            if (search_term not in semantic_field.business_meaning.lower() and
-                search_term not in str(semantic_field.examples).lower() and
-                search_term not in file_path.stem.lower()):
-                return False
-        
-        # 置信度范围
-        if query.confidence_min is not None and semantic_field.confidence < query.confidence_min:
-            return False
-        if query.confidence_max is not None and semantic_field.confidence > query.confidence_max:
-            return False
-        
-        # 来源匹配
-        if query.source and semantic_field.source != query.source:
-            return False
-        
-        # 标签匹配
-        if query.tags:
-            if not any(tag in semantic_field.tags for tag in query.tags):
-                return False
-        
-        return True
-    
     async def delete_field_semantic(self, instance_name: str, database_name: str,
                                   collection_name: str, field_path: str) -> bool:
         """删除字段语义信息"""
         try:
-            file_path = self._get_field_path(instance_name, database_name,
-                                           collection_name, field_path)
-            
-            if file_path.exists():
-                # 备份到删除记录
-                backup_path = self.base_path / "deleted" / f"{datetime.now().isoformat()}"
-                backup_path.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(file_path, backup_path / file_path.name)
+            fields = await self._load_collection(instance_name, database_name, collection_name)
+            data = fields.get(field_path)
+            
+            if data is not None:
+                # 备份到删除记录：直接写出内存中的语义数据，按天归档到同一目录
+                file_path = self._get_field_path(instance_name, database_name,
+                                               collection_name, field_path)
+                now = datetime.now()
+                backup_file = (self.base_path / "deleted" / now.strftime("%Y%m%d") /
+                               f"{now.strftime('%H%M%S_%f')}_{file_path.name}")
+                await self._save_file_async(backup_file, data)
                 
-                # 删除主文件
-                file_path.unlink()
+                # 从集合文档中删除（备份期间集合可能被刷新或换出，修改前重新获取）
+                fields = await self._load_collection(instance_name, database_name, collection_name)
+                if fields.pop(field_path, None) is None:
+                    return False
+                self._bump_stat("total_fields", -1)
+                success = await self._commit_collection(
+                    self._get_collection_file(instance_name, database_name, collection_name),
+                    field_path
+                )
                 
                 # 删除版本历史
                 if self.enable_versioning:
@@ -360,9 +923,13 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
                         instance_name, database_name, collection_name, field_path
                     )
                     if version_path.exists():
+                        for entry in _scan_dir(version_path):
+                            if entry.is_file(follow_symlinks=False):
+                                self._remove_version_file(Path(entry.path))
                         shutil.rmtree(version_path)
+                        self._known_dirs.discard(version_path)
                 
-                return True
+                return success
             
             return False
             
@@ -381,27 +948,12 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
         results = {}
         
         try:
-            collection_path = (self.base_path / "instances" / instance_name /
-                             "databases" / database_name / "collections" / collection_name)
-            
-            if not collection_path.exists():
-                return results
-            
-            # 并发加载所有字段文件
-            tasks = []
-            for field_file in collection_path.glob("*.json"):
-                field_path = field_file.stem.replace('_', '/')
-                task = self.get_field_semantic(
-                    instance_name, database_name, collection_name, field_path
-                )
-                tasks.append((field_path, task))
+            fields = await self._load_collection(instance_name, database_name, collection_name)
             
-            # 等待所有任务完成
-            for field_path, task in tasks:
+            for field_path, data in list(fields.items()):
                 try:
-                    semantic_field = await task
-                    if semantic_field:
-                        results[field_path] = semantic_field
+                    if data:
+                        results[field_path] = SemanticField.from_dict(data)
                 except Exception as e:
                     logger.warning(f"获取字段{field_path}语义失败", error=str(e))
         
@@ -416,37 +968,50 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
     
     async def detect_conflicts(self, instance_name: str, database_name: str,
                              collection_name: str, field_path: str,
-                             new_semantic: SemanticField) -> List[SemanticConflictInfo]:
-        """检测语义冲突"""
-        conflicts = []
+                             new_semantic: SemanticField,
+                             existing: Optional[Dict[str, Any]] = None) -> List[SemanticConflictInfo]:
+        """
+        检测语义冲突
         
+        Args:
+            existing: 调用方已持有的现有语义数据（字典形式），提供时不再重新读取
+        """
         try:
-            # 获取现有语义
-            existing_semantic = await self.get_field_semantic(
-                instance_name, database_name, collection_name, field_path
-            )
+            # 获取现有语义（直接比较字典，不构造SemanticField）
+            if existing is None:
+                fields = await self._load_collection(instance_name, database_name, collection_name)
+                existing = fields.get(field_path)
             
-            if existing_semantic:
-                # 检查业务含义冲突
-                if (existing_semantic.business_meaning != new_semantic.business_meaning and
-                    existing_semantic.business_meaning and new_semantic.business_meaning):
-                    
-                    confidence_diff = abs(existing_semantic.confidence - new_semantic.confidence)
-                    
-                    conflict = SemanticConflictInfo(
-                        field_path=field_path,
-                        existing_meaning=existing_semantic.business_meaning,
-                        new_meaning=new_semantic.business_meaning,
-                        confidence_diff=confidence_diff,
-                        # 自动解决策略
-                        resolution_strategy="prefer_higher_confidence" if confidence_diff > 0.2 else "manual"
-                    )
-                    conflicts.append(conflict)
+            return self._find_conflicts(field_path, existing,
+                                        new_semantic.business_meaning, new_semantic.confidence)
         
         except Exception as e:
             logger.error("检测语义冲突失败", error=str(e))
+            return []
+    
+    @staticmethod
+    def _find_conflicts(field_path: str, existing: Optional[Dict[str, Any]],
+                        new_meaning: str, new_confidence: float) -> List[SemanticConflictInfo]:
+        """比较现有语义与新业务含义，返回冲突列表"""
+        if not existing:
+            return []
+        
+        existing_meaning = existing.get("business_meaning", "")
+        
+        # 检查业务含义冲突
+        if existing_meaning == new_meaning or not existing_meaning or not new_meaning:
+            return []
         
-        return conflicts
+        confidence_diff = abs(existing.get("confidence", 0.0) - new_confidence)
+        
+        return [SemanticConflictInfo(
+            field_path=field_path,
+            existing_meaning=existing_meaning,
+            new_meaning=new_meaning,
+            confidence_diff=confidence_diff,
+            # 自动解决策略
+            resolution_strategy="prefer_higher_confidence" if confidence_diff > 0.2 else "manual"
+        )]
     
     async def resolve_conflict(self, conflict: SemanticConflictInfo,
                              resolution_strategy: str) -> bool:
@@ -493,8 +1058,7 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
                 return history
             
             # 获取所有版本文件，按时间排序
-            version_files = sorted(version_path.glob("*.json"), 
-                                 key=lambda f: f.stat().st_mtime, reverse=True)
+            version_files = sorted(version_path.glob("*.json"), key=_version_time, reverse=True)
             
             for version_file in version_files[:limit]:
                 try:
@@ -514,24 +1078,30 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
                                      collection_name: str, snapshot_name: str) -> bool:
         """创建语义快照"""
         try:
-            # 获取集合的所有语义数据
-            semantics = await self.get_collection_semantics(
-                instance_name, database_name, collection_name
-            )
+            # 获取集合的所有语义数据（取条目快照，写入期间集合仍可被修改）
+            fields = await self._load_collection(instance_name, database_name, collection_name)
+            items = list(fields.items())
             
-            # 创建快照数据
-            snapshot_data = {
+            # 快照头部信息
+            header = {
                 "timestamp": datetime.now().isoformat(),
                 "instance_name": instance_name,
                 "database_name": database_name,
-                "collection_name": collection_name,
-                "semantics": {path: field.to_dict() for path, field in semantics.items()}
+                "collection_name": collection_name
             }
             
-            # 保存快照
+            # 逐条流式写入快照
             snapshot_file = (self.snapshots_path / 
                            f"{instance_name}_{database_name}_{collection_name}_{snapshot_name}.json")
-            success = await self._save_file_async(snapshot_file, snapshot_data)
+            is_new = not snapshot_file.exists()
+            loop = asyncio.get_running_loop()
+            async with self.batch_operation():
+                success = await loop.run_in_executor(
+                    self.thread_pool, self._write_snapshot_sync, snapshot_file, header, items,
+                    self._write_durability()
+                )
+            if success and is_new:
+                self._bump_stat("total_snapshots", 1)
             
             if success:
                 logger.info("语义快照创建成功",
@@ -563,23 +1133,45 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
             if not snapshot_data:
                 return False
             
-            # 恢复语义数据
+            # 恢复语义数据：按摘要比较，只恢复与当前内容不同的字段
             semantics = snapshot_data.get("semantics", {})
-            semantic_fields = {path: SemanticField.from_dict(data) 
-                             for path, data in semantics.items()}
-            
-            # 批量保存
-            results = await self.batch_save_semantics(
-                instance_name, database_name, collection_name, semantic_fields
+            snapshot_digest = _CollectionDigest(semantics)
+            current_digest = await self._get_collection_digest(
+                instance_name, database_name, collection_name
             )
             
-            success_count = sum(1 for r in results.values() if r)
+            # 集合摘要与字段集合均相同，视为无需恢复
+            if (snapshot_digest.value == current_digest.value and
+                    snapshot_digest.fields.keys() == current_digest.fields.keys()):
+                logger.info("快照内容与当前一致，跳过恢复",
+                           instance=instance_name,
+                           database=database_name,
+                           collection=collection_name,
+                           snapshot=snapshot_name)
+                return True
+            
+            changed = [path for path, digest in snapshot_digest.fields.items()
+                       if current_digest.fields.get(path) != digest]
+            if not changed:
+                return True
+            
+            # 批量保存：快照中的字典直接写入集合文档，不经过SemanticField往返转换
+            collection_file = self._get_collection_file(instance_name, database_name, collection_name)
+            async with self.batch_operation():
+                results = await asyncio.gather(*(
+                    self._save_raw_field(instance_name, database_name, collection_name,
+                                         path, semantics[path])
+                    for path in changed
+                ))
+            
+            success_count = 0 if collection_file in self._dirty_collections else sum(results)
             logger.info("从快照恢复完成",
                        instance=instance_name,
                        database=database_name,
                        collection=collection_name,
                        snapshot=snapshot_name,
                        restored=success_count,
+                       unchanged=len(semantics) - len(changed),
                        total=len(semantics))
             
             return success_count > 0
@@ -600,13 +1192,14 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
             if not self.versions_path.exists():
                 return 0
             
-            # 遍历所有版本文件
+            # 遍历所有版本文件（内容池由引用计数管理，不直接清理）
             for version_file in self.versions_path.rglob("*.json"):
+                if version_file.parent.name == _VERSION_POOL:
+                    continue
                 try:
-                    # 检查文件修改时间
-                    mtime = datetime.fromtimestamp(version_file.stat().st_mtime)
-                    if mtime < cutoff_time:
-                        version_file.unlink()
+                    # 检查版本时间
+                    if _version_time(version_file) < cutoff_time:
+                        self._remove_version_file(version_file)
                         cleaned_count += 1
                 except Exception as e:
                     logger.warning(f"清理版本文件{version_file}失败", error=str(e))
@@ -619,60 +1212,80 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
         return cleaned_count
     
     async def get_storage_stats(self) -> Dict[str, Any]:
-        """获取存储统计信息"""
-        stats = {
-            "total_instances": 0,
-            "total_databases": 0,
-            "total_collections": 0,
-            "total_fields": 0,
-            "total_versions": 0,
-            "total_snapshots": 0,
-            "storage_size_bytes": 0,
-            "last_updated": None
-        }
+        """获取存储统计信息（增量维护，仅首次调用时全量扫描）"""
+        if self._stats is None:
+            stats = await self._compute_storage_stats()
+            if stats is None:
+                return {**dict.fromkeys(_STAT_KEYS, 0), "last_updated": None}
+            with self._stats_lock:
+                if self._stats is None:
+                    self._stats = stats
+        
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["last_updated"] = datetime.now().isoformat()
+        return stats
+    
+    async def _compute_storage_stats(self) -> Optional[Dict[str, int]]:
+        """全量扫描存储目录计算统计信息"""
+        stats = dict.fromkeys(_STAT_KEYS, 0)
         
         try:
             instances_path = self.base_path / "instances"
-            if instances_path.exists():
-                for instance_path in instances_path.iterdir():
-                    if instance_path.is_dir():
-                        stats["total_instances"] += 1
-                        
-                        databases_path = instance_path / "databases"
-                        if databases_path.exists():
-                            for db_path in databases_path.iterdir():
-                                if db_path.is_dir():
-                                    stats["total_databases"] += 1
-                                    
-                                    collections_path = db_path / "collections"
-                                    if collections_path.exists():
-                                        for collection_path in collections_path.iterdir():
-                                            if collection_path.is_dir():
-                                                stats["total_collections"] += 1
-                                                
-                                                field_count = len(list(collection_path.glob("*.json")))
-                                                stats["total_fields"] += field_count
-            
-            # 统计版本文件
-            if self.versions_path.exists():
-                stats["total_versions"] = len(list(self.versions_path.rglob("*.json")))
-            
-            # 统计快照文件
-            if self.snapshots_path.exists():
-                stats["total_snapshots"] = len(list(self.snapshots_path.glob("*.json")))
-            
-            # 计算存储大小
-            stats["storage_size_bytes"] = sum(
-                f.stat().st_size for f in self.base_path.rglob("*") if f.is_file()
-            )
+            for instance_name in _subdir_names(instances_path):
+                stats["total_instances"] += 1
+                stats["total_databases"] += len(
+                    _subdir_names(instances_path / instance_name / "databases")
+                )
             
-            stats["last_updated"] = datetime.now().isoformat()
+            for instance_name, database_name, collection_name in self._list_collections():
+                stats["total_collections"] += 1
+                fields = await self._load_collection(instance_name, database_name, collection_name)
+                stats["total_fields"] += len(fields)
+            
+            # 单次遍历同时统计版本文件、快照文件与存储大小（硬链接只计一次大小）
+            versions_prefix = os.path.join(str(self.versions_path), "")
+            snapshots_dir = str(self.snapshots_path)
+            linked_inodes = set()
+            for entry in _walk_files(self.base_path):
+                st = entry.stat(follow_symlinks=False)
+                if st.st_nlink > 1:
+                    if (st.st_dev, st.st_ino) in linked_inodes:
+                        st = None
+                    else:
+                        linked_inodes.add((st.st_dev, st.st_ino))
+                if st is not None:
+                    stats["storage_size_bytes"] += st.st_size
+                if not entry.name.endswith(".json"):
+                    continue
+                if entry.path.startswith(versions_prefix):
+                    if os.path.basename(os.path.dirname(entry.path)) != _VERSION_POOL:
+                        stats["total_versions"] += 1
+                elif os.path.dirname(entry.path) == snapshots_dir:
+                    stats["total_snapshots"] += 1
             
         except Exception as e:
             logger.error("获取存储统计失败", error=str(e))
+            return None
         
         return stats
     
+    async def close(self):
+        """写回未保存的集合并持久化统计信息"""
+        await self.flush_collections()
+        
+        if self._stats is not None:
+            with self._stats_lock:
+                stats = dict(self._stats)
+            # 统计文件自身不计入存储大小，下次启动读取后即删除
+            if not self._save_file_sync(self._stats_path, stats):
+                logger.warning("保存存储统计失败")
+        
+        await self._sync_pending()
+        await self.file_manager.close()
+        self._close_aio_context()
+        self.thread_pool.shutdown(wait=True)
+    
     async def health_check(self) -> Dict[str, Any]:
         """健康检查"""
         health = {
@@ -688,7 +1301,7 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
             
             # 检查缓存状态
             if hasattr(self.file_manager, 'cache'):
-                cache_info = self.file_manager.cache.get_stats()
+                cache_info = await self.file_manager.get_cache_stats()
                 health["checks"]["cache_status"] = cache_info
             
             # 检查线程池
@@ -711,72 +1324,289 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
         return health
     
     # 辅助方法
-    async def _save_file_async(self, file_path: Path, data: Dict[str, Any]) -> bool:
-        """异步保存文件"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.thread_pool, self._save_file_sync, file_path, data)
+    def _ensure_dir(self, directory: Path):
+        """确保目录存在（已创建过的目录直接跳过）"""
+        if directory not in self._known_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            # 多线程下可能重复创建，mkdir(exist_ok=True)本身是幂等的
+            self._known_dirs.add(directory)
+    
+    def _get_aio_context(self):
+        """获取当前事件循环的caio上下文，不可用时返回None"""
+        if not self.enable_native_aio:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        if self._aio_context is None or self._aio_loop is not loop:
+            # 上下文绑定创建时的事件循环，切换事件循环时关闭旧上下文
+            self._close_aio_context()
+            self._aio_context = caio.AsyncioContext(max_requests=128)
+            self._aio_loop = loop
+        return self._aio_context
+    
+    def _close_aio_context(self):
+        """关闭caio上下文"""
+        aio_context, self._aio_context, self._aio_loop = self._aio_context, None, None
+        if aio_context is None:
+            return
+        try:
+            aio_context.close()
+        except Exception as e:
+            logger.warning("关闭caio上下文失败", error=str(e))
+    
+    def _open_aio_temp(self, temp_path: Path) -> int:
+        """创建目录并打开待写入的临时文件（在线程池中执行）"""
+        self._ensure_dir(temp_path.parent)
+        return os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    
+    def _finish_aio_write(self, fd: int, payload: bytes, offset: int, fsync: bool,
+                          temp_path: Path, file_path: Path) -> None:
+        """
+        写入caio未写完的部分、关闭临时文件并替换目标文件（在线程池中执行）
+
+        caio只接受bytes，短写时剩余部分在此通过memoryview写入，不复制负载
+        """
+        try:
+            view = memoryview(payload)
+            while offset < len(payload):
+                offset += os.pwrite(fd, view[offset:], offset)
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._replace_file(temp_path, file_path, len(payload))
+    
+    def _open_for_read(self, file_path: Path) -> Optional[Tuple[int, int]]:
+        """打开文件并返回 (描述符, 大小)，文件不存在时返回None（在线程池中执行）"""
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            return fd, os.fstat(fd).st_size
+        except BaseException:
+            os.close(fd)
+            raise
+    
+    async def _save_file_async(self, file_path: Path, data: Union[Dict[str, Any], bytes]) -> bool:
+        """异步保存文件（data为bytes时视为已编码的JSON）"""
+        durability = self._write_durability()
+        aio_context = self._get_aio_context()
+        if aio_context is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                self.thread_pool, self._save_file_sync, file_path, data, durability
+            )
+        
+        # 同一线程内可能有多个协程并发写入，临时文件名使用递增序号区分
+        temp_path = file_path.with_name(
+            f".{file_path.name}.{os.getpid()}.aio{next(self._temp_counter)}.tmp"
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            payload = data if isinstance(data, bytes) else json_codec.dumps(data)
+            
+            # 打开、关闭与重命名可能阻塞在慢速磁盘上，放到线程池中执行
+            fd = await loop.run_in_executor(self.thread_pool, self._open_aio_temp, temp_path)
+            try:
+                offset = await aio_context.write(payload, fd, 0) if payload else 0
+                # 短写时剩余部分在线程池中写入并落盘
+                fsync = durability == "per_call" and offset < len(payload)
+                if durability == "per_call" and not fsync:
+                    await aio_context.fdsync(fd)
+            except BaseException:
+                await loop.run_in_executor(self.thread_pool, os.close, fd)
+                raise
+            await loop.run_in_executor(self.thread_pool, self._finish_aio_write,
+                                       fd, payload, offset, fsync, temp_path, file_path)
+            if durability == "batch":
+                self._pending_fsync.add(file_path)
+            return True
+            
+        except Exception as e:
+            logger.error(f"保存文件{file_path}失败", error=str(e))
+            try:
+                await loop.run_in_executor(self.thread_pool, os.unlink, temp_path)
+            except OSError:
+                pass
+            return False
     
     async def _load_file_async(self, file_path: Path) -> Optional[Dict[str, Any]]:
         """异步加载文件"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.thread_pool, self._load_file_sync, file_path)
+        aio_context = self._get_aio_context()
+        if aio_context is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.thread_pool, self._load_file_sync, file_path)
+        
+        loop = asyncio.get_running_loop()
+        try:
+            opened = await loop.run_in_executor(self.thread_pool, self._open_for_read, file_path)
+        except Exception as e:
+            logger.error(f"加载文件{file_path}失败", error=str(e))
+            return None
+        if opened is None:
+            return None
+        
+        fd, size = opened
+        try:
+            chunks = []
+            offset = 0
+            while offset < size:
+                chunk = await aio_context.read(size - offset, fd, offset)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                offset += len(chunk)
+            return json_codec.loads(b"".join(chunks))
+            
+        except Exception as e:
+            logger.error(f"加载文件{file_path}失败", error=str(e))
+            return None
+        finally:
+            await loop.run_in_executor(self.thread_pool, os.close, fd)
     
-    def _save_file_sync(self, file_path: Path, data: Dict[str, Any]) -> bool:
-        """同步保存文件"""
+    def _save_file_sync(self, file_path: Path, data: Union[Dict[str, Any], bytes],
+                        durability: Optional[str] = None) -> bool:
+        """
+        同步保存文件（data为bytes时视为已编码的JSON）
+        
+        Args:
+            durability: 持久化方式，默认按当前状态决定（见_write_durability）
+        """
+        if durability is None:
+            durability = self._write_durability()
+        # 临时文件名按进程/线程固定，同一线程内的写入串行执行，不会互相覆盖
+        temp_path = file_path.with_name(
+            f".{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
         try:
             # 创建目录
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 原子写入
-            with tempfile.NamedTemporaryFile(
-                mode='w', 
-                dir=file_path.parent, 
-                delete=False,
-                encoding='utf-8'
-            ) as temp_file:
-                json.dump(data, temp_file, ensure_ascii=False, indent=2)
-                temp_file.flush()
-                
-                # 原子重命名
-                temp_path = Path(temp_file.name)
-                temp_path.replace(file_path)
+            self._ensure_dir(file_path.parent)
+            
+            payload = memoryview(data if isinstance(data, bytes) else json_codec.dumps(data))
+            size = len(payload)
             
+            # 直接通过文件描述符写入，避免文件对象和缓冲区的额外分配
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                while payload:
+                    written = os.write(fd, payload)
+                    payload = payload[written:]
+                if durability == "per_call":
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            
+            # 原子重命名
+            self._replace_file(temp_path, file_path, size)
+            if durability == "batch":
+                self._pending_fsync.add(file_path)
             return True
             
         except Exception as e:
             logger.error(f"保存文件{file_path}失败", error=str(e))
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
             return False
     
-    def _load_file_sync(self, file_path: Path) -> Optional[Dict[str, Any]]:
-        """同步加载文件"""
+    def _write_snapshot_sync(self, snapshot_file: Path, header: Dict[str, Any],
+                             items: List[Tuple[str, Dict[str, Any]]],
+                             durability: str = "per_call") -> bool:
+        """
+        流式写入快照文件
+        
+        按 {头部字段..., "semantics": {path: 语义, ...}} 的结构逐条编码写入，
+        不在内存中构造完整的快照字典和编码结果。
+        """
+        temp_path = snapshot_file.with_name(
+            f".{snapshot_file.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
         try:
-            if not file_path.exists():
-                return None
+            self._ensure_dir(snapshot_file.parent)
+            
+            with open(temp_path, 'wb') as f:
+                # 头部编码结果以 } 结尾，替换为 semantics 字段的开头
+                f.write(json_codec.dumps(header)[:-1])
+                f.write(b',"semantics":{' if header else b'"semantics":{')
+                for i, (field_path, data) in enumerate(items):
+                    if i:
+                        f.write(b',')
+                    f.write(json_codec.dumps(field_path))
+                    f.write(b':')
+                    f.write(json_codec.dumps(data))
+                f.write(b'}}')
+                size = f.tell()
+                if durability == "per_call":
+                    f.flush()
+                    os.fsync(f.fileno())
+            
+            self._replace_file(temp_path, snapshot_file, size)
+            if durability == "batch":
+                self._pending_fsync.add(snapshot_file)
+            return True
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        except Exception as e:
+            logger.error(f"写入快照{snapshot_file}失败", error=str(e))
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return False
+    
+    def _load_file_sync(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """同步加载文件（较大的文件通过mmap直接解析，避免读入缓冲区的拷贝）"""
+        try:
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < _MMAP_THRESHOLD:
+                    return json_codec.loads(f.read())
+                
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # 关闭mmap前必须先释放对其的内存视图
+                    with memoryview(mm) as view:
+                        return json_codec.loads(view)
                 
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"加载文件{file_path}失败", error=str(e))
             return None
     
     async def _save_version(self, instance_name: str, database_name: str,
                           collection_name: str, field_path: str,
-                          semantic_field: SemanticField):
+                          data: Dict[str, Any]):
         """保存版本历史"""
         try:
             version_dir = self._get_version_path(
                 instance_name, database_name, collection_name, field_path
             )
-            version_dir.mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(version_dir)
             
-            # 生成版本文件名
-            version_id = self._generate_version_id(semantic_field)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # 生成版本文件名（版本ID与版本文件共用同一份编码结果）
+            content = json_codec.dumps(data, sort_keys=True)
+            version_id = self._generate_version_id(content)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
             version_file = version_dir / f"{timestamp}_{version_id}.json"
             
-            # 保存版本数据
-            await self._save_file_async(version_file, semantic_field.to_dict())
+            # 版本内容按版本ID写入集合的内容池，相同内容只写一次，字段版本为指向它的硬链接
+            pool_dir = version_dir.parent / _VERSION_POOL
+            self._ensure_dir(pool_dir)
+            pool_file = pool_dir / f"{version_id}.json"
+            if not pool_file.exists() and not await self._save_file_async(pool_file, content):
+                return
+            
+            try:
+                os.link(pool_file, version_file)
+            except FileExistsError:
+                pass
+            except OSError:
+                # 文件系统不支持硬链接时退回写入完整副本
+                if await self._save_file_async(version_file, content):
+                    self._bump_stat("total_versions", 1)
+                self._release_pool_file(pool_file)
+            else:
+                self._bump_stat("total_versions", 1)
             
             # 清理旧版本（保持最大版本数限制）
             await self._cleanup_old_versions_for_field(version_dir, self.max_versions)
@@ -785,18 +1615,50 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
             logger.error("保存版本历史失败", error=str(e))
     
     async def _cleanup_old_versions_for_field(self, version_dir: Path, max_versions: int):
-        """清理单个字段的旧版本"""
+        """清理单个字段的旧版本（目录扫描、排序与删除在线程池中执行）"""
         try:
-            version_files = sorted(version_dir.glob("*.json"), 
-                                 key=lambda f: f.stat().st_mtime, reverse=True)
-            
-            # 删除超过限制的旧版本
-            for old_version in version_files[max_versions:]:
-                old_version.unlink()
-                
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.thread_pool, self._cleanup_versions_sync, version_dir, max_versions
+            )
         except Exception as e:
             logger.error("清理字段旧版本失败", error=str(e))
     
+    def _cleanup_versions_sync(self, version_dir: Path, max_versions: int):
+        """同步清理超过数量限制的旧版本"""
+        entries = [entry for entry in _scan_dir(version_dir)
+                   if entry.name.endswith(".json") and entry.is_file(follow_symlinks=False)]
+        if len(entries) <= max_versions:
+            return
+        
+        # 硬链接共享内容池文件的修改时间，按文件名中的时间戳排序
+        version_files = sorted((Path(entry.path) for entry in entries), key=_version_time, reverse=True)
+        
+        # 删除超过限制的旧版本
+        for old_version in version_files[max_versions:]:
+            self._remove_version_file(old_version)
+    
+    def _remove_version_file(self, version_file: Path):
+        """删除字段版本文件，内容池文件不再被引用时一并删除"""
+        st = os.stat(version_file)
+        os.unlink(version_file)
+        self._bump_stat("total_versions", -1)
+        if st.st_nlink == 1:
+            # 未共享内容的版本文件（旧版或未能建立硬链接）
+            self._bump_stat("storage_size_bytes", -st.st_size)
+            return
+        
+        version_id = version_file.stem.rsplit("_", 1)[-1]
+        self._release_pool_file(version_file.parent.parent / _VERSION_POOL / f"{version_id}.json")
+    
+    def _release_pool_file(self, pool_file: Path):
+        """内容池文件只剩自身一个链接时删除"""
+        try:
+            if os.stat(pool_file).st_nlink == 1:
+                self._unlink_file(pool_file)
+        except FileNotFoundError:
+            pass
+    
     async def _record_conflicts(self, conflicts: List[SemanticConflictInfo]):
         """记录冲突信息"""
         try:
@@ -815,4 +1677,8 @@ class EnhancedLocalSemanticStorage(SemanticStorageInterface):
     def __del__(self):
         """析构函数，清理资源"""
         if hasattr(self, 'thread_pool'):
-            self.thread_pool.shutdown(wait=False)
\ No newline at end of file
+            self.thread_pool.shutdown(wait=False)
+
+
+# 供语义存储工厂注册的实现类
+STORAGE_CLASS = EnhancedLocalSemanticStorage
@@ -5,23 +5,57 @@
 提供基于JSON文件的元数据存储和管理功能，替代MongoDB存储
 """
 
-import json
+import os
+import sys
+import gzip
+import time
 import asyncio
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Tuple, Iterator, Callable, Iterable
 from datetime import datetime
 import aiofiles
 import structlog
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 import uuid
-import copy
+
+from storage import json_codec
+
+try:
+    import caio
+except ImportError:
+    caio = None  # 未安装caio时使用线程池执行文件IO
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # 未安装msgpack时只能使用JSON格式
 
 logger = structlog.get_logger(__name__)
 
+# 元数据文件格式及对应后缀（逻辑路径统一以 .json 表示）
+_JSON_SUFFIX = '.json'
+_GZIP_SUFFIX = '.gz'
+_FORMAT_SUFFIXES = {
+    "json": _JSON_SUFFIX,
+    "gzip": _JSON_SUFFIX + _GZIP_SUFFIX,
+    "msgpack": '.mp',
+}
+_JSON_SUFFIXES = tuple(_FORMAT_SUFFIXES.values())
+
+# 不小于该大小（字节）的文件在线程池中读取并解析，避免长时间阻塞事件循环
+_THREAD_PARSE_THRESHOLD = 1 << 20
+
+# 目录清单记录的文件后缀（含查询历史的 .jsonl）
+_INVENTORY_SUFFIXES = _JSON_SUFFIXES + ('.jsonl',)
+
 
 @dataclass
 class InstanceMetadata:
     """实例元数据"""
+    __slots__ = ('id', 'instance_name', 'instance_alias', 'connection_string', 'description',
+                 'environment', 'status', 'created_at', 'updated_at')
+
     id: str
     instance_name: str
     instance_alias: Optional[str]
@@ -36,6 +70,9 @@ class InstanceMetadata:
 @dataclass
 class DatabaseMetadata:
     """数据库元数据"""
+    __slots__ = ('id', 'instance_id', 'database_name', 'collection_count', 'estimated_size',
+                 'description', 'created_at', 'updated_at')
+
     id: str
     instance_id: str
     database_name: str
@@ -49,6 +86,10 @@ class DatabaseMetadata:
 @dataclass
 class CollectionMetadata:
     """集合元数据"""
+    __slots__ = ('id', 'instance_id', 'database_name', 'collection_name', 'document_count',
+                 'estimated_size', 'has_index', 'field_count', 'sample_document', 'created_at',
+                 'updated_at')
+
     id: str
     instance_id: str
     database_name: str
@@ -65,6 +106,10 @@ class CollectionMetadata:
 @dataclass
 class FieldMetadata:
     """字段元数据"""
+    __slots__ = ('id', 'instance_id', 'database_name', 'collection_name', 'field_path',
+                 'field_type', 'is_required', 'unique_values_count', 'examples',
+                 'business_meaning', 'confidence', 'created_at', 'updated_at')
+
     id: str
     instance_id: str
     database_name: str
@@ -83,6 +128,10 @@ class FieldMetadata:
 @dataclass
 class QueryHistory:
     """查询历史"""
+    __slots__ = ('id', 'instance_name', 'database_name', 'collection_name', 'query_type',
+                 'query_content', 'result_count', 'execution_time_ms', 'user_description',
+                 'created_at')
+
     id: str
     instance_name: str
     database_name: str
@@ -95,6 +144,162 @@ class QueryHistory:
     created_at: str
 
 
+def _to_dict(obj: Any) -> Dict[str, Any]:
+    """将扁平的元数据dataclass转换为dict（浅拷贝，避免asdict的递归深拷贝）"""
+    return {name: getattr(obj, name) for name in obj.__dataclass_fields__}
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """msgpack不支持的类型转换（与orjson一致，日期时间输出ISO格式）"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"无法序列化类型: {type(obj).__name__}")
+
+
+def _logical_path(path: str) -> str:
+    """实际文件路径转换为以 .json 结尾的逻辑路径"""
+    for suffix in _JSON_SUFFIXES:
+        if suffix != _JSON_SUFFIX and path.endswith(suffix):
+            return path[:-len(suffix)] + _JSON_SUFFIX
+    return path
+
+
+def _filter_by_instance_id(records: Iterable[Optional[Dict[str, Any]]], instance_id: str) -> List[Dict[str, Any]]:
+    """筛选属于指定实例的记录（跳过读取失败的空记录）"""
+    return [record for record in records if record and record.get("instance_id") == instance_id]
+
+
+def _iter_json(directory: Path, prefix: str = "",
+               suffixes: Tuple[str, ...] = _JSON_SUFFIXES) -> Iterator[os.DirEntry]:
+    """用 os.scandir 遍历目录下指定前缀的JSON文件，不构造Path对象"""
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                name = entry.name
+                if name.endswith(suffixes) and name.startswith(prefix) and entry.is_file():
+                    yield entry
+    except FileNotFoundError:
+        return
+
+
+def _dir_mtime_ns(directory: str) -> Optional[int]:
+    """目录的 mtime_ns（目录内新建、删除或重命名文件时变化），目录不存在时返回None"""
+    try:
+        return os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _parse_jsonl(content: bytes) -> List[Any]:
+    """解析JSON Lines内容，跳过空行和写入中断留下的残缺行"""
+    records = []
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json_codec.loads(line))
+        except ValueError:
+            logger.warning("跳过无法解析的查询历史行", line=line[:80])
+    return records
+
+
+def _decode_content(path: str, content: bytes, loads: Callable[[bytes], Any]) -> Any:
+    """按文件后缀解码元数据文件内容"""
+    if path.endswith(_GZIP_SUFFIX):
+        return loads(gzip.decompress(content))
+    if path.endswith(_FORMAT_SUFFIXES["msgpack"]):
+        return msgpack.unpackb(content, raw=False, strict_map_key=False)
+    return loads(content)
+
+
+def _read_file_bytes(path: str) -> bytes:
+    """同步读取文件全部内容"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _load_parse(path: str, loads: Callable[[bytes], Any]) -> Any:
+    """读取并解析文件（在线程池中执行）"""
+    return _decode_content(path, _read_file_bytes(path), loads)
+
+
+def _history_sort_key(path: str) -> Tuple[str, bool]:
+    """查询历史文件排序键：按日期，同日的JSONL文件晚于旧版JSON文件"""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return stem, ext == '.jsonl'
+
+
+class _MetadataCache:
+    """按文件路径缓存已解析的元数据，以 (mtime_ns, size) 校验有效性"""
+
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, Tuple[int, int, Any]]" = OrderedDict()
+
+    def get(self, key: str, st: os.stat_result) -> Optional[Any]:
+        """文件未变化时返回缓存对象，否则返回None"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, key: str, st: os.stat_result, data: Any) -> None:
+        """写入缓存，满载时淘汰最久未使用的条目"""
+        self._entries[key] = (st.st_mtime_ns, st.st_size, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """移除指定路径的缓存"""
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _NegativeCache:
+    """
+    记录已确认不存在的键，超出容量时按先进先出淘汰
+
+    每个键同时记录确认时所在目录的 mtime_ns，其他进程在该目录中新建文件后目录 mtime 变化，条目随之失效；
+    距上次确认不超过 ttl 秒的命中不再检查目录，其他进程的新文件最多延迟 ttl 秒可见
+    """
+
+    def __init__(self, capacity: int = 4096, ttl: float = 1.0):
+        self.capacity = capacity
+        self.ttl = ttl
+        # 键 -> [目录, 目录 mtime_ns, 上次确认时间]
+        self._keys: "OrderedDict[str, List[Any]]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._keys.get(key)
+        if entry is None:
+            return False
+        now = time.monotonic()
+        if now - entry[2] <= self.ttl:
+            return True
+        if _dir_mtime_ns(entry[0]) != entry[1]:
+            del self._keys[key]
+            return False
+        entry[2] = now
+        return True
+
+    def add(self, key: str, directory: str, dir_mtime_ns: Optional[int]) -> None:
+        """记录不存在的键，dir_mtime_ns 需在确认不存在之前取得"""
+        self._keys[key] = [directory, dir_mtime_ns, time.monotonic()]
+        while len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        """移除键（对应文件已写入）"""
+        self._keys.pop(key, None)
+
+    def clear(self) -> None:
+        self._keys.clear()
+
+
 class FileMetadataManager:
     """基于文件的元数据管理器"""
     
@@ -114,6 +319,36 @@ class FileMetadataManager:
         self.last_scan_time: Dict[str, datetime] = {}
         self._lock = asyncio.Lock()
         
+        # 元数据文件写入格式，由 config.json 中的 serialization 与 compression_enabled 决定
+        self.compression_enabled = False
+        self.serialization = "json"
+        self._set_write_format("json")
+        
+        # 已解析文件缓存，命中时免去读取与JSON解析
+        self._file_cache = _MetadataCache()
+        
+        # 已确认不存在的文件路径与实例名，重复探测时不再访问文件系统
+        self._negative_paths = _NegativeCache()
+        self._missing_instances = _NegativeCache()
+        
+        # 各目录的文件名清单：目录 -> (扫描时的目录 mtime_ns, 文件名集合)，
+        # 目录 mtime 变化（包括其他进程写入）时重新扫描
+        self._inventory: Dict[str, Tuple[Optional[int], set]] = {}
+        
+        # 限制批量读取时同时打开的文件数
+        self._read_semaphore = asyncio.Semaphore(32)
+        
+        # Linux上优先使用caio（io_uring/libaio）提交内核异步读，上下文按事件循环惰性创建
+        self.enable_native_aio = caio is not None and sys.platform.startswith("linux")
+        self._aio_context = None
+        self._aio_loop = None
+        
+        # 待写回的字段（分片路径 -> 字段路径 -> 字段记录），并发保存的字段合并写回
+        self._pending_fields: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        
+        # 不小于该大小的文件在线程池中读取并解析
+        self.thread_parse_threshold = _THREAD_PARSE_THRESHOLD
+        
         # 统计信息
         self._scan_stats = {
             'total_scans': 0,
@@ -128,7 +363,8 @@ class FileMetadataManager:
         try:
             # 创建全局配置文件
             config_file = self.base_path / "config.json"
-            if not config_file.exists():
+            config = await self._read_json_file(config_file)
+            if config is None:
                 config = {
                     "version": "1.0.0",
                     "created_at": datetime.now().isoformat(),
@@ -136,6 +372,15 @@ class FileMetadataManager:
                     "compression_enabled": False
                 }
                 await self._write_json_file(config_file, config)
+            self.compression_enabled = bool(config.get("compression_enabled", False))
+            self.serialization = config.get("serialization", "json")
+            if self.serialization == "msgpack" and msgpack is None:
+                logger.warning("未安装msgpack，元数据继续以JSON格式存储")
+                self.serialization = "json"
+            if self.serialization == "msgpack":
+                self._set_write_format("msgpack")
+            else:
+                self._set_write_format("gzip" if self.compression_enabled else "json")
             
             logger.info("文件元数据管理器初始化完成", base_path=str(self.base_path))
             return True
@@ -143,19 +388,179 @@ class FileMetadataManager:
             logger.error("元数据管理器初始化失败", error=str(e))
             return False
     
+    def _set_write_format(self, fmt: str) -> None:
+        """设置写入格式，读取时优先探测该格式的文件"""
+        self._write_format = fmt
+        preferred = _FORMAT_SUFFIXES[fmt]
+        self._suffix_order = (preferred,) + tuple(
+            suffix for suffix in _JSON_SUFFIXES if suffix != preferred
+        )
+    
     async def _write_json_file(self, file_path: Path, data: Any) -> None:
-        """写入JSON文件"""
-        async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(data, ensure_ascii=False, indent=2))
+        """按当前格式写入元数据文件，并移除同名的其他格式旧文件"""
+        key = str(file_path)
+        base = key[:-len(_JSON_SUFFIX)] if key.endswith(_JSON_SUFFIX) else key
+        fmt = self._write_format
+        path = base + _FORMAT_SUFFIXES[fmt]
+        stale = tuple(base + suffix for suffix in _JSON_SUFFIXES if base + suffix != path)
+        
+        if fmt == "msgpack":
+            content = msgpack.packb(data, use_bin_type=True, default=_msgpack_default)
+        else:
+            content = json_codec.dumps(data, indent=fmt == "json")
+        
+        self._negative_paths.discard(key)
+        for variant in (path,) + stale:
+            self._file_cache.invalidate(variant)
+            self._negative_paths.discard(variant)
+        # 压缩、写入与清理旧文件合并为一次线程池调用
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_bytes_sync, path, content, stale, fmt == "gzip")
+        self._inventory_update(path, stale)
+    
+    @staticmethod
+    def _write_bytes_sync(path: str, content: bytes, stale: Tuple[str, ...], compress: bool) -> None:
+        """同步写入已编码的内容（在线程池中执行，临时文件落盘后原子替换，读取方不会看到半写文件）"""
+        if compress:
+            content = gzip.compress(content, compresslevel=6)
+        directory, name = os.path.split(path)
+        temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        for stale_path in stale:
+            try:
+                os.unlink(stale_path)
+            except FileNotFoundError:
+                pass
+    
+    async def _read_json_files(self, paths: List[str]) -> List[Optional[Any]]:
+        """并发读取多个JSON文件，结果顺序与路径一致"""
+        async def read(path: str) -> Optional[Any]:
+            async with self._read_semaphore:
+                return await self._read_json_file(path)
+        
+        return await asyncio.gather(*(read(path) for path in paths))
+    
+    def _list_json(self, directory: Path, prefix: str = "",
+                   suffixes: Tuple[str, ...] = _JSON_SUFFIXES) -> List[str]:
+        """从目录清单中列出匹配前缀与后缀的文件路径（首次访问或目录 mtime 变化时扫描目录）"""
+        key = str(directory)
+        mtime_ns = _dir_mtime_ns(key)
+        entry = self._inventory.get(key)
+        if entry is not None and entry[0] == mtime_ns:
+            names = entry[1]
+        else:
+            # 先取 mtime 再扫描，扫描期间的变化会在下次访问时被发现
+            names = {item.name for item in _iter_json(directory, suffixes=_INVENTORY_SUFFIXES)}
+            self._inventory[key] = (mtime_ns, names)
+        return [os.path.join(key, name) for name in names
+                if name.startswith(prefix) and name.endswith(suffixes)]
+    
+    def _inventory_update(self, written: str, removed: Tuple[str, ...] = ()) -> None:
+        """写入或删除文件后同步已加载的目录清单"""
+        directory, name = os.path.split(written)
+        entry = self._inventory.get(directory)
+        if entry is None:
+            return
+        names = entry[1]
+        names.add(name)
+        for removed_path in removed:
+            names.discard(os.path.basename(removed_path))
+    
+    def _stat_variant(self, key: str) -> Tuple[Optional[str], Optional[os.stat_result]]:
+        """定位实际存在的文件（.json 逻辑路径按写入格式优先依次探测各格式）"""
+        if key.endswith(_JSON_SUFFIX):
+            base = key[:-len(_JSON_SUFFIX)]
+            candidates = [base + suffix for suffix in self._suffix_order]
+        else:
+            candidates = [key]
+        
+        for path in candidates:
+            try:
+                return path, os.stat(path)
+            except FileNotFoundError:
+                self._file_cache.invalidate(path)
+        return None, None
+    
+    async def close(self) -> None:
+        """写回缓冲的字段（此前写入失败的）"""
+        await self.flush_fields()
+    
+    def _get_aio_context(self):
+        """获取当前事件循环的caio上下文，不可用时返回None"""
+        if not self.enable_native_aio:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        if self._aio_context is None or self._aio_loop is not loop:
+            self._aio_context = caio.AsyncioContext(max_requests=128)
+            self._aio_loop = loop
+        return self._aio_context
     
-    async def _read_json_file(self, file_path: Path) -> Optional[Any]:
-        """读取JSON文件"""
+    async def _read_bytes(self, path: str) -> bytes:
+        """读取文件全部内容（caio不可用时在线程池中一次完成打开、读取与关闭）"""
+        aio_context = self._get_aio_context()
+        if aio_context is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, _read_file_bytes, path)
+        
+        fd = os.open(path, os.O_RDONLY)
         try:
-            if not file_path.exists():
+            size = os.fstat(fd).st_size
+            chunks = []
+            offset = 0
+            while offset < size:
+                chunk = await aio_context.read(size - offset, fd, offset)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                offset += len(chunk)
+            return b"".join(chunks)
+        finally:
+            os.close(fd)
+    
+    async def _read_json_file(self, file_path: Union[str, Path],
+                              loads: Callable[[bytes], Any] = json_codec.loads) -> Optional[Any]:
+        """读取JSON文件（文件未修改时直接返回缓存结果）"""
+        key = str(file_path)
+        if key in self._negative_paths:
+            return None
+        try:
+            path, st = self._stat_variant(key)
+            if path is None:
+                # 记录目录 mtime 后再确认一次，避免漏掉两次访问之间新建的文件
+                directory = os.path.dirname(key)
+                dir_mtime_ns = _dir_mtime_ns(directory)
+                path, st = self._stat_variant(key)
+            if path is None:
+                self._negative_paths.add(key, directory, dir_mtime_ns)
                 return None
-            async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                return json.loads(content)
+            key = path
+            
+            cached = self._file_cache.get(key, st)
+            if cached is not None:
+                self._scan_stats['cache_hits'] += 1
+                return cached
+            
+            self._scan_stats['cache_misses'] += 1
+            if st.st_size >= self.thread_parse_threshold:
+                # 大文件的读取与解析交给线程池，解析期间事件循环可继续处理其他请求
+                loop = asyncio.get_running_loop()
+                data = await loop.run_in_executor(None, _load_parse, key, loads)
+            else:
+                data = _decode_content(key, await self._read_bytes(key), loads)
+            self._file_cache.put(key, st, data)
+            return data
         except Exception as e:
             logger.error(f"读取文件失败: {file_path}", error=str(e))
             return None
@@ -169,6 +574,7 @@ class FileMetadataManager:
     async def save_instance(self, target_instance_name: str, instance_config: Dict[str, Any]) -> str:
         """保存实例配置"""
         instance_id = self._generate_id()
+        now = datetime.now().isoformat()
         
         instance_metadata = InstanceMetadata(
             id=instance_id,
@@ -178,19 +584,23 @@ class FileMetadataManager:
             description=instance_config.get("description", ""),
             environment=instance_config.get("environment", "dev"),
             status=instance_config.get("status", "active"),
-            created_at=datetime.now().isoformat(),
-            updated_at=datetime.now().isoformat()
+            created_at=now,
+            updated_at=now
         )
         
         # 保存到文件
         instance_file = self.base_path / "instances" / f"{target_instance_name}.json"
-        await self._write_json_file(instance_file, asdict(instance_metadata))
+        await self._write_json_file(instance_file, _to_dict(instance_metadata))
+        self._missing_instances.clear()
         
         logger.info("实例配置已保存", instance_name=target_instance_name)
         return instance_id
     
     async def get_instance_by_name(self, target_instance_name: str, instance_name: str) -> Optional[Dict[str, Any]]:
         """根据名称获取实例信息"""
+        if instance_name in self._missing_instances:
+            return None
+        
         instance_file = self.base_path / "instances" / f"{instance_name}.json"
         data = await self._read_json_file(instance_file)
         
@@ -199,11 +609,14 @@ class FileMetadataManager:
         
         # 如果按实例名找不到，搜索所有实例文件
         instances_dir = self.base_path / "instances"
-        for file_path in instances_dir.glob("*.json"):
-            data = await self._read_json_file(file_path)
+        dir_mtime_ns = _dir_mtime_ns(str(instances_dir))
+        paths = self._list_json(instances_dir)
+        for data in await self._read_json_files(paths):
             if data and data.get("instance_name") == instance_name:
                 return data
         
+        # 记录未找到的实例名，保存任意实例或实例目录变化时失效
+        self._missing_instances.add(instance_name, str(instances_dir), dir_mtime_ns)
         return None
     
     async def get_all_instances(self, target_instance_name: str, environment: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -211,8 +624,9 @@ class FileMetadataManager:
         instances = []
         instances_dir = self.base_path / "instances"
         
-        for file_path in instances_dir.glob("*.json"):
-            data = await self._read_json_file(file_path)
+        paths = self._list_json(instances_dir)
+        
+        for data in await self._read_json_files(paths):
             if data:
                 if environment is None or data.get("environment") == environment:
                     instances.append(data)
@@ -224,6 +638,7 @@ class FileMetadataManager:
     async def save_database(self, target_instance_name: str, instance_id: str, db_info: Dict[str, Any]) -> str:
         """保存数据库信息"""
         db_id = self._generate_id()
+        now = datetime.now().isoformat()
         
         database_metadata = DatabaseMetadata(
             id=db_id,
@@ -232,34 +647,29 @@ class FileMetadataManager:
             collection_count=db_info.get("collection_count", 0),
             estimated_size=db_info.get("size_bytes", 0),
             description=db_info.get("description", ""),
-            created_at=datetime.now().isoformat(),
-            updated_at=datetime.now().isoformat()
+            created_at=now,
+            updated_at=now
         )
         
         # 保存到文件
         db_file = self.base_path / "databases" / f"{target_instance_name}_{db_info['name']}.json"
-        await self._write_json_file(db_file, asdict(database_metadata))
+        await self._write_json_file(db_file, _to_dict(database_metadata))
         
         logger.info("数据库信息已保存", instance=target_instance_name, database=db_info['name'])
         return db_id
     
     async def get_databases_by_instance(self, target_instance_name: str, instance_id: str) -> List[Dict[str, Any]]:
         """获取实例的所有数据库"""
-        databases = []
         databases_dir = self.base_path / "databases"
-        
-        for file_path in databases_dir.glob(f"{target_instance_name}_*.json"):
-            data = await self._read_json_file(file_path)
-            if data and data.get("instance_id") == instance_id:
-                databases.append(data)
-        
-        return databases
+        paths = self._list_json(databases_dir, f"{target_instance_name}_")
+        return _filter_by_instance_id(await self._read_json_files(paths), instance_id)
     
     # ==================== 集合管理 ====================
     
     async def save_collection(self, target_instance_name: str, instance_id: str, collection_info: Dict[str, Any]) -> str:
         """保存集合信息"""
         collection_id = self._generate_id()
+        now = datetime.now().isoformat()
         
         collection_metadata = CollectionMetadata(
             id=collection_id,
@@ -271,13 +681,13 @@ class FileMetadataManager:
             has_index=collection_info.get("has_index", False),
             field_count=collection_info.get("field_count", 0),
             sample_document=collection_info.get("sample_document"),
-            created_at=datetime.now().isoformat(),
-            updated_at=datetime.now().isoformat()
+            created_at=now,
+            updated_at=now
         )
         
         # 保存到文件
         collection_file = self.base_path / "collections" / f"{target_instance_name}_{collection_info['database_name']}_{collection_info['name']}.json"
-        await self._write_json_file(collection_file, asdict(collection_metadata))
+        await self._write_json_file(collection_file, _to_dict(collection_metadata))
         
         logger.info("集合信息已保存", 
                    instance=target_instance_name,
@@ -287,21 +697,16 @@ class FileMetadataManager:
     
     async def get_collections_by_database(self, target_instance_name: str, instance_id: str, database_name: str) -> List[Dict[str, Any]]:
         """获取数据库的所有集合"""
-        collections = []
         collections_dir = self.base_path / "collections"
-        
-        for file_path in collections_dir.glob(f"{target_instance_name}_{database_name}_*.json"):
-            data = await self._read_json_file(file_path)
-            if data and data.get("instance_id") == instance_id:
-                collections.append(data)
-        
-        return collections
+        paths = self._list_json(collections_dir, f"{target_instance_name}_{database_name}_")
+        return _filter_by_instance_id(await self._read_json_files(paths), instance_id)
     
     # ==================== 字段管理 ====================
     
     async def save_field(self, target_instance_name: str, instance_id: str, field_info: Dict[str, Any]) -> str:
         """保存字段信息"""
         field_id = self._generate_id()
+        now = datetime.now().isoformat()
         
         field_metadata = FieldMetadata(
             id=field_id,
@@ -315,13 +720,18 @@ class FileMetadataManager:
             examples=field_info.get("examples", []),
             business_meaning=field_info.get("business_meaning"),
             confidence=field_info.get("confidence", 0.0),
-            created_at=datetime.now().isoformat(),
-            updated_at=datetime.now().isoformat()
+            created_at=now,
+            updated_at=now
         )
         
-        # 保存到文件
-        field_file = self.base_path / "fields" / f"{target_instance_name}_{field_info['database_name']}_{field_info['collection_name']}_{field_info['field_path']}.json"
-        await self._write_json_file(field_file, asdict(field_metadata))
+        # 同一集合的字段合并保存在一个分片文件中；先登记到缓冲再等待写回，
+        # 等待写锁期间并发保存的字段与之合并，每个分片一次读改写
+        shard_file = self._field_shard_file(target_instance_name, field_info['database_name'], field_info['collection_name'])
+        record = _to_dict(field_metadata)
+        self._pending_fields.setdefault(str(shard_file), {})[field_metadata.field_path] = record
+        await self.flush_fields()
+        if self._pending_fields.get(str(shard_file), {}).get(field_metadata.field_path) is record:
+            raise IOError(f"写回字段分片失败: {shard_file}")
         
         logger.info("字段信息已保存",
                    instance=target_instance_name,
@@ -333,12 +743,57 @@ class FileMetadataManager:
     async def get_fields_by_collection(self, target_instance_name: str, instance_id: str, 
                                      database_name: str, collection_name: str) -> List[Dict[str, Any]]:
         """获取集合的所有字段"""
+        shard_file = self._field_shard_file(target_instance_name, database_name, collection_name)
+        shard = await self._read_json_file(shard_file)
+        pending = self._pending_fields.get(str(shard_file))
+        if pending:
+            shard = {**(shard or {}), **pending}
+        if shard is None:
+            return await self._get_legacy_fields(target_instance_name, instance_id, database_name, collection_name)
+        
+        return _filter_by_instance_id(shard.values(), instance_id)
+    
+    async def flush_fields(self) -> None:
+        """将缓冲的字段写回分片文件（每个分片一次读改写）"""
+        async with self._lock:
+            for shard_key in list(self._pending_fields):
+                updates = dict(self._pending_fields.get(shard_key, {}))
+                if not updates:
+                    continue
+                shard = dict(await self._read_json_file(shard_key) or {})
+                shard.update(updates)
+                try:
+                    await self._write_json_file(Path(shard_key), shard)
+                except Exception as e:
+                    # 保留在缓冲中，下次写回时重试
+                    logger.error(f"写回字段分片失败: {shard_key}", error=str(e))
+                    continue
+                
+                # 写回期间可能有新的更新，只移除已写入的条目
+                current = self._pending_fields.get(shard_key, {})
+                for field_path, record in updates.items():
+                    if current.get(field_path) is record:
+                        del current[field_path]
+                if not current:
+                    self._pending_fields.pop(shard_key, None)
+    
+    def _field_shard_file(self, target_instance_name: str, database_name: str, collection_name: str) -> Path:
+        """集合字段分片文件路径"""
+        return self.base_path / "fields" / f"{target_instance_name}_{database_name}_{collection_name}.json"
+    
+    async def _get_legacy_fields(self, target_instance_name: str, instance_id: str,
+                                 database_name: str, collection_name: str) -> List[Dict[str, Any]]:
+        """读取旧版每字段单文件格式的字段信息"""
         fields = []
         fields_dir = self.base_path / "fields"
         
-        for file_path in fields_dir.glob(f"{target_instance_name}_{database_name}_{collection_name}_*.json"):
-            data = await self._read_json_file(file_path)
-            if data and data.get("instance_id") == instance_id:
+        paths = self._list_json(fields_dir, f"{target_instance_name}_{database_name}_{collection_name}_")
+        
+        for data in await self._read_json_files(paths):
+            # 前缀可能匹配到其他集合的分片文件，需按记录内容过滤
+            if (data and isinstance(data.get("field_path"), str)
+                    and data.get("collection_name") == collection_name
+                    and data.get("instance_id") == instance_id):
                 fields.append(data)
         
         return fields
@@ -348,6 +803,7 @@ class FileMetadataManager:
     async def save_query_history(self, target_instance_name: str, query_info: Dict[str, Any]) -> str:
         """保存查询历史"""
         query_id = self._generate_id()
+        now = datetime.now()
         
         query_history = QueryHistory(
             id=query_id,
@@ -359,19 +815,19 @@ class FileMetadataManager:
             result_count=query_info.get("result_count", 0),
             execution_time_ms=query_info.get("execution_time_ms", 0.0),
             user_description=query_info.get("user_description", ""),
-            created_at=datetime.now().isoformat()
+            created_at=now.isoformat()
         )
         
         # 按日期组织查询历史文件
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        query_file = self.base_path / "queries" / f"{target_instance_name}_{date_str}.json"
-        
-        # 读取现有查询历史
-        existing_queries = await self._read_json_file(query_file) or []
-        existing_queries.append(asdict(query_history))
+        date_str = now.strftime("%Y-%m-%d")
+        query_file = self.base_path / "queries" / f"{target_instance_name}_{date_str}.jsonl"
         
-        # 保存更新后的查询历史
-        await self._write_json_file(query_file, existing_queries)
+        # 以JSON Lines格式追加，无需读取和重写整个文件
+        line = json_codec.dumps(_to_dict(query_history)) + b'\n'
+        self._negative_paths.discard(str(query_file))
+        async with aiofiles.open(query_file, 'ab') as f:
+            await f.write(line)
+        self._inventory_update(str(query_file))
         
         logger.info("查询历史已保存", instance=target_instance_name, query_id=query_id)
         return query_id
@@ -381,15 +837,25 @@ class FileMetadataManager:
         queries = []
         queries_dir = self.base_path / "queries"
         
-        # 按日期倒序读取查询历史文件
-        query_files = sorted(queries_dir.glob(f"{target_instance_name}_*.json"), reverse=True)
+        # 按日期倒序读取查询历史文件（兼容旧版整文件JSON格式）
+        query_files = sorted(
+            self._list_json(queries_dir, f"{target_instance_name}_", ('.jsonl', '.json')),
+            key=_history_sort_key, reverse=True
+        )
         
-        for file_path in query_files:
-            data = await self._read_json_file(file_path)
-            if data:
-                queries.extend(data)
-                if len(queries) >= limit:
-                    break
+        # 每次并发读取一批文件（大文件在进程池中并行解析），凑够limit条后停止
+        window = max(1, (os.cpu_count() or 2) // 2)
+        for start in range(0, len(query_files), window):
+            batch = query_files[start:start + window]
+            results = await asyncio.gather(*(
+                self._read_json_file(file_path, _parse_jsonl if file_path.endswith('.jsonl') else json_codec.loads)
+                for file_path in batch
+            ))
+            for data in results:
+                if data:
+                    queries.extend(data)
+            if len(queries) >= limit:
+                break
         
         return queries[:limit]
     
@@ -416,7 +882,8 @@ class FileMetadataManager:
     
     async def get_scan_stats(self) -> Dict[str, Any]:
         """获取扫描统计信息"""
-        return copy.deepcopy(self._scan_stats)
+        # 统计值均为整数，浅拷贝即可
+        return dict(self._scan_stats)
     
     async def init_instance_metadata(self, instance_name: str) -> bool:
         """初始化实例元数据"""
@@ -433,14 +900,27 @@ class FileMetadataManager:
     
     # ==================== 统计信息 ====================
     
+    async def _count_fields(self) -> int:
+        """统计字段总数（分片文件按条目计数并合并缓冲中的字段，旧版单字段文件计为1）"""
+        total = 0
+        paths = self._list_json(self.base_path / "fields")
+        pending = dict(self._pending_fields)
+        for path, data in zip(paths, await self._read_json_files(paths)):
+            if data and isinstance(data.get("field_path"), str):
+                total += 1
+                continue
+            updates = pending.pop(_logical_path(path), None)
+            total += len(set(data or ()).union(updates or ()))
+        return total + sum(len(updates) for updates in pending.values())
+    
     async def get_statistics(self) -> Dict[str, Any]:
         """获取存储统计信息"""
         try:
             stats = {
-                "total_instances": len(list((self.base_path / "instances").glob("*.json"))),
-                "total_databases": len(list((self.base_path / "databases").glob("*.json"))),
-                "total_collections": len(list((self.base_path / "collections").glob("*.json"))),
-                "total_fields": len(list((self.base_path / "fields").glob("*.json"))),
+                "total_instances": len(self._list_json(self.base_path / "instances")),
+                "total_databases": len(self._list_json(self.base_path / "databases")),
+                "total_collections": len(self._list_json(self.base_path / "collections")),
+                "total_fields": await self._count_fields(),
                 "storage_path": str(self.base_path),
                 "scan_stats": self._scan_stats.copy()
             }
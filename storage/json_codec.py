@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+JSON编解码
+
+优先使用 orjson（C实现，直接输出UTF-8字节），未安装时回退到标准库 json，
+两种实现对外提供一致的 bytes 输出接口。
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # 未安装orjson时使用标准库
+
+
+def dumps(data: Any, *, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    序列化为UTF-8编码的JSON字节
+
+    Args:
+        data: 待序列化数据
+        indent: 是否使用2空格缩进
+        sort_keys: 是否按键排序
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(data, option=option)
+
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        sort_keys=sort_keys
+    ).encode('utf-8')
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """从JSON字节或字符串反序列化"""
+    if orjson is not None:
+        return orjson.loads(data)
+
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
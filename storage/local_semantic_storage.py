@@ -5,18 +5,461 @@
 提供基于文件系统的语义数据存储和管理功能
 """
 
-import json
+import os
+import sys
+import uuid
 import asyncio
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set, Tuple, Union
 from datetime import datetime
-import aiofiles
 import structlog
 from dataclasses import dataclass, asdict
 
+from storage import json_codec
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # 未安装msgpack时只能使用JSON格式
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # 未安装zstandard时msgpack格式不压缩
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows没有fcntl，索引文件不加跨进程锁
+
 
 logger = structlog.get_logger(__name__)
 
+# 语义索引追加日志超过该大小（字节）时合并到索引文件
+_INDEX_LOG_COMPACT_BYTES = 4 * 1024 * 1024
+
+# 实例目录路径缓存上限
+_INSTANCE_PATH_CACHE_SIZE = 256
+
+# 数据文件格式：json（默认，可读性好）或 msgpack（二进制，可用时以zstd压缩）
+_FILE_FORMATS = ("json", "msgpack")
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_ZSTD_LEVEL = 3
+
+
+def _encode_payload(data: Dict[str, Any], file_format: str) -> bytes:
+    """按文件格式编码数据"""
+    if file_format == "msgpack":
+        payload = msgpack.packb(data, use_bin_type=True)
+        if zstandard is not None:
+            payload = zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(payload)
+        return payload
+    return json_codec.dumps(data, indent=True)
+
+
+def _decode_payload(content: bytes) -> Any:
+    """解码数据文件内容，根据内容识别格式（文件名不随格式改变）"""
+    if content.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("读取zstd压缩文件需要安装zstandard")
+        content = zstandard.ZstdDecompressor().decompress(content)
+    elif content.lstrip()[:1] in (b"{", b"["):
+        return json_codec.loads(content)
+    
+    if msgpack is None:
+        raise ValueError("读取msgpack格式文件需要安装msgpack")
+    return msgpack.unpackb(content, raw=False, strict_map_key=False)
+
+
+def _sync_atomic_write_many(items: List[Tuple[str, str, bytes]],
+                            durable: bool = True) -> List[Union[OSError, Tuple[int, int]]]:
+    """
+    批量原子写入（在线程池中执行）：先写入全部临时文件，再逐个落盘，最后统一替换目标文件，
+    使内核可以合并多个文件的写回
+
+    Args:
+        items: [(临时文件路径, 目标文件路径, 内容)]
+        durable: 是否在替换前fsync（可重建的派生数据可跳过）
+
+    Returns:
+        与输入顺序一致的结果列表，成功为写入后文件的 (mtime_ns, size)，失败为错误
+    """
+    errors: List[Optional[OSError]] = [None] * len(items)
+    stamps: List[Optional[Tuple[int, int]]] = [None] * len(items)
+    fds: List[Tuple[int, int]] = []
+    
+    for i, (temp_path, _, payload) in enumerate(items):
+        fd = -1
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            view = memoryview(payload)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            fds.append((i, fd))
+        except OSError as e:
+            errors[i] = e
+            if fd >= 0:
+                os.close(fd)
+    
+    for i, fd in fds:
+        try:
+            if durable:
+                os.fsync(fd)
+            st = os.fstat(fd)
+            stamps[i] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            errors[i] = e
+        finally:
+            os.close(fd)
+    
+    for i, (temp_path, final_path, _) in enumerate(items):
+        if errors[i] is None:
+            try:
+                os.replace(temp_path, final_path)
+                continue
+            except OSError as e:
+                errors[i] = e
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+    
+    return [error if error is not None else stamp for error, stamp in zip(errors, stamps)]
+
+
+def _sync_read_if_changed(file_path: str, known: Optional[Tuple[int, int]]
+                          ) -> Tuple[Optional[Tuple[int, int]], Optional[bytes]]:
+    """
+    文件的 (mtime_ns, size) 与已知值不同时读取内容（在线程池中执行）
+
+    Returns:
+        (当前 (mtime_ns, size), 内容)；文件未变化时内容为None，文件不存在时均为None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == known:
+                return stamp, None
+            return stamp, f.read()
+    except FileNotFoundError:
+        return None, None
+
+
+def _sync_touch(file_path: str) -> None:
+    """创建标记文件（在线程池中执行）"""
+    with open(file_path, 'ab'):
+        pass
+
+
+def _sync_unlink(file_path: str) -> None:
+    """删除文件，不存在时忽略（在线程池中执行）"""
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def _sync_read_bytes(file_path: str, offset: int = 0) -> Optional[bytes]:
+    """读取文件从 offset 开始的全部内容，文件不存在时返回None（在线程池中执行）"""
+    try:
+        with open(file_path, 'rb') as f:
+            if offset:
+                f.seek(offset)
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _sync_stat_files(file_paths: List[str]) -> List[Optional[Tuple[int, int]]]:
+    """批量获取文件的 (mtime_ns, size)，文件不存在时为None（在线程池中执行）"""
+    stamps = []
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            stamps.append(None)
+        else:
+            stamps.append((st.st_mtime_ns, st.st_size))
+    return stamps
+
+
+def _dir_mtime(dir_path: str) -> Optional[int]:
+    """目录的 mtime_ns（增删子目录时变化），目录不存在时返回None"""
+    try:
+        return os.stat(dir_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _scan_layout(databases_path: Path) -> Tuple[Dict[str, Set[str]], Dict[str, Optional[int]]]:
+    """
+    扫描实例下的目录结构
+
+    Returns:
+        ({数据库名: {集合名}}, {扫描过的目录: 扫描前的 mtime_ns})
+    """
+    layout: Dict[str, Set[str]] = {}
+    # 先取 mtime 再扫描，扫描期间的变化会在下次校验时被发现
+    stamps = {str(databases_path): _dir_mtime(str(databases_path))}
+    try:
+        db_entries = list(os.scandir(databases_path))
+    except FileNotFoundError:
+        return layout, stamps
+    
+    for db_entry in db_entries:
+        if not db_entry.is_dir():
+            continue
+        collections = layout[db_entry.name] = set()
+        collections_path = os.path.join(db_entry.path, "collections")
+        stamps[collections_path] = _dir_mtime(collections_path)
+        try:
+            coll_entries = list(os.scandir(collections_path))
+        except FileNotFoundError:
+            continue
+        collections.update(entry.name for entry in coll_entries if entry.is_dir())
+    
+    return layout, stamps
+
+
+def _sync_append(file_path: str, payload: bytes) -> None:
+    """以追加模式写入（小块追加在POSIX上是原子的，在线程池中执行）"""
+    fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
+def _sync_lock_file(lock_path: str) -> Optional[int]:
+    """获取文件排他锁并返回锁文件描述符，无fcntl时返回None（在线程池中执行，阻塞直到获得锁）"""
+    if fcntl is None:
+        return None
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _sync_unlock_file(fd: Optional[int]) -> None:
+    """释放文件锁（关闭描述符即释放）"""
+    if fd is not None:
+        os.close(fd)
+
+
+def _sync_append_index(lock_path: str, index_path: str, log_path: str, payload: bytes,
+                       known_stamp: Optional[Tuple[int, int]], known_size: int
+                       ) -> Tuple[Optional[bytes], int]:
+    """
+    在索引文件锁内追加日志记录（在线程池中执行）
+
+    Args:
+        known_stamp: 内存索引对应的索引文件 (mtime_ns, size)
+        known_size: 内存索引已包含的日志字节数
+
+    Returns:
+        (本次追加前其他实例追加的日志内容，索引文件已被其他实例合并时为None, 追加后的日志大小)
+    """
+    fd = _sync_lock_file(lock_path)
+    try:
+        snapshot_stamp, log_stamp = _sync_stat_files([index_path, log_path])
+        log_size = log_stamp[1] if log_stamp else 0
+        tail = None
+        if snapshot_stamp == known_stamp and log_size >= known_size:
+            tail = (_sync_read_bytes(log_path, known_size) or b"") if log_size > known_size else b""
+        _sync_append(log_path, payload)
+        return tail, log_size + len(payload)
+    finally:
+        _sync_unlock_file(fd)
+
+
+def _sync_truncate(file_path: str) -> None:
+    """清空文件（在线程池中执行）"""
+    try:
+        os.truncate(file_path, 0)
+    except FileNotFoundError:
+        pass
+
+
+class _IndexLookup:
+    """语义索引条目的哈希查找表，查重时无需线性扫描条目列表"""
+    
+    def __init__(self, index_data: Dict[str, Any]):
+        # (业务含义, 实例, 数据库, 集合, 字段) 已在语义索引中
+        self.semantic_keys: Set[Tuple[str, str, str, str, str]] = {
+            (meaning, entry["instance"], entry["database"], entry["collection"], entry["field"])
+            for meaning, entries in index_data["semantic_index"].items()
+            for entry in entries
+        }
+        # (字段, 实例, 数据库, 集合) -> 字段索引条目
+        self.field_entries: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {
+            (field_path, entry["instance"], entry["database"], entry["collection"]): entry
+            for field_path, entries in index_data["field_index"].items()
+            for entry in entries
+        }
+
+
+def _apply_index_update(index_data: Dict[str, Any], lookup: _IndexLookup, instance_name: str,
+                        database_name: str, collection_name: str, field_path: str,
+                        business_meaning: str):
+    """将一条字段语义更新应用到索引（重复应用结果不变）"""
+    # 驻留重复出现的短字符串，大量字段共用同一份对象
+    instance_name = sys.intern(instance_name)
+    database_name = sys.intern(database_name)
+    collection_name = sys.intern(collection_name)
+    field_path = sys.intern(field_path)
+    business_meaning = sys.intern(business_meaning)
+    
+    # 更新语义索引
+    semantic_key = (business_meaning, instance_name, database_name, collection_name, field_path)
+    if semantic_key not in lookup.semantic_keys:
+        lookup.semantic_keys.add(semantic_key)
+        index_data["semantic_index"].setdefault(business_meaning, []).append({
+            "instance": instance_name,
+            "database": database_name,
+            "collection": collection_name,
+            "field": field_path,
+            "meaning": business_meaning
+        })
+    
+    # 更新字段索引
+    field_key = (field_path, instance_name, database_name, collection_name)
+    field_existing = lookup.field_entries.get(field_key)
+    if field_existing is not None:
+        field_existing["meaning"] = business_meaning
+    else:
+        entry = {
+            "instance": instance_name,
+            "database": database_name,
+            "collection": collection_name,
+            "meaning": business_meaning
+        }
+        lookup.field_entries[field_key] = entry
+        index_data["field_index"].setdefault(field_path, []).append(entry)
+
+
+def _apply_index_record(index_data: Dict[str, Any], lookup: _IndexLookup, record: Dict[str, Any]):
+    """应用一条索引日志记录"""
+    _apply_index_update(index_data, lookup, record["instance"], record["database"],
+                        record["collection"], record["field"], record["meaning"])
+    index_data["last_updated"] = record.get("ts", index_data["last_updated"])
+
+
+def _replay_index_log(index_data: Dict[str, Any], lookup: _IndexLookup, content: bytes):
+    """按顺序重放索引日志内容"""
+    for line in content.splitlines():
+        try:
+            _apply_index_record(index_data, lookup, json_codec.loads(line))
+        except (ValueError, KeyError, TypeError):
+            # 写入中断留下的残缺行
+            continue
+
+
+def _intern_index(index_data: Dict[str, Any]) -> Dict[str, Any]:
+    """重建从文件加载的索引，驻留键与条目中的字符串"""
+    for section in ("semantic_index", "field_index"):
+        entries_by_key = index_data.get(section)
+        if not entries_by_key:
+            index_data[section] = {}
+            continue
+        interned = {}
+        for key, entries in entries_by_key.items():
+            for entry in entries:
+                for name, value in entry.items():
+                    if isinstance(value, str):
+                        entry[name] = sys.intern(value)
+            interned[sys.intern(key)] = entries
+        index_data[section] = interned
+    return index_data
+
+
+def _trigrams(text: str) -> Set[str]:
+    """计算文本（已转小写）的三元组集合"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _TrigramIndex:
+    """单个实例的字段语义倒排三元组索引"""
+    
+    def __init__(self):
+        # (数据库名, 集合名, 字段路径) -> (字段路径, 字段小写, 业务含义, 含义小写, 置信度, 更新时间)
+        self.rows: Dict[Tuple[str, str, str], Tuple] = {}
+        self.postings: Dict[str, Set[Tuple[str, str, str]]] = {}
+        # (数据库名, 集合名) -> 该集合的字段键，替换集合时无需扫描全部行
+        self.collection_keys: Dict[Tuple[str, str], Set[Tuple[str, str, str]]] = {}
+        # (数据库名, 集合名) -> 建立索引时字段文件的 (mtime_ns, size)，尚未写回的集合为None
+        self.stamps: Dict[Tuple[str, str], Optional[Tuple[int, int]]] = {}
+    
+    def set_field(self, database_name: str, collection_name: str, field_path: str,
+                  field_info: Dict[str, Any]):
+        """添加或更新字段"""
+        key = (database_name, collection_name, field_path)
+        self.remove_field(key)
+        
+        business_meaning = field_info.get("business_meaning") or ""
+        field_lower = field_path.lower()
+        meaning_lower = business_meaning.lower()
+        self.rows[key] = (field_path, field_lower, business_meaning, meaning_lower,
+                          field_info.get("confidence", 0.0), field_info.get("updated_at"))
+        self.collection_keys.setdefault((database_name, collection_name), set()).add(key)
+        for trigram in _trigrams(field_lower) | _trigrams(meaning_lower):
+            self.postings.setdefault(trigram, set()).add(key)
+    
+    def remove_field(self, key: Tuple[str, str, str]):
+        """移除字段"""
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        collection_key = (key[0], key[1])
+        keys = self.collection_keys.get(collection_key)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.collection_keys[collection_key]
+        for trigram in _trigrams(row[1]) | _trigrams(row[3]):
+            keys = self.postings.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[trigram]
+    
+    def set_collection(self, database_name: str, collection_name: str, fields: Dict[str, Any]):
+        """替换集合的全部字段"""
+        stale = [key for key in self.collection_keys.get((database_name, collection_name), ())
+                 if key[2] not in fields]
+        for key in stale:
+            self.remove_field(key)
+        for field_path, field_info in fields.items():
+            self.set_field(database_name, collection_name, field_path, field_info)
+    
+    def search(self, term_lower: str):
+        """返回字段路径或业务含义包含搜索词的 (键, 行)"""
+        trigrams = _trigrams(term_lower)
+        if trigrams:
+            # 按倒排列表从短到长求交集得到候选
+            posting_lists = sorted((self.postings.get(t, ()) for t in trigrams), key=len)
+            candidates = set(posting_lists[0])
+            for keys in posting_lists[1:]:
+                if not candidates:
+                    break
+                candidates &= keys
+        else:
+            # 搜索词不足三个字符时无法使用索引
+            candidates = self.rows.keys()
+        
+        for key in candidates:
+            row = self.rows[key]
+            if term_lower in row[3] or term_lower in row[1]:
+                yield key, row
+
 
 @dataclass
 class SemanticInfo:
@@ -34,11 +477,72 @@ class SemanticInfo:
 class LocalSemanticStorage:
     """本地语义存储管理器"""
     
-    def __init__(self, base_path: str = "data/semantics"):
+    def __init__(self, base_path: str = "data/semantics", flush_interval: float = 0.05,
+                 flush_batch_size: int = 64, file_format: Optional[str] = None):
+        """
+        Args:
+            base_path: 存储根目录
+            flush_interval: 脏数据写回间隔（秒）
+            flush_batch_size: 脏文件数达到该值时立即写回
+            file_format: 数据文件格式 json/msgpack，未指定时读取全局配置 storage.file_format
+        """
         self.base_path = Path(base_path)
         self.ensure_directory_structure()
+        global_config = self._load_global_config()
+        self.file_format = self._resolve_file_format(
+            file_format or global_config.get("storage", {}).get("file_format", "json"))
+        
+        # 解析结果缓存：路径 -> ((mtime_ns, size), 数据)，LRU淘汰，写回缓冲后直接更新；
+        # 读到的数据（含缓冲中的内容）是共享的只读对象，调用方不得修改，修改需经 _load_for_update
+        self._parse_cache: "OrderedDict[Path, Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+        self.parse_cache_size = global_config.get("cache", {}).get("max_size", 1000)
         self._file_locks = {}  # 文件锁字典
         
+        # 写合并缓冲：保存先修改内存中的文件内容，再等待后台任务写回（组提交），
+        # 并发的保存合并为一次写入，保存返回时内容已写入磁盘
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self._dirty: Dict[Path, Dict[str, Any]] = {}
+        self._flushing: Dict[Path, Dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        # 等待下一次写回与正在进行的写回的 Future，结果为写入失败的文件路径集合
+        self._next_flush: Optional[asyncio.Future] = None
+        self._current_flush: Optional[asyncio.Future] = None
+        
+        # 语义索引：内存中维护完整索引，更新只追加日志，日志过大时合并写入索引文件
+        self._index_file = self.base_path / "semantic_index.json"
+        self._index_log = self.base_path / "semantic_index.log"
+        # 索引文件以非落盘方式写入期间存在的标记，启动时存在则从字段文件重建索引
+        self._index_sentinel = self.base_path / ".index.dirty"
+        self.index_compact_bytes = _INDEX_LOG_COMPACT_BYTES
+        self._index_cache: Optional[Dict[str, Any]] = None
+        self._index_lookup: Optional[_IndexLookup] = None
+        # 已应用到内存索引、尚未追加到日志的记录，随缓冲内容一起写回
+        self._index_pending: List[Dict[str, Any]] = []
+        self._index_lock = asyncio.Lock()
+        # 同一目录上的多个存储实例（或进程）共用索引文件与日志：追加与合并都在文件锁内进行，
+        # 内存索引记录其对应的索引文件 (mtime_ns, size) 与已包含的日志字节数，合并前据此补齐其他实例的更新
+        self._index_lock_file = self.base_path / "semantic_index.lock"
+        self._index_stamp: Optional[Tuple[int, int]] = None
+        self._index_log_size = 0
+        
+        # 并发文件IO上限（performance.concurrent_operations），避免耗尽文件描述符
+        self._io_semaphore = asyncio.Semaphore(
+            global_config.get("performance", {}).get("concurrent_operations", 10))
+        
+        # 目录结构缓存 {实例名: {数据库名: {集合名}}}：由保存操作维护，
+        # 其他实例或进程可能新建或删除目录，访问时以扫描过的目录 mtime 校验，变化时重新扫描
+        self._layout: Dict[str, Dict[str, Set[str]]] = {}
+        self._layout_stamps: Dict[str, Dict[str, Optional[int]]] = {}
+        
+        # 搜索用倒排三元组索引 {实例名: 索引}，首次搜索时构建，之后由保存操作维护
+        self._search_indexes: Dict[str, _TrigramIndex] = {}
+        
+        # 实例目录路径缓存 {实例名: 路径}，路径由 base_path 唯一决定，可安全复用
+        self._instance_paths: Dict[str, Path] = {}
+        
     def ensure_directory_structure(self):
         """确保目录结构存在"""
         self.base_path.mkdir(parents=True, exist_ok=True)
@@ -52,7 +556,8 @@ class LocalSemanticStorage:
                     "base_path": str(self.base_path),
                     "backup_enabled": True,
                     "backup_interval": 3600,
-                    "max_backups": 10
+                    "max_backups": 10,
+                    "file_format": "json"
                 },
                 "cache": {
                     "enabled": True,
@@ -71,12 +576,36 @@ class LocalSemanticStorage:
                 "version": "1.0.0"
             }
             
-            with open(global_config_path, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, ensure_ascii=False, indent=2)
+            with open(global_config_path, 'wb') as f:
+                f.write(json_codec.dumps(default_config, indent=True))
+    
+    def _load_global_config(self) -> Dict[str, Any]:
+        """读取全局配置文件"""
+        try:
+            with open(self.base_path / "global_config.json", 'rb') as f:
+                return json_codec.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+    
+    def _resolve_file_format(self, file_format: str) -> str:
+        """确定写入数据文件使用的格式（读取时总是按内容识别）"""
+        if file_format not in _FILE_FORMATS:
+            logger.warning("不支持的文件格式，使用JSON", file_format=file_format)
+            return "json"
+        if file_format == "msgpack" and msgpack is None:
+            logger.warning("未安装msgpack，使用JSON格式")
+            return "json"
+        return file_format
     
     def _get_instance_path(self, instance_name: str) -> Path:
-        """获取实例目录路径"""
-        return self.base_path / "instances" / instance_name
+        """获取实例目录路径（按实例名缓存，避免每次调用重新拼接 Path）"""
+        path = self._instance_paths.get(instance_name)
+        if path is None:
+            if len(self._instance_paths) >= _INSTANCE_PATH_CACHE_SIZE:
+                # 超出上限时丢弃最早缓存的实例
+                del self._instance_paths[next(iter(self._instance_paths))]
+            path = self._instance_paths[instance_name] = self.base_path / "instances" / instance_name
+        return path
     
     def _get_database_path(self, instance_name: str, database_name: str) -> Path:
         """获取数据库目录路径"""
@@ -90,38 +619,287 @@ class LocalSemanticStorage:
         """获取字段语义文件路径"""
         return self._get_collection_path(instance_name, database_name, collection_name) / "fields.json"
     
+    def _record_collection(self, instance_name: str, database_name: str, collection_name: str):
+        """在目录结构缓存中登记集合"""
+        self._layout.setdefault(instance_name, {}).setdefault(database_name, set()).add(collection_name)
+    
+    def _get_layout(self, instance_name: str) -> Dict[str, Set[str]]:
+        """获取实例的目录结构（首次访问或目录 mtime 变化时扫描磁盘）"""
+        stamps = self._layout_stamps.get(instance_name)
+        if stamps is not None and all(_dir_mtime(path) == mtime for path, mtime in stamps.items()):
+            return self._layout[instance_name]
+        
+        databases_path = self._get_instance_path(instance_name) / "databases"
+        layout, self._layout_stamps[instance_name] = _scan_layout(databases_path)
+        # 尚未写回磁盘的字段文件
+        for file_path in (*self._dirty, *self._flushing):
+            if file_path.name == "fields.json" and file_path.parents[3] == databases_path:
+                layout.setdefault(file_path.parents[2].name, set()).add(file_path.parent.name)
+        self._layout[instance_name] = layout
+        return layout
+    
+    def _list_collections(self, instance_name: str) -> List[Tuple[str, str, Path]]:
+        """列出实例下的所有集合：[(数据库名, 集合名, 字段文件路径)]"""
+        return [
+            (database_name, collection_name,
+             self._get_fields_file_path(instance_name, database_name, collection_name))
+            for database_name, collections in self._get_layout(instance_name).items()
+            for collection_name in sorted(collections)
+        ]
+    
+    def invalidate_layout(self, instance_name: Optional[str] = None):
+        """使目录结构缓存失效（目录被外部修改后调用），下次访问时重新扫描"""
+        if instance_name is None:
+            self._layout.clear()
+            self._layout_stamps.clear()
+            self._search_indexes.clear()
+        else:
+            self._layout.pop(instance_name, None)
+            self._layout_stamps.pop(instance_name, None)
+            self._search_indexes.pop(instance_name, None)
+    
+    async def _get_search_index(self, instance_name: str) -> _TrigramIndex:
+        """获取实例的搜索索引，按字段文件的修改时间增量刷新变化的集合"""
+        index = self._search_indexes.get(instance_name)
+        if index is None:
+            index = self._search_indexes[instance_name] = _TrigramIndex()
+        
+        collections = self._list_collections(instance_name)
+        loop = asyncio.get_running_loop()
+        stamps = await loop.run_in_executor(
+            None, _sync_stat_files, [str(path) for _, _, path in collections])
+        
+        changed = []
+        for (database_name, collection_name, fields_file), stamp in zip(collections, stamps):
+            key = (database_name, collection_name)
+            if fields_file in self._dirty or fields_file in self._flushing:
+                # 尚未写回的集合由保存操作维护，只需首次载入
+                if key not in index.stamps:
+                    changed.append((key, fields_file, None))
+            elif key not in index.stamps or index.stamps[key] != stamp:
+                changed.append((key, fields_file, stamp))
+        
+        # 已不存在的集合
+        listed = {(database_name, collection_name) for database_name, collection_name, _ in collections}
+        for key in [key for key in index.stamps if key not in listed]:
+            index.set_collection(key[0], key[1], {})
+            del index.stamps[key]
+        
+        if changed:
+            all_fields = await self._read_json_files([fields_file for _, fields_file, _ in changed])
+            for (key, fields_file, stamp), fields_data in zip(changed, all_fields):
+                # 读取期间有新的保存时以缓冲中的内容为准
+                pending = self._dirty.get(fields_file) or self._flushing.get(fields_file)
+                if pending is not None:
+                    fields_data, stamp = pending, None
+                index.set_collection(key[0], key[1], (fields_data or {}).get("fields", {}))
+                index.stamps[key] = stamp
+        
+        return index
+    
+    def _index_collection_fields(self, instance_name: str, database_name: str,
+                                 collection_name: str, fields: Dict[str, Any], replace: bool = False):
+        """将保存的字段同步到已构建的搜索索引"""
+        index = self._search_indexes.get(instance_name)
+        if index is None:
+            return
+        if replace:
+            index.set_collection(database_name, collection_name, fields)
+        else:
+            for field_path, field_info in fields.items():
+                index.set_field(database_name, collection_name, field_path, field_info)
+    
     async def _atomic_write(self, file_path: Path, data: Dict[str, Any]) -> bool:
-        """原子性写入文件"""
-        temp_path = file_path.with_suffix('.tmp')
-        try:
-            # 确保目录存在
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            async with aiofiles.open(temp_path, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(data, ensure_ascii=False, indent=2))
-            
-            # 原子性重命名
-            temp_path.replace(file_path)
+        """原子性写入文件（丢弃该文件尚未写回的缓冲内容）"""
+        self._dirty.pop(file_path, None)
+        return await self._write_file(file_path, data)
+    
+    async def _write_file(self, file_path: Path, data: Dict[str, Any], durable: bool = True) -> bool:
+        """原子性写入单个文件"""
+        return (await self._write_files([(file_path, data)], durable))[0]
+    
+    async def _write_files(self, items: List[Tuple[Path, Dict[str, Any]]],
+                           durable: bool = True, cache_parsed: bool = False) -> List[bool]:
+        """
+        原子性写入多个文件（在事件循环中编码，写入、落盘与重命名在线程池中一次完成）
+
+        Args:
+            cache_parsed: 写入的数据此后不再被修改时，直接记为文件的解析结果
+        """
+        results = [False] * len(items)
+        batch = []
+        positions = []
+        for i, (file_path, data) in enumerate(items):
+            try:
+                # 确保目录存在
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                payload = _encode_payload(data, self.file_format)
+            except Exception as e:
+                logger.error("原子性写入失败", file_path=str(file_path), error=str(e))
+                continue
+            temp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.tmp")
+            batch.append((str(temp_path), str(file_path), payload))
+            positions.append(i)
+        
+        if batch:
+            loop = asyncio.get_running_loop()
+            async with self._io_semaphore:
+                outcomes = await loop.run_in_executor(None, _sync_atomic_write_many, batch, durable)
+            for i, (_, final_path, _), outcome in zip(positions, batch, outcomes):
+                if isinstance(outcome, OSError):
+                    logger.error("原子性写入失败", file_path=final_path, error=str(outcome))
+                    self._parse_cache.pop(items[i][0], None)
+                else:
+                    results[i] = True
+                    if cache_parsed:
+                        self._cache_parsed(items[i][0], outcome, items[i][1])
+                    else:
+                        self._parse_cache.pop(items[i][0], None)
+        
+        return results
+    
+    def _mark_dirty(self, file_path: Path, data: Dict[str, Any]):
+        """登记待写回的文件内容，并确保后台写回任务在运行"""
+        self._dirty[file_path] = data
+        self._schedule_flush()
+    
+    def _schedule_flush(self):
+        """确保后台写回任务在运行，缓冲过多时立即触发"""
+        if self._flusher_task is None:
+            self._flush_event = asyncio.Event()
+            self._flusher_task = asyncio.create_task(self._flush_loop())
+        elif len(self._dirty) >= self.flush_batch_size:
+            self._flush_event.set()
+    
+    async def _load_for_update(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """
+        获取用于修改的文件内容（优先使用尚未写回的缓冲内容）
+
+        读到的数据是共享的只读对象，这里复制顶层与字段表（写时复制），调用方只能替换字段条目，
+        修改后须同步调用 _mark_dirty 登记
+        """
+        data = self._dirty.get(file_path)
+        if data is None:
+            data = await self._read_json_file(file_path)
+            # 读取期间其他协程可能已载入并修改同一文件
+            data = self._dirty.get(file_path, data)
+        if data is None:
+            return None
+        return {**data, "fields": dict(data.get("fields", {}))}
+    
+    async def _wait_flushed(self, file_path: Optional[Path] = None) -> bool:
+        """
+        等待包含当前缓冲内容的写回完成，并发调用共享同一次写回
+
+        Returns:
+            file_path 是否写入成功（未指定时总是返回True）
+        """
+        if file_path in self._dirty or self._index_pending:
+            if self._next_flush is None:
+                self._next_flush = asyncio.get_running_loop().create_future()
+            waiter = self._next_flush
+            self._schedule_flush()
+            self._flush_event.set()
+        elif file_path is not None and file_path in self._flushing:
+            waiter = self._current_flush
+        else:
             return True
-        except Exception as e:
-            logger.error("原子性写入失败", file_path=str(file_path), error=str(e))
-            if temp_path.exists():
-                temp_path.unlink()
-            return False
+        failed = await asyncio.shield(waiter)
+        return file_path not in failed
+    
+    async def _flush_loop(self):
+        """后台写回任务：按间隔、脏文件数或有保存在等待时触发，缓冲清空后退出"""
+        try:
+            while self._dirty or self._index_pending or self._next_flush is not None:
+                try:
+                    await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_event.clear()
+                await self._flush_dirty()
+        finally:
+            self._flusher_task = None
+    
+    async def _flush_dirty(self):
+        """将缓冲内容批量写回文件，写入失败的文件保留到下次重试"""
+        async with self._flush_lock:
+            waiter, self._next_flush = self._next_flush, None
+            self._current_flush = waiter
+            failed: Set[Path] = set()
+            try:
+                await self._flush_index_records()
+                if self._dirty:
+                    self._flushing, self._dirty = self._dirty, {}
+                    try:
+                        items = list(self._flushing.items())
+                        results = await self._write_files(items, cache_parsed=True)
+                        for (path, data), success in zip(items, results):
+                            if not success:
+                                failed.add(path)
+                                self._dirty.setdefault(path, data)
+                    finally:
+                        self._flushing = {}
+            finally:
+                self._current_flush = None
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(failed)
+    
+    async def flush(self):
+        """立即写回所有缓冲内容"""
+        await self._flush_dirty()
+    
+    async def close(self):
+        """关闭存储：写回缓冲内容并合并索引日志"""
+        await self._flush_dirty()
+        if self._index_cache is None:
+            # 未加载过索引时没有本实例的索引记录，合并留给持有完整视图的实例
+            return
+        if self._index_log_size or self._index_sentinel.exists():
+            # 合并在索引文件锁内先补齐其他实例写入磁盘的记录，不会以本实例的局部视图覆盖
+            await self.compact_index(durable=True)
     
     async def _read_json_file(self, file_path: Path) -> Optional[Dict[str, Any]]:
-        """读取JSON文件"""
+        """
+        读取JSON文件（尚未写回的文件返回缓冲中的内容）
+
+        返回的数据与解析缓存、写回缓冲共享，调用方不得修改
+        """
+        pending = self._dirty.get(file_path)
+        if pending is None:
+            pending = self._flushing.get(file_path)
+        if pending is not None:
+            return pending
         try:
-            if not file_path.exists():
+            loop = asyncio.get_running_loop()
+            cached = self._parse_cache.get(file_path)
+            async with self._io_semaphore:
+                stamp, content = await loop.run_in_executor(
+                    None, _sync_read_if_changed, str(file_path), cached[0] if cached else None)
+            if stamp is None:
+                self._parse_cache.pop(file_path, None)
                 return None
-                
-            async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                return json.loads(content)
+            if content is None:
+                # 文件未变化，返回缓存的解析结果
+                self._cache_parsed(file_path, stamp, cached[1])
+                return cached[1]
+            data = _decode_payload(content)
+            self._cache_parsed(file_path, stamp, data)
+            return data
         except Exception as e:
             logger.error("读取JSON文件失败", file_path=str(file_path), error=str(e))
             return None
     
+    def _cache_parsed(self, file_path: Path, stamp: Tuple[int, int], data: Dict[str, Any]):
+        """记录文件的解析结果"""
+        self._parse_cache[file_path] = (stamp, data)
+        self._parse_cache.move_to_end(file_path)
+        while len(self._parse_cache) > self.parse_cache_size:
+            self._parse_cache.popitem(last=False)
+    
+    async def _read_json_files(self, file_paths: List[Path]) -> List[Optional[Dict[str, Any]]]:
+        """并发读取多个JSON文件（受并发IO上限约束），结果顺序与输入一致"""
+        return await asyncio.gather(*(self._read_json_file(path) for path in file_paths))
+    
     async def save_field_semantics(self, instance_name: str, database_name: str, 
                                  collection_name: str, field_path: str, 
                                  business_meaning: str, confidence: float = 1.0,
@@ -131,11 +909,12 @@ class LocalSemanticStorage:
         """保存字段语义信息"""
         try:
             fields_file_path = self._get_fields_file_path(instance_name, database_name, collection_name)
+            now = datetime.now().isoformat()
             
             # 读取现有数据
-            fields_data = await self._read_json_file(fields_file_path) or {
+            fields_data = await self._load_for_update(fields_file_path) or {
                 "collection_name": collection_name,
-                "last_updated": datetime.now().isoformat(),
+                "last_updated": now,
                 "fields": {}
             }
             
@@ -146,31 +925,37 @@ class LocalSemanticStorage:
                 "data_type": data_type,
                 "examples": examples or [],
                 "analysis_result": analysis_result or {},
-                "created_at": fields_data["fields"].get(field_path, {}).get("created_at", datetime.now().isoformat()),
-                "updated_at": datetime.now().isoformat(),
+                "created_at": fields_data["fields"].get(field_path, {}).get("created_at", now),
+                "updated_at": now,
                 "source": source
             }
             
             # 更新字段信息
             fields_data["fields"][field_path] = semantic_info
-            fields_data["last_updated"] = datetime.now().isoformat()
+            fields_data["last_updated"] = now
             
-            # 原子性保存
-            success = await self._atomic_write(fields_file_path, fields_data)
+            # 登记写回，并发保存合并为一次文件写入
+            self._mark_dirty(fields_file_path, fields_data)
+            self._record_collection(instance_name, database_name, collection_name)
+            self._index_collection_fields(instance_name, database_name, collection_name,
+                                          {field_path: semantic_info})
             
-            if success:
-                logger.info(
-                    "字段语义保存成功",
-                    instance=instance_name,
-                    database=database_name,
-                    collection=collection_name,
-                    field=field_path
-                )
-                
-                # 更新索引
-                await self._update_semantic_index(instance_name, database_name, collection_name, field_path, business_meaning)
+            # 更新索引
+            await self._update_semantic_index(instance_name, database_name, collection_name, field_path,
+                                              business_meaning, now)
             
-            return success
+            # 等待字段文件与索引日志写回
+            if not await self._wait_flushed(fields_file_path):
+                return False
+            
+            logger.info(
+                "字段语义保存成功",
+                instance=instance_name,
+                database=database_name,
+                collection=collection_name,
+                field=field_path
+            )
+            return True
             
         except Exception as e:
             logger.error(
@@ -228,51 +1013,19 @@ class LocalSemanticStorage:
         results = []
         
         try:
-            instance_path = self._get_instance_path(instance_name)
-            if not instance_path.exists():
-                return results
-            
-            # 遍历所有数据库和集合
-            databases_path = instance_path / "databases"
-            if not databases_path.exists():
-                return results
-            
-            for db_path in databases_path.iterdir():
-                if not db_path.is_dir():
-                    continue
-                    
-                database_name = db_path.name
-                collections_path = db_path / "collections"
-                
-                if not collections_path.exists():
-                    continue
-                
-                for collection_path in collections_path.iterdir():
-                    if not collection_path.is_dir():
-                        continue
-                        
-                    collection_name = collection_path.name
-                    fields_file = collection_path / "fields.json"
-                    
-                    fields_data = await self._read_json_file(fields_file)
-                    if not fields_data or "fields" not in fields_data:
-                        continue
-                    
-                    # 搜索匹配的字段
-                    for field_path, field_info in fields_data["fields"].items():
-                        business_meaning = field_info.get("business_meaning", "")
-                        
-                        if search_term.lower() in business_meaning.lower() or search_term.lower() in field_path.lower():
-                            results.append({
-                                "instance_name": instance_name,
-                                "database_name": database_name,
-                                "collection_name": collection_name,
-                                "field_path": field_path,
-                                "business_meaning": business_meaning,
-                                "confidence": field_info.get("confidence", 0.0),
-                                "semantic_source": "local_file",
-                                "updated_at": field_info.get("updated_at")
-                            })
+            index = await self._get_search_index(instance_name)
+            for (database_name, collection_name, _), row in index.search(search_term.lower()):
+                field_path, _, business_meaning, _, confidence, updated_at = row
+                results.append({
+                    "instance_name": instance_name,
+                    "database_name": database_name,
+                    "collection_name": collection_name,
+                    "field_path": field_path,
+                    "business_meaning": business_meaning,
+                    "confidence": confidence,
+                    "semantic_source": "local_file",
+                    "updated_at": updated_at
+                })
             
             # 按置信度排序
             results.sort(key=lambda x: x["confidence"], reverse=True)
@@ -300,16 +1053,21 @@ class LocalSemanticStorage:
         try:
             fields_file_path = self._get_fields_file_path(instance_name, database_name, collection_name)
             
+            now = datetime.now().isoformat()
+            
             # 准备完整的字段数据
             complete_data = {
                 "collection_name": collection_name,
-                "last_updated": datetime.now().isoformat(),
+                "last_updated": now,
                 "fields": fields_data
             }
             
             success = await self._atomic_write(fields_file_path, complete_data)
             
             if success:
+                self._record_collection(instance_name, database_name, collection_name)
+                self._index_collection_fields(instance_name, database_name, collection_name,
+                                              fields_data, replace=True)
                 logger.info(
                     "批量保存集合语义成功",
                     instance=instance_name,
@@ -319,10 +1077,13 @@ class LocalSemanticStorage:
                 )
                 
                 # 批量更新索引
-                for field_path, field_info in fields_data.items():
-                    business_meaning = field_info.get("business_meaning", "")
-                    if business_meaning:
-                        await self._update_semantic_index(instance_name, database_name, collection_name, field_path, business_meaning)
+                await self._update_semantic_index_batch(
+                    instance_name, database_name, collection_name,
+                    [(field_path, field_info["business_meaning"])
+                     for field_path, field_info in fields_data.items()
+                     if field_info.get("business_meaning")],
+                    now)
+                await self._wait_flushed()
             
             return success
             
@@ -337,72 +1098,243 @@ class LocalSemanticStorage:
             return False
     
     async def _update_semantic_index(self, instance_name: str, database_name: str, 
-                                   collection_name: str, field_path: str, business_meaning: str):
-        """更新语义索引"""
+                                   collection_name: str, field_path: str, business_meaning: str,
+                                   now: Optional[str] = None):
+        """更新语义索引（修改内存索引并追加一条日志记录），now 为调用方已取得的ISO时间"""
+        await self._update_semantic_index_batch(instance_name, database_name, collection_name,
+                                                [(field_path, business_meaning)], now)
+    
+    async def _update_semantic_index_batch(self, instance_name: str, database_name: str,
+                                         collection_name: str, items: List[Tuple[str, str]],
+                                         now: Optional[str] = None):
+        """批量更新同一集合的语义索引：一次修改内存索引，一次追加全部日志记录"""
+        if not items:
+            return
         try:
-            index_file_path = self.base_path / "semantic_index.json"
+            index_data = await self._ensure_index_loaded()
+            now = now or datetime.now().isoformat()
             
-            # 读取现有索引
-            index_data = await self._read_json_file(index_file_path) or {
-                "semantic_index": {},
-                "field_index": {},
-                "last_updated": datetime.now().isoformat()
-            }
-            
-            # 更新语义索引
-            if business_meaning not in index_data["semantic_index"]:
-                index_data["semantic_index"][business_meaning] = []
-            
-            # 检查是否已存在相同条目
-            existing_entry = None
-            for entry in index_data["semantic_index"][business_meaning]:
-                if (entry["instance"] == instance_name and 
-                    entry["database"] == database_name and 
-                    entry["collection"] == collection_name and 
-                    entry["field"] == field_path):
-                    existing_entry = entry
-                    break
-            
-            if not existing_entry:
-                index_data["semantic_index"][business_meaning].append({
+            records = []
+            for field_path, business_meaning in items:
+                _apply_index_update(index_data, self._index_lookup, instance_name, database_name,
+                                    collection_name, field_path, business_meaning)
+                records.append({
+                    "op": "set",
                     "instance": instance_name,
                     "database": database_name,
                     "collection": collection_name,
                     "field": field_path,
-                    "meaning": business_meaning
-                })
-            
-            # 更新字段索引
-            if field_path not in index_data["field_index"]:
-                index_data["field_index"][field_path] = []
-            
-            # 检查字段索引中是否已存在
-            field_existing = None
-            for entry in index_data["field_index"][field_path]:
-                if (entry["instance"] == instance_name and 
-                    entry["database"] == database_name and 
-                    entry["collection"] == collection_name):
-                    field_existing = entry
-                    break
-            
-            if field_existing:
-                field_existing["meaning"] = business_meaning
-            else:
-                index_data["field_index"][field_path].append({
-                    "instance": instance_name,
-                    "database": database_name,
-                    "collection": collection_name,
-                    "meaning": business_meaning
+                    "meaning": business_meaning,
+                    "ts": now
                 })
+            index_data["last_updated"] = now
             
-            index_data["last_updated"] = datetime.now().isoformat()
-            
-            # 保存索引
-            await self._atomic_write(index_file_path, index_data)
+            # 日志记录由后台写回任务批量追加
+            self._index_pending.extend(records)
+            self._schedule_flush()
             
         except Exception as e:
             logger.error("更新语义索引失败", error=str(e))
     
+    async def _ensure_index_loaded(self) -> Dict[str, Any]:
+        """加载语义索引：读取合并后的索引文件并重放追加日志（只执行一次）"""
+        if self._index_cache is not None:
+            return self._index_cache
+        
+        # 文件锁只在持有索引锁时获取，同一实例最多占用一个等锁的线程池线程
+        async with self._index_lock:
+            if self._index_cache is not None:
+                # 等锁期间其他协程已完成加载
+                return self._index_cache
+            loop = asyncio.get_running_loop()
+            lock_fd = await loop.run_in_executor(None, _sync_lock_file, str(self._index_lock_file))
+            try:
+                rebuild = self._index_sentinel.exists()
+                all_fields = None
+                if rebuild:
+                    # 上次非落盘写入的索引文件可能不完整，以字段文件为准重建
+                    logger.warning("语义索引未正常落盘，从字段文件重建")
+                    all_fields = await self._read_all_collection_fields()
+                index_data, lookup, snapshot_stamp, log_size = await self._read_index_from_disk(all_fields)
+            finally:
+                await loop.run_in_executor(None, _sync_unlock_file, lock_fd)
+            
+            self._index_stamp = snapshot_stamp
+            self._index_log_size = log_size
+            self._index_lookup = lookup
+            self._index_cache = index_data
+        if rebuild:
+            await self.compact_index(durable=True)
+        return index_data
+    
+    async def _read_index_from_disk(self, rebuild_fields: Optional[List] = None
+                                    ) -> Tuple[Dict[str, Any], _IndexLookup, Optional[Tuple[int, int]], int]:
+        """
+        读取索引文件并重放追加日志（调用方需持有索引文件锁）
+
+        Args:
+            rebuild_fields: 指定时忽略索引文件，以这些字段文件内容为基础重建
+
+        Returns:
+            (索引, 查找表, 索引文件 (mtime_ns, size), 日志字节数)
+        """
+        loop = asyncio.get_running_loop()
+        (snapshot_stamp,) = await loop.run_in_executor(None, _sync_stat_files, [str(self._index_file)])
+        index_data = None
+        if rebuild_fields is None and snapshot_stamp is not None:
+            # 索引会被就地修改，不经解析缓存，单独解析一份
+            try:
+                content = await loop.run_in_executor(None, _sync_read_bytes, str(self._index_file))
+                index_data = _decode_payload(content) if content else None
+            except Exception as e:
+                logger.error("读取JSON文件失败", file_path=str(self._index_file), error=str(e))
+        log_content = await loop.run_in_executor(None, _sync_read_bytes, str(self._index_log)) or b""
+        
+        index_data = _intern_index(index_data) if index_data else {
+            "semantic_index": {},
+            "field_index": {},
+            "last_updated": datetime.now().isoformat()
+        }
+        lookup = _IndexLookup(index_data)
+        for (instance_name, database_name, collection_name), fields_data in rebuild_fields or ():
+            for field_path, field_info in (fields_data or {}).get("fields", {}).items():
+                if field_info.get("business_meaning"):
+                    _apply_index_update(index_data, lookup, instance_name, database_name,
+                                        collection_name, field_path, field_info["business_meaning"])
+        _replay_index_log(index_data, lookup, log_content)
+        return index_data, lookup, snapshot_stamp, len(log_content)
+    
+    async def _read_all_collection_fields(self) -> List[Tuple[Tuple[str, str, str], Optional[Dict[str, Any]]]]:
+        """读取所有实例的字段文件：[((实例名, 数据库名, 集合名), 字段数据)]"""
+        try:
+            instance_names = [entry.name for entry in os.scandir(self.base_path / "instances")
+                              if entry.is_dir()]
+        except FileNotFoundError:
+            instance_names = []
+        
+        locations = []
+        paths = []
+        for instance_name in instance_names:
+            for database_name, collection_name, fields_file in self._list_collections(instance_name):
+                locations.append((instance_name, database_name, collection_name))
+                paths.append(fields_file)
+        return list(zip(locations, await self._read_json_files(paths)))
+    
+    async def _flush_index_records(self):
+        """将待写的索引记录一次追加到日志，日志超过阈值时合并到索引文件"""
+        async with self._index_lock:
+            if not self._index_pending:
+                return
+            # 按修改内存索引的顺序追加，保证重放结果一致
+            records, self._index_pending = self._index_pending, []
+            payload = b"".join(json_codec.dumps(record) + b"\n" for record in records)
+            try:
+                loop = asyncio.get_running_loop()
+                tail, log_size = await loop.run_in_executor(
+                    None, _sync_append_index, str(self._index_lock_file), str(self._index_file),
+                    str(self._index_log), payload, self._index_stamp, self._index_log_size)
+            except Exception as e:
+                logger.error("追加索引日志失败", error=str(e))
+                self._index_pending[:0] = records
+                return
+            if tail:
+                # 其他实例追加的记录排在本次记录之前，按日志顺序补齐内存索引
+                _replay_index_log(self._index_cache, self._index_lookup, tail)
+                for record in records:
+                    _apply_index_record(self._index_cache, self._index_lookup, record)
+            # tail 为None时索引文件已被其他实例合并，内存索引在下次合并时从磁盘重新加载
+            self._index_log_size = log_size
+            if log_size >= self.index_compact_bytes:
+                await self._compact_index_locked()
+    
+    async def compact_index(self, durable: bool = False):
+        """
+        将索引写入索引文件并清空追加日志
+
+        Args:
+            durable: 是否落盘；索引可从字段文件重建，运行期间的合并默认不fsync，关闭时落盘
+        """
+        async with self._index_lock:
+            await self._compact_index_locked(durable)
+    
+    async def _compact_index_locked(self, durable: bool = False):
+        """
+        合并索引（调用方需持有索引锁）
+
+        在索引文件锁内进行：先补齐其他实例写入磁盘的更新，再写入完整索引并清空日志，
+        不会丢弃其他实例追加的记录
+        """
+        if self._index_cache is None:
+            return
+        loop = asyncio.get_running_loop()
+        lock_fd = await loop.run_in_executor(None, _sync_lock_file, str(self._index_lock_file))
+        try:
+            await self._catch_up_index(*await loop.run_in_executor(
+                None, _sync_stat_files, [str(self._index_file), str(self._index_log)]))
+            
+            if not durable:
+                await loop.run_in_executor(None, _sync_touch, str(self._index_sentinel))
+            # 写入的快照已包含此前待写的记录，写入期间新增的记录需保留
+            applied = len(self._index_pending)
+            # 先原子写入完整索引再清空日志，中途崩溃时重放日志是幂等的
+            if await self._write_file(self._index_file, self._index_cache, durable):
+                del self._index_pending[:applied]
+                await loop.run_in_executor(None, _sync_truncate, str(self._index_log))
+                self._index_log_size = 0
+                (self._index_stamp,) = await loop.run_in_executor(
+                    None, _sync_stat_files, [str(self._index_file)])
+                if durable:
+                    await loop.run_in_executor(None, _sync_unlink, str(self._index_sentinel))
+        finally:
+            await loop.run_in_executor(None, _sync_unlock_file, lock_fd)
+    
+    async def get_semantic_index(self) -> Dict[str, Any]:
+        """获取当前语义索引（包含其他实例已写入磁盘的更新），返回独立副本"""
+        await self._ensure_index_loaded()
+        async with self._index_lock:
+            await self._refresh_index_locked()
+            return json_codec.loads(json_codec.dumps(self._index_cache))
+    
+    async def _refresh_index_locked(self):
+        """索引文件或日志在加载后有变化时补齐其他实例的更新（调用方需持有索引锁）"""
+        loop = asyncio.get_running_loop()
+        paths = [str(self._index_file), str(self._index_log)]
+        snapshot_stamp, log_stamp = await loop.run_in_executor(None, _sync_stat_files, paths)
+        if snapshot_stamp == self._index_stamp and (log_stamp[1] if log_stamp else 0) == self._index_log_size:
+            return
+        lock_fd = await loop.run_in_executor(None, _sync_lock_file, str(self._index_lock_file))
+        try:
+            snapshot_stamp, log_stamp = await loop.run_in_executor(None, _sync_stat_files, paths)
+            await self._catch_up_index(snapshot_stamp, log_stamp)
+        finally:
+            await loop.run_in_executor(None, _sync_unlock_file, lock_fd)
+    
+    async def _catch_up_index(self, snapshot_stamp: Optional[Tuple[int, int]],
+                              log_stamp: Optional[Tuple[int, int]]):
+        """
+        按磁盘上的索引文件与日志补齐内存索引（调用方需持有索引锁与索引文件锁）
+
+        之后重新应用本实例尚未追加的记录，保持与日志一致的顺序
+        """
+        loop = asyncio.get_running_loop()
+        log_size = log_stamp[1] if log_stamp else 0
+        if snapshot_stamp == self._index_stamp and log_size >= self._index_log_size:
+            if log_size > self._index_log_size:
+                # 其他实例追加的记录
+                tail = await loop.run_in_executor(
+                    None, _sync_read_bytes, str(self._index_log), self._index_log_size)
+                _replay_index_log(self._index_cache, self._index_lookup, tail or b"")
+                for record in self._index_pending:
+                    _apply_index_record(self._index_cache, self._index_lookup, record)
+        else:
+            # 索引文件已被其他实例合并，以磁盘内容为准重新加载
+            index_data, lookup, snapshot_stamp, log_size = await self._read_index_from_disk()
+            for record in self._index_pending:
+                _apply_index_record(index_data, lookup, record)
+            self._index_cache, self._index_lookup = index_data, lookup
+            self._index_stamp = snapshot_stamp
+        self._index_log_size = log_size
+    
     async def get_instance_statistics(self, instance_name: str) -> Dict[str, Any]:
         """获取实例统计信息"""
         stats = {
@@ -414,49 +1346,29 @@ class LocalSemanticStorage:
         }
         
         try:
-            instance_path = self._get_instance_path(instance_name)
-            if not instance_path.exists():
-                return stats
-            
-            databases_path = instance_path / "databases"
-            if not databases_path.exists():
-                return stats
+            collections = self._list_collections(instance_name)
+            stats["total_databases"] = len(self._get_layout(instance_name))
+            stats["total_collections"] = len(collections)
+            all_fields = await self._read_json_files([path for _, _, path in collections])
             
             total_fields = 0
             semantic_fields = 0
             latest_update = None
             
-            for db_path in databases_path.iterdir():
-                if not db_path.is_dir():
-                    continue
+            for fields_data in all_fields:
+                if fields_data and "fields" in fields_data:
+                    collection_fields = len(fields_data["fields"])
+                    total_fields += collection_fields
                     
-                stats["total_databases"] += 1
-                collections_path = db_path / "collections"
-                
-                if not collections_path.exists():
-                    continue
-                
-                for collection_path in collections_path.iterdir():
-                    if not collection_path.is_dir():
-                        continue
-                        
-                    stats["total_collections"] += 1
-                    fields_file = collection_path / "fields.json"
+                    # 统计有语义的字段
+                    for field_info in fields_data["fields"].values():
+                        if field_info.get("business_meaning"):
+                            semantic_fields += 1
                     
-                    fields_data = await self._read_json_file(fields_file)
-                    if fields_data and "fields" in fields_data:
-                        collection_fields = len(fields_data["fields"])
-                        total_fields += collection_fields
-                        
-                        # 统计有语义的字段
-                        for field_info in fields_data["fields"].values():
-                            if field_info.get("business_meaning"):
-                                semantic_fields += 1
-                        
-                        # 更新最新时间
-                        last_updated = fields_data.get("last_updated")
-                        if last_updated and (not latest_update or last_updated > latest_update):
-                            latest_update = last_updated
+                    # 更新最新时间
+                    last_updated = fields_data.get("last_updated")
+                    if last_updated and (not latest_update or last_updated > latest_update):
+                        latest_update = last_updated
             
             stats["total_fields"] = total_fields
             stats["semantic_coverage"] = semantic_fields / total_fields if total_fields > 0 else 0.0
@@ -6,6 +6,8 @@
 """
 
 import asyncio
+import copy
+import heapq
 from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 import structlog
@@ -23,69 +25,111 @@ class MemoryWorkflowStateStorage(WorkflowStateStorage):
         """初始化内存存储"""
         self._storage = {}  # session_id -> WorkflowState
         self._metadata = {}  # session_id -> 元数据
+        # 单键读写在事件循环中本身是原子的，锁只用于需要一致快照的清理
         self._lock = asyncio.Lock()
+        # 最近活动时间：session_id -> 时间戳，以及按时间排序的 (时间戳, session_id) 最小堆。
+        # 堆中的旧记录在清理时跳过，过多时重建
+        self._activity = {}
+        self._activity_heap = []
+        # 内存占用估算：保存时只登记会话，统计时才计算登记过的会话的大小并累加，
+        # 频繁保存的会话在两次统计之间只计算一次
+        self._sizes = {}
+        self._bytes_estimate = 0
+        self._unsized = set()
+    
+    def _forget(self, session_id: str):
+        """移除会话的元数据、活动记录与大小估算"""
+        self._metadata.pop(session_id, None)
+        self._activity.pop(session_id, None)
+        self._unsized.discard(session_id)
+        self._bytes_estimate -= self._sizes.pop(session_id, 0)
+    
+    def _touch(self, session_id: str, activity: datetime):
+        """记录会话活动时间"""
+        ts = activity.timestamp()
+        self._activity[session_id] = ts
+        heapq.heappush(self._activity_heap, (ts, session_id))
+        if len(self._activity_heap) > 2 * len(self._activity) + 64:
+            self._activity_heap = [(t, sid) for sid, t in self._activity.items()]
+            heapq.heapify(self._activity_heap)
     
     async def save(self, state: WorkflowState) -> bool:
         """保存工作流状态"""
         session_id = state.session_id
         
-        async with self._lock:
-            # 保存状态和元数据
-            self._storage[session_id] = state
-            self._metadata[session_id] = {
-                'last_saved': datetime.now(),
-                'save_count': self._metadata.get(session_id, {}).get('save_count', 0) + 1
-            }
-            
-            logger.debug("工作流状态已保存到内存", session_id=session_id)
-            return True
+        # 保存状态和元数据
+        now = datetime.now()
+        self._unsized.add(session_id)
+        self._storage[session_id] = state
+        self._metadata[session_id] = {
+            'last_saved': now,
+            'save_count': self._metadata.get(session_id, {}).get('save_count', 0) + 1
+        }
+        self._touch(session_id, now)
+        
+        logger.debug("工作流状态已保存到内存", session_id=session_id)
+        return True
     
     async def load(self, session_id: str) -> Optional[WorkflowState]:
-        """加载工作流状态"""
-        async with self._lock:
-            if session_id not in self._storage:
-                return None
-            
-            # 更新元数据
-            self._metadata[session_id]['last_loaded'] = datetime.now()
-            self._metadata[session_id]['load_count'] = self._metadata[session_id].get('load_count', 0) + 1
-            
-            # 返回状态的深拷贝，避免外部修改
-            return self._storage[session_id]
+        """
+        加载工作流状态
+        
+        返回存储中的对象本身（不复制），对其修改会直接反映到存储中；
+        需要隔离的调用方使用 load_copy
+        """
+        state = self._storage.get(session_id)
+        if state is None:
+            return None
+        
+        # 更新元数据
+        try:
+            meta = self._metadata[session_id]
+        except KeyError:
+            return state
+        now = datetime.now()
+        meta['last_loaded'] = now
+        meta['load_count'] = meta.get('load_count', 0) + 1
+        self._touch(session_id, now)
+        
+        return state
+    
+    async def load_copy(self, session_id: str) -> Optional[WorkflowState]:
+        """加载工作流状态的深拷贝，对副本的修改不影响存储"""
+        state = await self.load(session_id)
+        if state is None:
+            return None
+        # to_dict/from_dict 会共享嵌套的 stage_data 等容器，这里需要深拷贝
+        return copy.deepcopy(state)
     
     async def delete(self, session_id: str) -> bool:
         """删除工作流状态"""
-        async with self._lock:
-            if session_id in self._storage:
-                del self._storage[session_id]
-                del self._metadata[session_id]
-                logger.debug("工作流状态已从内存删除", session_id=session_id)
-                return True
+        if self._storage.pop(session_id, None) is None:
             return False
+        self._forget(session_id)
+        logger.debug("工作流状态已从内存删除", session_id=session_id)
+        return True
     
     async def exists(self, session_id: str) -> bool:
         """检查工作流状态是否存在"""
-        async with self._lock:
-            return session_id in self._storage
+        return session_id in self._storage
     
     async def list_sessions(self) -> List[Dict[str, Any]]:
         """列出所有会话"""
-        async with self._lock:
-            result = []
-            
-            for session_id, state in self._storage.items():
-                meta = self._metadata.get(session_id, {})
-                
-                result.append({
-                    'session_id': session_id,
-                    'current_stage': state.current_stage.value,
-                    'last_saved': meta.get('last_saved').isoformat() if meta.get('last_saved') else None,
-                    'last_loaded': meta.get('last_loaded').isoformat() if meta.get('last_loaded') else None,
-                    'save_count': meta.get('save_count', 0),
-                    'load_count': meta.get('load_count', 0)
-                })
+        result = []
+        
+        for session_id, state in list(self._storage.items()):
+            meta = self._metadata.get(session_id, {})
             
-            return result
+            result.append({
+                'session_id': session_id,
+                'current_stage': state.current_stage.value,
+                'last_saved': meta.get('last_saved').isoformat() if meta.get('last_saved') else None,
+                'last_loaded': meta.get('last_loaded').isoformat() if meta.get('last_loaded') else None,
+                'save_count': meta.get('save_count', 0),
+                'load_count': meta.get('load_count', 0)
+            })
+        
+        return result
     
     async def cleanup(self, days: int = 30) -> int:
         """清理旧的会话"""
@@ -93,22 +137,18 @@ class MemoryWorkflowStateStorage(WorkflowStateStorage):
             now = datetime.now()
             cutoff = now.timestamp() - (days * 24 * 60 * 60)
             
-            to_delete = []
-            for session_id, meta in self._metadata.items():
-                last_activity = max(
-                    meta.get('last_saved', datetime.fromtimestamp(0)),
-                    meta.get('last_loaded', datetime.fromtimestamp(0))
-                )
+            # 从堆顶取出早于截止时间的记录，只处理过期的会话
+            heap = self._activity_heap
+            count = 0
+            while heap and heap[0][0] < cutoff:
+                ts, session_id = heapq.heappop(heap)
+                if self._activity.get(session_id) != ts:
+                    # 会话已删除或之后有过活动
+                    continue
+                self._storage.pop(session_id, None)
+                self._forget(session_id)
+                count += 1
                 
-                if last_activity.timestamp() < cutoff:
-                    to_delete.append(session_id)
-            
-            # 删除过期的会话
-            for session_id in to_delete:
-                del self._storage[session_id]
-                del self._metadata[session_id]
-                
-            count = len(to_delete)
             if count > 0:
                 logger.info(f"已从内存清理{count}个过期会话", days=days)
                 
@@ -121,8 +161,12 @@ class MemoryWorkflowStateStorage(WorkflowStateStorage):
     
     async def get_stats(self) -> Dict[str, Any]:
         """获取存储统计信息"""
-        async with self._lock:
-            return {
-                'session_count': len(self._storage),
-                'memory_usage_estimate': sum(len(str(s.to_dict())) for s in self._storage.values())
-            }
\ No newline at end of file
+        for session_id in self._unsized:
+            size = len(str(self._storage[session_id].to_dict()))
+            self._bytes_estimate += size - self._sizes.get(session_id, 0)
+            self._sizes[session_id] = size
+        self._unsized.clear()
+        return {
+            'session_count': len(self._storage),
+            'memory_usage_estimate': self._bytes_estimate
+        }
\ No newline at end of file
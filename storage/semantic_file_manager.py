@@ -6,66 +6,194 @@
 """
 
 import asyncio
+import heapq
+import itertools
+import math
+import os
+import shutil
+import tarfile
+import threading
 import time
+import weakref
 try:
     import fcntl
 except ImportError:
     fcntl = None  # Windows doesn't have fcntl
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # 未安装zstandard时备份使用gzip
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from collections import OrderedDict
 import structlog
 from contextlib import asynccontextmanager
 
 from .local_semantic_storage import LocalSemanticStorage
+from .advanced_cache_manager import CacheEntry, ClockCacheLevel
 
 
 logger = structlog.get_logger(__name__)
 
 
-class TimedLRUCache:
+def _scan_fields_files(databases_path: Path) -> List[Path]:
+    """列出实例下所有集合的字段文件（os.scandir 目录项自带类型信息，无需逐个 stat）"""
+    fields_files: List[Path] = []
+    try:
+        db_entries = list(os.scandir(databases_path))
+    except FileNotFoundError:
+        return fields_files
+    
+    for db_entry in db_entries:
+        if not db_entry.is_dir(follow_symlinks=False):
+            continue
+        try:
+            coll_entries = list(os.scandir(os.path.join(db_entry.path, "collections")))
+        except FileNotFoundError:
+            continue
+        for coll_entry in coll_entries:
+            if not coll_entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                with os.scandir(coll_entry.path) as entries:
+                    if any(entry.name == "fields.json" and entry.is_file() for entry in entries):
+                        fields_files.append(Path(coll_entry.path, "fields.json"))
+            except FileNotFoundError:
+                continue
+    
+    return fields_files
+
+
+def _scan_instance_files(instance_path: Path) -> Optional[List[Path]]:
+    """列出实例元数据与各集合的字段文件，实例不存在时返回None（在线程池中执行）"""
+    if not instance_path.exists():
+        return None
+    files = []
+    metadata_file = instance_path / "metadata.json"
+    if metadata_file.exists():
+        files.append(metadata_file)
+    files.extend(_scan_fields_files(instance_path / "databases"))
+    return files
+
+
+def _write_backup_archive(source: Path, arcname: str, backup_file: Path) -> None:
+    """打包备份（在线程池中执行）：zstandard 可用时多线程 zstd 压缩，否则 gzip 低压缩级别"""
+    if backup_file.name.endswith(".tar.zst"):
+        cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+        with open(backup_file, "wb") as f, cctx.stream_writer(f) as writer:
+            with tarfile.open(fileobj=writer, mode="w|") as tar:
+                tar.add(source, arcname=arcname)
+    else:
+        with tarfile.open(backup_file, "w:gz", compresslevel=1) as tar:
+            tar.add(source, arcname=arcname)
+
+
+def _extract_backup_archive(backup_file: Path, target: Path) -> None:
+    """解包备份（在线程池中执行），按扩展名区分 zstd 与 gzip"""
+    if backup_file.name.endswith(".tar.zst"):
+        if zstandard is None:
+            raise ValueError("恢复zstd备份需要安装zstandard")
+        with open(backup_file, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                tar.extractall(path=target)
+    else:
+        with tarfile.open(backup_file, "r:*") as tar:
+            tar.extractall(path=target)
+
+
+class _PerLoopLock:
+    """
+    按事件循环提供 asyncio 锁
+
+    共享缓存可能先后被多个事件循环使用（如每次 asyncio.run），而 asyncio.Lock 在首次等待时绑定事件循环，
+    跨循环复用会报错，因此每个事件循环各用一把锁，事件循环被回收时对应的锁随之释放
+    """
+    
+    def __init__(self):
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = \
+            weakref.WeakKeyDictionary()
+    
+    @property
+    def _lock(self) -> asyncio.Lock:
+        """当前事件循环的锁"""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+
+class TimedLRUCache(_PerLoopLock):
     """带TTL的LRU缓存"""
     
     def __init__(self, maxsize: int = 128, ttl: int = 300):
+        super().__init__()
         self.maxsize = maxsize
         self.ttl = ttl
-        self.cache = OrderedDict()
-        self.timestamps = {}
-        self._lock = asyncio.Lock()
+        self.cache = OrderedDict()  # key -> (写入时间, 值)
+        # (写入时间, key) 最小堆，用于按写入时间找出过期条目；
+        # 覆盖写入或淘汰后留下的旧记录在使用时跳过，过多时重建
+        self._expiry_heap: List[Tuple[float, str]] = []
     
     async def get(self, key: str) -> Optional[Any]:
-        """获取缓存值"""
-        async with self._lock:
-            if key in self.cache:
-                # 检查是否过期
-                if time.time() - self.timestamps[key] < self.ttl:
-                    # 移动到末尾（最近使用）
-                    value = self.cache.pop(key)
-                    self.cache[key] = value
-                    return value
-                else:
-                    # 过期，删除
-                    del self.cache[key]
-                    del self.timestamps[key]
+        """
+        获取缓存值
+        
+        命中路径不获取锁：方法内没有await，在事件循环中不会与其他协程交错执行，
+        锁只用于写入与淘汰
+        """
+        entry = self.cache.get(key)
+        if entry is None:
             return None
+        
+        # 检查是否过期
+        timestamp, value = entry
+        if time.time() - timestamp < self.ttl:
+            # 移动到末尾（最近使用）
+            self.cache.move_to_end(key)
+            return value
+        
+        # 过期，删除
+        del self.cache[key]
+        return None
     
     async def set(self, key: str, value: Any):
-        """设置缓存值"""
-        async with self._lock:
-            # 如果已存在，先删除
-            if key in self.cache:
-                del self.cache[key]
-                del self.timestamps[key]
-            
-            # 如果缓存满了，删除最旧的条目
-            while len(self.cache) >= self.maxsize:
-                oldest_key = next(iter(self.cache))
-                del self.cache[oldest_key]
-                del self.timestamps[oldest_key]
+        """
+        设置缓存值
+        
+        淘汰与插入之间没有await，整体不会与其他协程交错，无需等待锁，
+        并发预加载时各写入不互相排队
+        """
+        timestamp = time.time()
+        if key in self.cache:
+            # 覆盖写入：原地更新并移到末尾，无需淘汰
+            self.cache[key] = (timestamp, value)
+            self.cache.move_to_end(key)
+        else:
+            # 如果缓存满了，淘汰条目
+            while self.cache and len(self.cache) >= self.maxsize:
+                self._evict_one()
             
             # 添加新条目
-            self.cache[key] = value
-            self.timestamps[key] = time.time()
+            self.cache[key] = (timestamp, value)
+        heapq.heappush(self._expiry_heap, (timestamp, key))
+        if len(self._expiry_heap) > 2 * len(self.cache) + 64:
+            self._rebuild_expiry_heap()
+    
+    def _rebuild_expiry_heap(self):
+        """按当前条目重建过期堆，丢弃旧记录"""
+        self._expiry_heap = [(timestamp, key) for key, (timestamp, _) in self.cache.items()]
+        heapq.heapify(self._expiry_heap)
+    
+    def _is_current(self, timestamp: float, key: str) -> bool:
+        """堆记录是否对应缓存中的当前条目"""
+        entry = self.cache.get(key)
+        return entry is not None and entry[0] == timestamp
+    
+    def _evict_one(self):
+        """淘汰最久未使用的条目"""
+        self.cache.popitem(last=False)
     
     async def invalidate(self, pattern: str = None):
         """缓存失效"""
@@ -73,19 +201,171 @@ class TimedLRUCache:
             if pattern is None:
                 # 清空所有缓存
                 self.cache.clear()
-                self.timestamps.clear()
+                self._expiry_heap.clear()
             else:
                 # 按模式删除
                 keys_to_remove = [key for key in self.cache.keys() if pattern in key]
                 for key in keys_to_remove:
                     del self.cache[key]
-                    del self.timestamps[key]
+    
+    async def cleanup_expired(self) -> int:
+        """清理过期条目，返回清理数量（同步完成，无需等待锁）"""
+        cutoff = time.time() - self.ttl
+        heap = self._expiry_heap
+        count = 0
+        # 只弹出堆顶已过期的记录，不扫描未过期条目
+        while heap and heap[0][0] <= cutoff:
+            timestamp, key = heapq.heappop(heap)
+            if self._is_current(timestamp, key):
+                del self.cache[key]
+                count += 1
+        
+        return count
+    
+    def _count_expired(self, cutoff: float) -> int:
+        """统计过期条目数：只遍历堆中写入时间不晚于cutoff的子树"""
+        heap = self._expiry_heap
+        expired = set()
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            timestamp, key = heap[i]
+            if timestamp > cutoff:
+                # 堆性质：子节点不早于父节点
+                continue
+            if self._is_current(timestamp, key):
+                expired.add(key)
+            stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(heap))
+        return len(expired)
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        async with self._lock:
+            expired_count = self._count_expired(time.time() - self.ttl)
+            
+            return {
+                "total_entries": len(self.cache),
+                "expired_entries": expired_count,
+                "max_size": self.maxsize,
+                "ttl": self.ttl
+            }
+
+
+class TimedValueLRUCache(TimedLRUCache):
+    """
+    价值感知的LRU缓存（v-LRU）
+    
+    淘汰时只在最久未使用的一小段窗口内挑选，取价值最低的条目：
+    价值 = 语义置信度 + 命中次数，使高置信度、常被查询的字段不会被批量恢复等一次性访问冲掉。
+    """
+    
+    def __init__(self, maxsize: int = 128, ttl: int = 300, window_ratio: float = 0.1):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.window_size = max(1, int(maxsize * window_ratio))
+        self.hits: Dict[str, int] = {}
+    
+    @staticmethod
+    def _confidence(value: Any) -> float:
+        """从缓存值中提取置信度（非语义数据视为0）"""
+        if isinstance(value, dict):
+            try:
+                return float(value.get("confidence", 0.0))
+            except (TypeError, ValueError):
+                return 0.0
+        return 0.0
+    
+    def _score(self, key: str) -> float:
+        """条目价值 e = log(v + h + δ)"""
+        return math.log(self._confidence(self.cache[key][1]) + self.hits.get(key, 0) + 0.01)
+    
+    def _evict_one(self):
+        """在最久未使用的窗口内淘汰价值最低的条目"""
+        window = itertools.islice(self.cache, self.window_size)
+        victim = min(window, key=self._score)
+        del self.cache[victim]
+        self.hits.pop(victim, None)
+    
+    def _prune_hits(self):
+        """移除已不在缓存中的命中计数"""
+        if len(self.hits) > len(self.cache):
+            self.hits = {key: count for key, count in self.hits.items() if key in self.cache}
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值并累计命中次数"""
+        value = await super().get(key)
+        if value is not None:
+            self.hits[key] = self.hits.get(key, 0) + 1
+        else:
+            self.hits.pop(key, None)
+        return value
+    
+    async def invalidate(self, pattern: str = None):
+        """缓存失效"""
+        await super().invalidate(pattern)
+        self._prune_hits()
+    
+    async def cleanup_expired(self) -> int:
+        """清理过期条目，返回清理数量"""
+        expired_count = await super().cleanup_expired()
+        self._prune_hits()
+        return expired_count
+
+
+class TimedClockCache(_PerLoopLock):
+    """
+    带TTL的CLOCK缓存
+    
+    命中只置位引用标记，不移动条目也不获取锁；写入、淘汰和失效仍在锁内完成。
+    接口与TimedLRUCache一致。
+    """
+    
+    def __init__(self, maxsize: int = 128, ttl: int = 300):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache = ClockCacheLevel(maxsize)
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值（命中路径无锁）"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        
+        if time.time() - entry.timestamp < self.ttl:
+            return entry.data
+        
+        # 过期，删除（期间可能已被重新写入，只删除同一条目）
+        async with self._lock:
+            if self.cache.get(key) is entry:
+                self.cache.pop(key)
+        return None
+    
+    async def set(self, key: str, value: Any):
+        """设置缓存值，满载时由时钟指针淘汰"""
+        async with self._lock:
+            self.cache.put(key, CacheEntry(value, time.time(), self.ttl))
+    
+    async def invalidate(self, pattern: str = None):
+        """缓存失效"""
+        async with self._lock:
+            if pattern is None:
+                self.cache.clear()
+            else:
+                for key in [key for key in self.cache if pattern in key]:
+                    self.cache.pop(key)
+    
+    async def cleanup_expired(self) -> int:
+        """清理过期条目，返回清理数量"""
+        async with self._lock:
+            # purge_expired按条目自身的ttl判断，与self.ttl一致
+            return len(self.cache.purge_expired(time.time()))
     
     async def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计"""
         async with self._lock:
             current_time = time.time()
-            expired_count = sum(1 for ts in self.timestamps.values() if current_time - ts >= self.ttl)
+            expired_count = sum(1 for _, entry in self.cache.items()
+                                if current_time - entry.timestamp >= self.ttl)
             
             return {
                 "total_entries": len(self.cache),
@@ -95,67 +375,181 @@ class TimedLRUCache:
             }
 
 
+# 缓存淘汰策略
+CACHE_POLICIES = {
+    "lru": TimedLRUCache,
+    "vlru": TimedValueLRUCache,
+    "clock": TimedClockCache,
+}
+
+# 按 (存储根目录, 策略, 容量, TTL) 共享的缓存实例，同一目录上的多个管理器复用同一份缓存；
+# 只弱引用缓存，最后一个使用它的管理器被回收后条目自动移除
+_shared_caches: "weakref.WeakValueDictionary[Tuple[str, str, int, int], Any]" = weakref.WeakValueDictionary()
+_shared_caches_lock = threading.Lock()
+
+
+def _get_shared_cache(base_path: Path, cache_policy: str, cache_size: int, cache_ttl: int):
+    """获取（首次调用时创建）指定存储根目录的共享缓存"""
+    key = (str(Path(base_path).resolve()), cache_policy, cache_size, cache_ttl)
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = CACHE_POLICIES[cache_policy](maxsize=cache_size, ttl=cache_ttl)
+        return cache
+
+
+class _LockFile:
+    """复用的锁文件描述符"""
+    
+    __slots__ = ("fd", "users", "lock")
+    
+    def __init__(self, fd: int, lock: Optional[asyncio.Lock]):
+        self.fd = fd
+        self.users = 0  # 持有与等待者数，为0时才能关闭
+        self.lock = lock  # 进程内锁，同一描述符上的持有者依次获得文件锁
+
+
 class FileLocker:
-    """文件锁管理器"""
+    """
+    文件锁管理器
+    
+    锁文件释放后保留在磁盘上（删除正被其他进程等待的锁文件会让双方锁住不同的inode）。
+    传入 lock_fds 时锁文件描述符按路径复用，后续加锁只需一次 flock；
+    flock 按打开的文件描述隔离，同一描述符上的重复加锁不会互斥，
+    因此复用的描述符配一把进程内的 asyncio 锁，同一进程内的持有者依次获得文件锁
+    """
     
-    def __init__(self, file_path: Path):
+    def __init__(self, file_path: Path, lock_fds: Optional["OrderedDict[Path, _LockFile]"] = None,
+                 max_lock_fds: int = 256):
+        """
+        Args:
+            file_path: 被保护的文件路径
+            lock_fds: 可复用的锁文件描述符表（按最近使用排序）
+            max_lock_fds: 描述符表的容量，超出时关闭最久未用的空闲描述符
+        """
         self.file_path = file_path
-        self.lock_file = None
         self.lock_path = file_path.with_suffix('.lock')
+        self.lock_fds = lock_fds
+        self.max_lock_fds = max_lock_fds
+        self._entry: Optional[_LockFile] = None
     
     async def __aenter__(self):
-        """获取文件锁"""
-        try:
-            # 确保锁文件目录存在
-            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 创建锁文件
-            self.lock_file = open(self.lock_path, 'w')
+        """获取文件锁（同一进程内的其他持有者释放前等待）"""
+        entry = self.lock_fds.get(self.file_path) if self.lock_fds is not None else None
+        if entry is None:
+            # 确保锁文件目录存在（在线程池中执行，慢速磁盘上不阻塞事件循环）
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._ensure_lock_dir)
             
-            # 尝试获取排他锁
-            if fcntl is not None:
-                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-            
-            logger.debug("文件锁获取成功", file_path=str(self.file_path))
-            return self
-            
-        except (IOError, OSError) as e:
-            if self.lock_file:
-                self.lock_file.close()
-                self.lock_file = None
-            logger.warning("文件锁获取失败", file_path=str(self.file_path), error=str(e))
+            try:
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                logger.warning("文件锁获取失败", file_path=str(self.file_path), error=str(e))
+                raise
+            entry = _LockFile(fd, asyncio.Lock() if self.lock_fds is not None else None)
+            if self.lock_fds is not None:
+                # 等待建目录期间可能已有其他协程登记了描述符
+                entry = self.lock_fds.setdefault(self.file_path, entry)
+                if entry.fd != fd:
+                    os.close(fd)
+        
+        # 登记后描述符不会被关闭
+        entry.users += 1
+        if self.lock_fds is not None:
+            self.lock_fds.move_to_end(self.file_path)
+            _close_idle_lock_files(self.lock_fds, self.max_lock_fds)
+        try:
+            if entry.lock is not None:
+                await entry.lock.acquire()
+            try:
+                if fcntl is not None:
+                    fcntl.flock(entry.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BaseException:
+                if entry.lock is not None:
+                    entry.lock.release()
+                raise
+        except BaseException as e:
+            entry.users -= 1
+            if self.lock_fds is None:
+                os.close(entry.fd)
+            if isinstance(e, OSError):
+                logger.warning("文件锁获取失败", file_path=str(self.file_path), error=str(e))
             raise
+        
+        self._entry = entry
+        logger.debug("文件锁获取成功", file_path=str(self.file_path))
+        return self
+    
+    def _ensure_lock_dir(self):
+        """创建锁文件所在目录"""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """释放文件锁"""
-        if self.lock_file:
-            try:
-                if fcntl is not None:
-                    fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
-                self.lock_file.close()
-                
-                # 删除锁文件
-                if self.lock_path.exists():
-                    self.lock_path.unlink()
-                    
-                logger.debug("文件锁释放成功", file_path=str(self.file_path))
-                
-            except Exception as e:
-                logger.error("文件锁释放失败", file_path=str(self.file_path), error=str(e))
-            finally:
-                self.lock_file = None
+        entry, self._entry = self._entry, None
+        if entry is None:
+            return
+        
+        try:
+            if fcntl is not None:
+                fcntl.flock(entry.fd, fcntl.LOCK_UN)
+            if self.lock_fds is None:
+                os.close(entry.fd)
+            logger.debug("文件锁释放成功", file_path=str(self.file_path))
+            
+        except Exception as e:
+            logger.error("文件锁释放失败", file_path=str(self.file_path), error=str(e))
+        finally:
+            entry.users -= 1
+            if entry.lock is not None:
+                entry.lock.release()
+
+
+def _close_idle_lock_files(lock_fds: "OrderedDict[Path, _LockFile]", limit: int):
+    """从最久未用的开始关闭空闲描述符，直到描述符表不超过 limit（持有中的描述符保留）"""
+    if len(lock_fds) <= limit:
+        return
+    for file_path, entry in list(lock_fds.items()):
+        if len(lock_fds) <= limit:
+            break
+        if entry.users == 0:
+            os.close(entry.fd)
+            del lock_fds[file_path]
 
 
 class SemanticFileManager:
     """语义文件管理器"""
     
-    def __init__(self, storage: LocalSemanticStorage, cache_size: int = 1000, cache_ttl: int = 300):
+    def __init__(self, storage: LocalSemanticStorage, cache_size: int = 1000, cache_ttl: int = 300,
+                 cache_policy: str = "lru", shared_cache: bool = True):
+        """
+        Args:
+            storage: 底层存储
+            cache_size: 缓存大小
+            cache_ttl: 缓存TTL（秒）
+            cache_policy: 缓存淘汰策略，"lru"、"vlru"（价值感知LRU）
+                或 "clock"（高并发读取时命中路径无锁）
+            shared_cache: 是否与同一存储目录上配置相同的其他管理器共享缓存
+        """
+        if cache_policy not in CACHE_POLICIES:
+            raise ValueError(f"不支持的缓存策略: {cache_policy}")
+        
         self.storage = storage
-        self.cache = TimedLRUCache(maxsize=cache_size, ttl=cache_ttl)
+        if shared_cache:
+            self.cache = _get_shared_cache(storage.base_path, cache_policy, cache_size, cache_ttl)
+        else:
+            self.cache = CACHE_POLICIES[cache_policy](maxsize=cache_size, ttl=cache_ttl)
         self._operation_semaphore = asyncio.Semaphore(10)  # 限制并发操作数
+        self._lock_fds: "OrderedDict[Path, _LockFile]" = OrderedDict()  # 跨进程写入的锁文件描述符，按路径复用
+        self.max_lock_fds = 256
         
     async def load_file_with_cache(self, file_path: Path, cache_key: str = None) -> Optional[Dict[str, Any]]:
-        """带缓存的文件加载"""
+        """
+        带缓存的文件加载
+        
+        读取不加文件锁：写入总是先写临时文件再 os.replace 替换，读到的要么是旧文件要么是新文件；
+        返回的数据与缓存共享，调用方不得修改
+        """
         if cache_key is None:
             cache_key = str(file_path)
         
@@ -165,38 +559,55 @@ class SemanticFileManager:
             logger.debug("缓存命中", cache_key=cache_key)
             return cached_data
         
-        # 从文件加载
+        # 从文件加载，信号量只限制文件IO，缓存更新在信号量外进行
         async with self._operation_semaphore:
             data = await self.storage._read_json_file(file_path)
-            
-            if data is not None:
-                # 存入缓存
-                await self.cache.set(cache_key, data)
-                logger.debug("文件加载并缓存", file_path=str(file_path))
-            
-            return data
+        
+        if data is not None:
+            # 存入缓存
+            await self.cache.set(cache_key, data)
+            logger.debug("文件加载并缓存", file_path=str(file_path))
+        
+        return data
     
-    async def save_file_atomic(self, file_path: Path, data: Dict[str, Any], cache_key: str = None) -> bool:
-        """原子性文件保存"""
+    async def save_file_atomic(self, file_path: Path, data: Dict[str, Any], cache_key: str = None,
+                               cross_process: bool = False) -> bool:
+        """
+        原子性文件保存
+        
+        底层写入为临时文件加 os.replace，单进程写入本身即是原子的，不再加文件锁；
+        多个进程可能同时写同一文件时传入 cross_process=True 以文件锁串行化
+        """
+        # 信号量只限制文件IO，缓存更新在信号量外进行
         async with self._operation_semaphore:
-            # 使用文件锁确保原子性
-            async with FileLocker(file_path):
+            if cross_process:
+                async with FileLocker(file_path, self._lock_fds, self.max_lock_fds):
+                    success = await self.storage._atomic_write(file_path, data)
+            else:
                 success = await self.storage._atomic_write(file_path, data)
-                
-                if success:
-                    # 更新缓存
-                    if cache_key is None:
-                        cache_key = str(file_path)
-                    await self.cache.set(cache_key, data)
-                    logger.debug("文件保存并更新缓存", file_path=str(file_path))
-                
-                return success
+        
+        if success:
+            # 更新缓存
+            if cache_key is None:
+                cache_key = str(file_path)
+            await self.cache.set(cache_key, data)
+            logger.debug("文件保存并更新缓存", file_path=str(file_path))
+        
+        return success
     
     async def invalidate_cache(self, pattern: str = None):
         """缓存失效"""
         await self.cache.invalidate(pattern)
         logger.info("缓存失效", pattern=pattern)
     
+    def close_lock_files(self):
+        """关闭当前无人持有或等待的锁文件描述符"""
+        _close_idle_lock_files(self._lock_fds, 0)
+    
+    async def close(self):
+        """关闭管理器持有的锁文件描述符"""
+        self.close_lock_files()
+    
     async def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计"""
         return await self.cache.get_stats()
@@ -219,31 +630,15 @@ class SemanticFileManager:
         
         try:
             instance_path = self.storage._get_instance_path(instance_name)
-            if not instance_path.exists():
+            # 收集实例元数据与各集合的字段文件（目录扫描在线程池中执行）
+            loop = asyncio.get_running_loop()
+            files = await loop.run_in_executor(None, _scan_instance_files, instance_path)
+            if files is None:
                 logger.warning("实例路径不存在", instance=instance_name)
                 return
             
-            # 预加载实例元数据
-            metadata_file = instance_path / "metadata.json"
-            if metadata_file.exists():
-                await self.load_file_with_cache(metadata_file)
-            
-            # 预加载数据库和集合的字段文件
-            databases_path = instance_path / "databases"
-            if databases_path.exists():
-                for db_path in databases_path.iterdir():
-                    if not db_path.is_dir():
-                        continue
-                    
-                    collections_path = db_path / "collections"
-                    if collections_path.exists():
-                        for collection_path in collections_path.iterdir():
-                            if not collection_path.is_dir():
-                                continue
-                            
-                            fields_file = collection_path / "fields.json"
-                            if fields_file.exists():
-                                await self.load_file_with_cache(fields_file)
+            # 并发加载，实际并发数由操作信号量限制
+            await asyncio.gather(*(self.load_file_with_cache(file_path) for file_path in files))
             
             logger.info("实例数据预加载完成", instance=instance_name)
             
@@ -254,25 +649,13 @@ class SemanticFileManager:
         """清理过期缓存"""
         stats_before = await self.cache.get_stats()
         
-        # 触发过期检查（通过尝试获取所有键）
-        async with self.cache._lock:
-            current_time = time.time()
-            expired_keys = [
-                key for key, timestamp in self.cache.timestamps.items()
-                if current_time - timestamp >= self.cache.ttl
-            ]
-            
-            for key in expired_keys:
-                if key in self.cache.cache:
-                    del self.cache.cache[key]
-                if key in self.cache.timestamps:
-                    del self.cache.timestamps[key]
+        expired_count = await self.cache.cleanup_expired()
         
         stats_after = await self.cache.get_stats()
         
         logger.info(
             "缓存清理完成",
-            expired_count=len(expired_keys),
+            expired_count=expired_count,
             before_count=stats_before["total_entries"],
             after_count=stats_after["total_entries"]
         )
@@ -280,10 +663,6 @@ class SemanticFileManager:
     async def backup_semantic_data(self, instance_name: str, backup_path: Path) -> bool:
         """备份语义数据"""
         try:
-            import shutil
-            import tarfile
-            from datetime import datetime
-            
             instance_path = self.storage._get_instance_path(instance_name)
             if not instance_path.exists():
                 logger.error("实例路径不存在", instance=instance_name)
@@ -294,17 +673,19 @@ class SemanticFileManager:
             
             # 生成备份文件名
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = backup_path / f"{instance_name}_semantic_backup_{timestamp}.tar.gz"
+            extension = "tar.zst" if zstandard is not None else "tar.gz"
+            backup_file = backup_path / f"{instance_name}_semantic_backup_{timestamp}.{extension}"
             
-            # 创建压缩备份
-            with tarfile.open(backup_file, "w:gz") as tar:
-                tar.add(instance_path, arcname=instance_name)
+            # 创建压缩备份，压缩在线程池中进行以免阻塞事件循环
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _write_backup_archive, instance_path, instance_name, backup_file)
             
+            file_size = (await loop.run_in_executor(None, backup_file.stat)).st_size
             logger.info(
                 "语义数据备份完成",
                 instance=instance_name,
                 backup_file=str(backup_file),
-                file_size=backup_file.stat().st_size
+                file_size=file_size
             )
             
             return True
@@ -316,8 +697,6 @@ class SemanticFileManager:
     async def restore_semantic_data(self, backup_file: Path, instance_name: str) -> bool:
         """恢复语义数据"""
         try:
-            import tarfile
-            
             if not backup_file.exists():
                 logger.error("备份文件不存在", backup_file=str(backup_file))
                 return False
@@ -332,8 +711,9 @@ class SemanticFileManager:
                 shutil.move(str(instance_path), str(backup_existing))
             
             # 解压恢复
-            with tarfile.open(backup_file, "r:gz") as tar:
-                tar.extractall(path=self.storage.base_path / "instances")
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, _extract_backup_archive, backup_file, self.storage.base_path / "instances")
             
             # 清理相关缓存
             await self.invalidate_cache(instance_name)
@@ -361,30 +741,24 @@ class SemanticFileManager:
         
         try:
             instance_path = self.storage._get_instance_path(instance_name)
-            if not instance_path.exists():
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, instance_path.exists):
                 return optimization_stats
             
-            # 遍历所有字段文件进行优化
-            databases_path = instance_path / "databases"
-            if databases_path.exists():
-                for db_path in databases_path.iterdir():
-                    if not db_path.is_dir():
-                        continue
-                    
-                    collections_path = db_path / "collections"
-                    if collections_path.exists():
-                        for collection_path in collections_path.iterdir():
-                            if not collection_path.is_dir():
-                                continue
-                            
-                            fields_file = collection_path / "fields.json"
-                            if fields_file.exists():
-                                optimization_stats["files_processed"] += 1
-                                
-                                # 优化文件（移除空字段、压缩格式等）
-                                optimized = await self._optimize_fields_file(fields_file)
-                                if optimized:
-                                    optimization_stats["files_optimized"] += 1
+            # 一次扫描收集所有字段文件，再并发优化（移除空字段、压缩格式等），并发数由操作信号量限制
+            fields_files = await loop.run_in_executor(None, _scan_fields_files, instance_path / "databases")
+            
+            async def optimize(fields_file: Path) -> bool:
+                async with self._operation_semaphore:
+                    return await self._optimize_fields_file(fields_file)
+            
+            results = await asyncio.gather(*(optimize(f) for f in fields_files), return_exceptions=True)
+            for result in results:
+                optimization_stats["files_processed"] += 1
+                if isinstance(result, BaseException):
+                    optimization_stats["errors"].append(str(result))
+                elif result:
+                    optimization_stats["files_optimized"] += 1
             
             logger.info(
                 "存储优化完成",
@@ -401,19 +775,22 @@ class SemanticFileManager:
     async def _optimize_fields_file(self, fields_file: Path) -> bool:
         """优化字段文件"""
         try:
-            original_size = fields_file.stat().st_size
+            loop = asyncio.get_running_loop()
+            original_size = (await loop.run_in_executor(None, fields_file.stat)).st_size
             
             # 读取文件
             data = await self.storage._read_json_file(fields_file)
             if not data:
                 return False
             
-            # 优化数据结构
+            # 优化数据结构（读到的数据是共享只读对象，优化结果写入新的字段表）
             optimized = False
             
-            # 移除空的分析结果
             if "fields" in data:
+                fields = {}
                 for field_path, field_info in data["fields"].items():
+                    field_info = dict(field_info)
+                    # 移除空的分析结果
                     if "analysis_result" in field_info:
                         analysis = field_info["analysis_result"]
                         if not analysis or (isinstance(analysis, dict) and not any(analysis.values())):
@@ -424,12 +801,14 @@ class SemanticFileManager:
                     if "examples" in field_info and not field_info["examples"]:
                         del field_info["examples"]
                         optimized = True
+                    fields[field_path] = field_info
+                data = {**data, "fields": fields}
             
             # 如果有优化，重新保存
             if optimized:
                 success = await self.storage._atomic_write(fields_file, data)
                 if success:
-                    new_size = fields_file.stat().st_size
+                    new_size = (await loop.run_in_executor(None, fields_file.stat)).st_size
                     logger.debug(
                         "字段文件优化完成",
                         file=str(fields_file),
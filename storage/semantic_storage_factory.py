@@ -3,11 +3,15 @@
 语义存储工厂
 
 提供统一的语义存储工厂，支持多种存储后端
+
+存储后端模块（storage.semantic_<类型>_storage）通过模块级变量 STORAGE_CLASS 声明其实现类；
+未声明时工厂在模块中查找唯一一个定义于该模块的 SemanticStorageInterface 具体子类
 """
 
 import os
-import importlib
 import inspect
+import importlib
+import threading
 from typing import Dict, Any, Optional, Type
 from pathlib import Path
 import structlog
@@ -25,7 +29,10 @@ class SemanticStorageFactory:
     """语义存储工厂"""
     
     _instance = None
+    # 存储实现表在首次创建存储或查询可用实现时发现并填充，所有实例共享
     _storage_implementations = {}
+    _discovered = False
+    _discovery_lock = threading.Lock()
     
     @classmethod
     def get_instance(cls):
@@ -35,66 +42,99 @@ class SemanticStorageFactory:
         return cls._instance
     
     def __init__(self):
-        """初始化存储工厂"""
-        self._discover_storage_implementations()
+        """初始化存储工厂（存储实现在首次使用时发现）"""
     
-    def _discover_storage_implementations(self):
+    @classmethod
+    def _ensure_discovered(cls):
+        """首次使用时发现存储实现（只执行一次）"""
+        if cls._discovered:
+            return
+        with cls._discovery_lock:
+            if not cls._discovered:
+                cls._discover_storage_implementations()
+                cls._discovered = True
+    
+    @classmethod
+    def _discover_storage_implementations(cls):
         """发现所有存储实现类"""
         logger.info("开始发现语义存储实现")
         
         # 注册内置存储实现
-        self._register_builtin_implementations()
+        cls._register_builtin_implementations()
         
         # 尝试导入其他可能的存储实现
-        self._try_import_storage("semantic_mongodb_storage", SemanticStorageType.MONGODB)
-        self._try_import_storage("semantic_redis_storage", SemanticStorageType.REDIS)
-        self._try_import_storage("semantic_elasticsearch_storage", SemanticStorageType.ELASTICSEARCH)
-        self._try_import_storage("semantic_memory_storage", SemanticStorageType.MEMORY)
+        cls._try_import_storage("semantic_mongodb_storage", SemanticStorageType.MONGODB)
+        cls._try_import_storage("semantic_redis_storage", SemanticStorageType.REDIS)
+        cls._try_import_storage("semantic_elasticsearch_storage", SemanticStorageType.ELASTICSEARCH)
+        cls._try_import_storage("semantic_memory_storage", SemanticStorageType.MEMORY)
         
         logger.info("语义存储实现发现完成", 
-                   implementations=list(self._storage_implementations.keys()))
+                   implementations=list(cls._storage_implementations.keys()))
     
-    def _register_builtin_implementations(self):
+    @classmethod
+    def _register_builtin_implementations(cls):
         """注册内置存储实现"""
         try:
             # 注册文件存储实现
             from storage.enhanced_local_semantic_storage import EnhancedLocalSemanticStorage
-            self._storage_implementations[SemanticStorageType.FILE] = EnhancedLocalSemanticStorage
+            cls._storage_implementations[SemanticStorageType.FILE] = EnhancedLocalSemanticStorage
             logger.info("已注册文件存储实现", class_name="EnhancedLocalSemanticStorage")
         except ImportError:
             # 回退到原有的本地存储
             try:
                 from storage.local_semantic_storage import LocalSemanticStorage
-                self._storage_implementations[SemanticStorageType.FILE] = LocalSemanticStorage
+                cls._storage_implementations[SemanticStorageType.FILE] = LocalSemanticStorage
                 logger.info("已注册本地文件存储实现", class_name="LocalSemanticStorage")
             except ImportError:
                 logger.warning("无法导入本地文件存储实现")
     
-    def _try_import_storage(self, module_name: str, storage_type: SemanticStorageType):
-        """尝试导入存储模块"""
+    @classmethod
+    def _try_import_storage(cls, module_name: str, storage_type: SemanticStorageType):
+        """
+        尝试导入存储模块
+        
+        存储模块通过模块级变量 STORAGE_CLASS 声明其实现类，未声明时扫描模块中定义的实现类
+        """
         try:
             module_path = f"storage.{module_name}"
             module = importlib.import_module(module_path)
             
-            # 查找模块中的SemanticStorageInterface子类
-            for name, obj in inspect.getmembers(module):
-                if (inspect.isclass(obj) and 
-                    issubclass(obj, SemanticStorageInterface) and 
-                    obj != SemanticStorageInterface):
-                    
-                    self._storage_implementations[storage_type] = obj
-                    logger.info(f"已注册存储实现: {storage_type.value}", class_name=name)
-                    break
+            storage_class = getattr(module, "STORAGE_CLASS", None)
+            if storage_class is None:
+                storage_class = cls._find_storage_class(module)
+            if (isinstance(storage_class, type) and
+                    issubclass(storage_class, SemanticStorageInterface) and
+                    storage_class is not SemanticStorageInterface):
+                cls._storage_implementations[storage_type] = storage_class
+                logger.info(f"已注册存储实现: {storage_type.value}", class_name=storage_class.__name__)
+            else:
+                logger.warning(f"存储模块未声明有效的STORAGE_CLASS: {module_name}")
         except ImportError:
             logger.debug(f"未找到存储模块: {module_name}")
         except Exception as e:
             logger.warning(f"导入存储模块失败: {module_name}", error=str(e))
     
+    @staticmethod
+    def _find_storage_class(module) -> Optional[Type[SemanticStorageInterface]]:
+        """查找模块中定义的唯一一个存储实现类（导入的类与抽象类不计入），找不到或不唯一时返回None"""
+        candidates = [
+            obj for obj in vars(module).values()
+            if (isinstance(obj, type) and issubclass(obj, SemanticStorageInterface) and
+                obj.__module__ == module.__name__ and not inspect.isabstract(obj))
+        ]
+        if len(candidates) == 1:
+            return candidates[0]
+        if candidates:
+            logger.warning("存储模块包含多个实现类，需通过STORAGE_CLASS指定", module=module.__name__,
+                           classes=[candidate.__name__ for candidate in candidates])
+        return None
+    
     def create_storage(self, config: Optional[SemanticStorageConfig] = None) -> SemanticStorageInterface:
         """创建存储实例"""
         if config is None:
             config = SemanticStorageConfig()
         
+        self._ensure_discovered()
         storage_type = config.storage_type
         
         if storage_type not in self._storage_implementations:
@@ -200,12 +240,15 @@ class SemanticStorageFactory:
             logger.error(f"无效的存储类: {storage_class.__name__}，必须是SemanticStorageInterface的子类")
             return False
         
+        # 先完成发现，手动注册的实现不会被之后的发现覆盖
+        self._ensure_discovered()
         self._storage_implementations[storage_type] = storage_class
         logger.info(f"已手动注册语义存储: {storage_type.value}", class_name=storage_class.__name__)
         return True
     
     def get_available_storage_types(self) -> Dict[SemanticStorageType, Type[SemanticStorageInterface]]:
         """获取可用的存储类型"""
+        self._ensure_discovered()
         return self._storage_implementations.copy()
 
 
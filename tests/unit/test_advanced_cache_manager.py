@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""高级缓存管理器单元测试"""
+
+import pytest
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from storage.advanced_cache_manager import SmartSemanticCache, MultiLevelCache, ClockCacheLevel, CacheEntry
+
+
+class TestClockCacheLevel:
+    """CLOCK缓存层测试类"""
+
+    def test_referenced_entry_gets_second_chance(self):
+        """测试被引用的条目在淘汰时获得二次机会"""
+        level = ClockCacheLevel(3)
+        for key in ("a", "b", "c"):
+            assert level.put(key, CacheEntry(key, 0, 60)) is None
+
+        level.get("a")
+        level.get("b")
+
+        evicted_key, evicted_entry = level.put("d", CacheEntry("d", 0, 60))
+        assert evicted_key == "c"
+        assert evicted_entry.data == "c"
+        assert set(level) == {"a", "b", "d"}
+
+    def test_pop_reuses_free_slot(self):
+        """测试移除后的槽位被复用"""
+        level = ClockCacheLevel(2)
+        level.put("a", CacheEntry("a", 0, 60))
+        level.put("b", CacheEntry("b", 0, 60))
+        level.pop("a")
+
+        assert level.put("c", CacheEntry("c", 0, 60)) is None
+        assert len(level) == 2
+        assert level.get("c").data == "c"
+
+
+class TestMultiLevelCache:
+    """多层级缓存测试类"""
+
+    def test_l1_hits_are_applied_lazily(self):
+        """测试读锁下的L1命中在写操作前被批量计入"""
+        cache = MultiLevelCache(l1_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # 命中a后a成为最近使用，插入c时应淘汰b
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+
+        assert "a" in cache.l1_cache
+        assert "b" not in cache.l1_cache
+        assert cache.get_stats()['l1_hits'] == 1
+
+    def test_l2_hit_promoted_on_second_access(self):
+        """测试L2条目在第二次命中时才提升到L1"""
+        cache = MultiLevelCache(l1_size=10)
+        cache.put("a", 1)
+        with cache.lock.write_locked():
+            cache._demote_to_l2("a", cache.l1_cache.pop("a"))
+
+        assert cache.get("a") == 1
+        assert "a" in cache.l2_cache
+
+        assert cache.get("a") == 1
+        assert "a" in cache.l1_cache
+        assert "a" not in cache.l2_cache
+        assert cache.get_stats()['promotions'] == 1
+
+    def test_concurrent_reads(self):
+        """测试多线程并发读取"""
+        import threading
+
+        cache = MultiLevelCache(l1_size=10)
+        for i in range(10):
+            cache.put(i, i * 10)
+
+        errors = []
+
+        def reader():
+            for _ in range(200):
+                for i in range(10):
+                    if cache.get(i) != i * 10:
+                        errors.append(i)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors
+        assert cache.get_stats()['l1_hits'] == 4 * 200 * 10
+
+    def test_cleanup_expired(self):
+        """测试过期条目清理（含过半过期时的重建路径）"""
+        cache = MultiLevelCache(l1_size=10)
+        cache.put("keep", 1, ttl=60)
+        for i in range(5):
+            cache.put(f"old{i}", i, ttl=-1)
+
+        assert cache.cleanup_expired() == 5
+        assert list(cache.l1_cache) == ["keep"]
+        assert cache.get("keep") == 1
+
+
+class TestSmartSemanticCache:
+    """智能语义缓存测试类"""
+
+    def test_construct_without_event_loop(self):
+        """测试在无事件循环的同步上下文中构造和使用"""
+        cache = SmartSemanticCache(enable_result_prefetch=False, enable_query_cache=False)
+        cache.put_field_semantic("inst", "db", "users", "name", {"meaning": "姓名"})
+
+        assert cache.get_field_semantic("inst", "db", "users", "name") == {"meaning": "姓名"}
+        assert cache._cleanup_handle is None
+        assert cache.query_cache is None
+        assert 'dependency_graph' not in cache.__dict__
+        cache.shutdown()
+
+    def test_query_result_cache(self):
+        """测试查询结果缓存读写"""
+        cache = SmartSemanticCache(enable_result_prefetch=False)
+        query_hash = cache._make_query_hash({"filter": {"a": 1}})
+        cache.put_query_result(query_hash, [{"a": 1}])
+
+        assert cache.get_query_result(query_hash) == [{"a": 1}]
+        assert cache.get_stats()['query_cache_size'] == 1
+
+    def test_stats_do_not_create_lazy_structures(self):
+        """测试获取统计不会创建按需构建的查询缓存"""
+        cache = SmartSemanticCache(enable_result_prefetch=False)
+        assert cache.get_stats()['query_cache_size'] == 0
+        assert 'query_cache' not in cache.__dict__
+        cache.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_cleanup_timer_rearms(self):
+        """测试清理定时器执行后重新挂载，关闭时取消"""
+        cache = SmartSemanticCache(enable_result_prefetch=False)
+        assert cache._cleanup_handle is None
+
+        # 首次使用时才启动定时器
+        cache.put_field_semantic("inst", "db", "users", "name", {"meaning": "姓名"})
+        assert cache._cleanup_handle is not None
+
+        cache._scheduled_cleanup()
+        handle = cache._cleanup_handle
+        assert handle is not None
+
+        cache.shutdown()
+        assert handle.cancelled()
+        assert cache._cleanup_handle is None
+
+    def test_make_query_hash_is_order_independent(self):
+        """测试查询哈希与键顺序无关"""
+        cache = SmartSemanticCache(enable_result_prefetch=False)
+        h1 = cache._make_query_hash({"filter": {"a": 1, "b": [1, 2]}, "limit": 10})
+        h2 = cache._make_query_hash({"limit": 10, "filter": {"b": [1, 2], "a": 1}})
+        h3 = cache._make_query_hash({"limit": 20, "filter": {"b": [1, 2], "a": 1}})
+
+        assert h1 == h2
+        assert h1 != h3
+        assert cache._make_field_key("i", "d", "c", "f") is cache._make_field_key("i", "d", "c", "f")
+
+    def test_make_query_hash_distinguishes_equal_scalars_of_different_types(self):
+        """测试 1、1.0 与 True 生成不同的查询哈希（结果缓存不会混用）"""
+        cache = SmartSemanticCache(enable_result_prefetch=False)
+        hashes = [cache._make_query_hash({"filter": {"active": value}}) for value in (1, 1.0, True)]
+        assert len(set(hashes)) == 3
+        assert len({cache._make_query_hash({value: "x"}) for value in (1, True)}) == 2
+        assert hashes[0] == cache._make_query_hash({"filter": {"active": 1}})
+
+    @pytest.mark.asyncio
+    async def test_prefetch_requests_are_deduplicated(self):
+        """测试同一集合的预取请求合并为一个"""
+        cache = SmartSemanticCache()
+        try:
+            for field in ("a", "b", "c"):
+                assert cache.get_field_semantic("inst", "db", "users", field) is None
+            cache.get_field_semantic("inst", "db", "orders", "amount")
+
+            assert cache._prefetch_queue.qsize() == 2
+
+            await cache._prefetch_queue.join()
+            assert not cache._prefetch_pending
+        finally:
+            cache.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_collection_only_affects_target(self):
+        """测试集合失效只影响目标集合"""
+        cache = SmartSemanticCache(enable_result_prefetch=False)
+        try:
+            cache.put_field_semantic("inst", "db", "users", "name", {"meaning": "姓名"})
+            cache.put_field_semantic("inst", "db", "users", "age", {"meaning": "年龄"})
+            cache.put_field_semantic("inst", "db", "orders", "amount", {"meaning": "金额"})
+
+            cache.invalidate_collection("inst", "db", "users")
+
+            assert cache.get_field_semantic("inst", "db", "users", "name") is None
+            assert cache.get_field_semantic("inst", "db", "users", "age") is None
+            assert cache.get_field_semantic("inst", "db", "orders", "amount") == {"meaning": "金额"}
+            assert cache.cache_stats['invalidations'] == 2
+        finally:
+            cache.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_cascade_invalidate_dependencies(self):
+        """测试字段失效级联到依赖它的缓存"""
+        cache = SmartSemanticCache(enable_result_prefetch=False)
+        try:
+            base_key = cache._make_field_key("inst", "db", "users", "id")
+            cache.put_field_semantic("inst", "db", "users", "id", {"meaning": "用户ID"})
+            cache.put_field_semantic("inst", "db", "orders", "user_id", {"meaning": "下单用户"},
+                                     dependencies={base_key})
+            derived_key = cache._make_field_key("inst", "db", "orders", "user_id")
+            cache.put_field_semantic("inst", "db", "reports", "uid", {"meaning": "报表用户"},
+                                     dependencies={derived_key})
+
+            cache.invalidate_field("inst", "db", "users", "id")
+
+            assert cache.get_field_semantic("inst", "db", "orders", "user_id") is None
+            assert cache.get_field_semantic("inst", "db", "reports", "uid") is None
+            assert cache.cache_stats['dependency_invalidations'] == 2
+            assert not cache.dependency_graph
+        finally:
+            cache.shutdown()
+
+    def test_dependency_ids_are_released(self):
+        """测试键离开缓存与依赖图后释放整数ID，ID表不随历史键增长"""
+        cache = SmartSemanticCache(enable_result_prefetch=False, enable_multilevel=False, cache_size=10)
+        base_key = cache._make_field_key("inst", "db", "users", "id")
+        cache.put_field_semantic("inst", "db", "users", "id", {"meaning": "用户ID"})
+        for i in range(100):
+            cache.put_field_semantic("inst", "db", "orders", f"f{i}", i, dependencies={base_key})
+        # 被淘汰的键移除依赖边并释放ID，ID被复用；仍被依赖的 base_key 保留
+        assert len(cache._key_to_id) == 11
+        assert len(cache._id_to_key) <= 12
+
+        cache.invalidate_field("inst", "db", "users", "id")
+        assert not cache._key_to_id
+        assert not cache.dependency_graph and not cache.reverse_deps
+        assert all(key is None for key in cache._id_to_key)
+
+        cache.put_field_semantic("inst", "db", "orders", "a", 1, dependencies={base_key})
+        cache.put_field_semantic("inst", "db", "orders", "a", 1,
+                                 dependencies={cache._make_field_key("inst", "db", "users", "name")})
+        assert base_key not in cache._key_to_id
+
+    def test_collection_index_follows_evictions(self):
+        """测试条目被淘汰后集合字段索引同步更新"""
+        cache = SmartSemanticCache(enable_result_prefetch=False, cache_size=10)
+        for i in range(30):
+            cache.put_field_semantic("inst", "db", "users", f"f{i}", i)
+
+        indexed = set().union(*cache._by_prefix.values())
+        assert len(indexed) == cache.main_cache.get_stats()['total_size']
+        cache.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_collection_single_level(self):
+        """测试单层缓存模式下的集合失效"""
+        cache = SmartSemanticCache(enable_multilevel=False, enable_result_prefetch=False)
+        try:
+            cache.put_field_semantic("inst", "db", "users", "name", {"meaning": "姓名"})
+            cache.invalidate_collection("inst", "db", "users")
+
+            assert cache.get_field_semantic("inst", "db", "users", "name") is None
+            # 未缓存过的集合失效不应报错
+            cache.invalidate_collection("inst", "db", "missing")
+        finally:
+            cache.shutdown()
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""增强版本地语义存储单元测试"""
+
+import asyncio
+import pytest
+from datetime import datetime
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from storage.enhanced_local_semantic_storage import EnhancedLocalSemanticStorage
+from storage.semantic_storage_interface import SemanticField, SemanticSearchQuery
+
+
+def make_field(meaning: str, confidence: float = 0.8, **kwargs) -> SemanticField:
+    """构造测试用语义字段"""
+    now = datetime.now()
+    return SemanticField(
+        business_meaning=meaning,
+        confidence=confidence,
+        data_type=kwargs.pop("data_type", "string"),
+        examples=kwargs.pop("examples", []),
+        analysis_result=kwargs.pop("analysis_result", {}),
+        created_at=now,
+        updated_at=now,
+        source=kwargs.pop("source", "test"),
+        **kwargs
+    )
+
+
+class TestEnhancedLocalSemanticStorage:
+    """增强版本地语义存储测试类"""
+
+    @pytest.fixture(params=[True, False], ids=["native_aio", "thread_pool"])
+    def storage(self, request, tmp_path):
+        """创建临时目录下的存储（分别覆盖caio与线程池IO路径）"""
+        storage = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        storage.enable_native_aio = storage.enable_native_aio and request.param
+        yield storage
+        storage.thread_pool.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_save_and_get_roundtrip(self, storage):
+        """测试保存后读取得到相同的语义信息"""
+        field = make_field("用户姓名", examples=["张三"], tags=["pii"])
+
+        assert await storage.save_field_semantic("inst", "db", "users", "name", field) is True
+
+        loaded = await storage.get_field_semantic("inst", "db", "users", "name")
+        assert loaded is not None
+        assert loaded.business_meaning == "用户姓名"
+        assert loaded.examples == ["张三"]
+        assert loaded.tags == ["pii"]
+
+    @pytest.mark.asyncio
+    async def test_search_orders_by_confidence(self, storage):
+        """测试搜索结果按置信度排序并截断"""
+        await storage.batch_save_semantics("inst", "db", "users", {
+            "name": make_field("用户名称", 0.6),
+            "nickname": make_field("用户昵称", 0.9),
+            "age": make_field("年龄", 0.99),
+        })
+
+        results = await storage.search_semantics(SemanticSearchQuery(search_term="用户", limit=1))
+
+        assert len(results) == 1
+        assert results[0][1].business_meaning == "用户昵称"
+
+    @pytest.mark.asyncio
+    async def test_batch_save_writes_one_collection_file(self, storage, tmp_path):
+        """测试批量保存只生成一个集合级语义文件"""
+        results = await storage.batch_save_semantics("inst", "db", "users", {
+            "name": make_field("用户名称"),
+            "profile/email": make_field("邮箱"),
+        })
+
+        assert all(results.values())
+        collections_dir = tmp_path / "semantics" / "instances" / "inst" / "databases" / "db" / "collections"
+        assert [p.name for p in collections_dir.iterdir()] == ["users.json"]
+        assert not storage._dirty_collections
+
+        # 新实例从磁盘读取集合文件
+        reopened = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        semantics = await reopened.get_collection_semantics("inst", "db", "users")
+        assert set(semantics) == {"name", "profile/email"}
+        reopened.thread_pool.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_reads_legacy_per_field_files(self, storage):
+        """测试兼容读取旧版按字段分文件的布局"""
+        legacy_file = storage._get_field_path("inst", "db", "users", "age")
+        assert storage._save_file_sync(legacy_file, make_field("年龄").to_dict())
+
+        loaded = await storage.get_field_semantic("inst", "db", "users", "age")
+        assert loaded.business_meaning == "年龄"
+
+        results = await storage.search_semantics(SemanticSearchQuery(search_term="年龄"))
+        assert [path for path, _ in results] == ["age"]
+
+    @pytest.mark.asyncio
+    async def test_legacy_field_with_underscore_keeps_its_name(self, storage, tmp_path):
+        """测试旧版文件名中的下划线不被还原为路径分隔符，迁移后字段名不变"""
+        storage._save_file_sync(storage._get_field_path("inst", "db", "users", "user_name"),
+                                make_field("用户名").to_dict())
+        nested = make_field("邮箱").to_dict()
+        nested["field_path"] = "profile/email"
+        storage._save_file_sync(storage._get_field_path("inst", "db", "users", "profile/email"), nested)
+
+        assert (await storage.get_field_semantic("inst", "db", "users", "user_name")).business_meaning == "用户名"
+        assert (await storage.get_field_semantic("inst", "db", "users", "profile/email")).business_meaning == "邮箱"
+
+        # 写入后合并为集合文件，字段名保持不变
+        await storage.save_field_semantic("inst", "db", "users", "age", make_field("年龄"))
+        reopened = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        assert set(await reopened.get_collection_semantics("inst", "db", "users")) == {
+            "user_name", "profile/email", "age"}
+        reopened.thread_pool.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_instances_on_same_path_see_and_keep_each_others_fields(self, storage, tmp_path):
+        """测试同一目录上的两个实例读取到对方的写入，写回时不覆盖对方修改的字段"""
+        other = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("姓名"))
+        assert (await other.get_field_semantic("inst", "db", "users", "name")).business_meaning == "姓名"
+
+        await other.save_field_semantic("inst", "db", "users", "age", make_field("年龄"))
+        assert (await storage.get_field_semantic("inst", "db", "users", "age")).business_meaning == "年龄"
+
+        # 批量操作期间对方写入了集合，写回时以磁盘内容为准叠加本实例的修改
+        async with storage.batch_operation():
+            await storage.delete_field_semantic("inst", "db", "users", "name")
+            await other.save_field_semantic("inst", "db", "users", "email", make_field("邮箱"))
+        reopened = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        assert set(await reopened.get_collection_semantics("inst", "db", "users")) == {"age", "email"}
+        for instance in (other, reopened):
+            instance.thread_pool.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_collection_cache_is_bounded(self, tmp_path):
+        """测试集合缓存受上限约束，禁用缓存时写回后不保留集合"""
+        storage = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        storage.max_cached_collections = 2
+        for name in ("a", "b", "c", "d"):
+            await storage.save_field_semantic("inst", "db", name, "id", make_field("编号"))
+        assert list(storage._collections) == [
+            storage._get_collection_file("inst", "db", name) for name in ("c", "d")]
+        assert (await storage.get_field_semantic("inst", "db", "a", "id")).business_meaning == "编号"
+        storage.thread_pool.shutdown(wait=True)
+
+        uncached = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"), enable_cache=False)
+        await uncached.save_field_semantic("inst", "db", "e", "id", make_field("编号"))
+        assert not uncached._collections
+        assert (await uncached.get_field_semantic("inst", "db", "e", "id")).business_meaning == "编号"
+        uncached.thread_pool.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_storage_stats(self, storage):
+        """测试存储统计"""
+        await storage.batch_save_semantics("inst", "db", "users", {
+            "name": make_field("用户名称"),
+            "age": make_field("年龄"),
+        })
+        await storage.save_field_semantic("inst", "db2", "orders", "amount", make_field("金额"))
+        await storage.create_semantic_snapshot("inst", "db", "users", "s1")
+
+        stats = await storage.get_storage_stats()
+
+        assert stats["total_instances"] == 1
+        assert stats["total_databases"] == 2
+        assert stats["total_collections"] == 2
+        assert stats["total_fields"] == 3
+        assert stats["total_versions"] == 3
+        assert stats["total_snapshots"] == 1
+        assert stats["storage_size_bytes"] > 0
+
+    @pytest.mark.asyncio
+    async def test_incremental_stats_match_full_scan(self, storage, tmp_path):
+        """测试增量统计与全量扫描结果一致，并在关闭后持久化"""
+        assert (await storage.get_storage_stats())["total_fields"] == 0
+
+        await storage.batch_save_semantics("inst", "db", "users", {
+            "name": make_field("用户名称"),
+            "age": make_field("年龄"),
+        })
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("姓名"))
+        await storage.save_field_semantic("inst2", "db", "orders", "amount", make_field("金额"))
+        await storage.delete_field_semantic("inst", "db", "users", "age")
+        await storage.create_semantic_snapshot("inst", "db", "users", "s1")
+
+        stats = await storage.get_storage_stats()
+        stats.pop("last_updated")
+        assert stats == await storage._compute_storage_stats()
+        assert stats["total_fields"] == 2
+
+        await storage.close()
+        reopened = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        assert not reopened._stats_path.exists()
+        reopened_stats = await reopened.get_storage_stats()
+        reopened_stats.pop("last_updated")
+        assert reopened_stats == stats
+        reopened.thread_pool.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_saves_of_same_field_are_serialized(self, storage):
+        """测试同一字段的并发保存串行执行"""
+        import asyncio
+
+        storage.max_field_locks = 4
+        results = await asyncio.gather(*[
+            storage.save_field_semantic("inst", "db", "users", "name", make_field(f"名称{i}"))
+            for i in range(3)
+        ], *[
+            storage.save_field_semantic("inst", "db", "users", f"f{i}", make_field("其他"))
+            for i in range(8)
+        ])
+
+        assert all(results)
+        # 持有中的锁不会被丢弃，空闲后下次取锁时裁剪
+        storage._lock_for("inst/db/users/other")
+        assert len(storage._field_locks) <= 4
+        loaded = await storage.get_field_semantic("inst", "db", "users", "name")
+        assert loaded.business_meaning == "名称2"
+
+    @pytest.mark.asyncio
+    async def test_version_history(self, storage):
+        """测试版本文件名包含内容哈希且可读回历史"""
+        field = make_field("用户名称")
+        assert storage._generate_version_id(field) == storage._generate_version_id(field)
+        assert len(storage._generate_version_id(field)) == 12
+
+        await storage.save_field_semantic("inst", "db", "users", "name", field)
+
+        history = await storage.get_semantic_history("inst", "db", "users", "name")
+        assert [f.business_meaning for f in history] == ["用户名称"]
+
+    @pytest.mark.asyncio
+    async def test_search_filters(self, storage):
+        """测试搜索过滤条件，索引在集合修改后重建"""
+        await storage.batch_save_semantics("inst", "db", "users", {
+            "name": make_field("用户名称", 0.6, source="llm", tags=["pii"]),
+            "email": make_field("邮箱", 0.9, examples=["a@b.com"], source="user"),
+            "age": make_field("年龄", 0.3, source="llm"),
+        })
+
+        async def search(**kwargs):
+            results = await storage.search_semantics(SemanticSearchQuery(**kwargs))
+            return sorted(path for path, _ in results)
+
+        assert await search(search_term="B.COM") == ["email"]
+        assert await search(search_term="nam") == ["name"]
+        assert await search(confidence_min=0.5, confidence_max=0.8) == ["name"]
+        assert await search(source="llm") == ["age", "name"]
+        assert await search(tags=["pii", "other"]) == ["name"]
+
+        await storage.save_field_semantic("inst", "db", "users", "age", make_field("年龄", 0.3, source="user"))
+        assert await search(source="llm") == ["name"]
+
+    def test_path_helpers_are_memoized(self, storage):
+        """测试路径构造结果被缓存且字段路径经过安全化处理"""
+        path = storage._get_field_path("inst", "db", "users", "profile/../name")
+        assert path is storage._get_field_path("inst", "db", "users", "profile/../name")
+        assert path.name == "profile___name.json"
+        assert storage._get_collection_file("inst", "db", "users").name == "users.json"
+        assert storage._get_version_path("inst", "db", "users", "a/b").parent.name == "users"
+
+    @pytest.mark.asyncio
+    async def test_delete_backs_up_field(self, storage, tmp_path):
+        """测试删除字段时备份语义数据"""
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("用户名称"))
+
+        assert await storage.delete_field_semantic("inst", "db", "users", "name") is True
+        assert await storage.get_field_semantic("inst", "db", "users", "name") is None
+        assert await storage.delete_field_semantic("inst", "db", "users", "name") is False
+
+        backups = list((tmp_path / "semantics" / "deleted").glob("*/*_name.json"))
+        assert len(backups) == 1
+        assert storage._load_file_sync(backups[0])["business_meaning"] == "用户名称"
+
+    @pytest.mark.asyncio
+    async def test_resave_after_delete_recreates_version_dir(self, storage):
+        """测试删除字段移除版本目录后再次保存仍能写入版本"""
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("用户名称"))
+        version_dir = storage._get_version_path("inst", "db", "users", "name")
+        assert version_dir in storage._known_dirs
+
+        await storage.delete_field_semantic("inst", "db", "users", "name")
+        assert not version_dir.exists()
+
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("姓名"))
+        history = await storage.get_semantic_history("inst", "db", "users", "name")
+        assert [f.business_meaning for f in history] == ["姓名"]
+
+    @pytest.mark.asyncio
+    async def test_restore_snapshot_only_rewrites_changed_fields(self, storage):
+        """测试从快照恢复时跳过未变化的字段"""
+        await storage.batch_save_semantics("inst", "db", "users", {
+            "name": make_field("用户名称"),
+            "age": make_field("年龄"),
+        })
+        await storage.create_semantic_snapshot("inst", "db", "users", "s1")
+        versions_before = (await storage.get_storage_stats())["total_versions"]
+
+        # 内容未变化，恢复不产生任何写入
+        assert await storage.restore_from_snapshot("inst", "db", "users", "s1") is True
+        assert (await storage.get_storage_stats())["total_versions"] == versions_before
+
+        await storage.save_field_semantic("inst", "db", "users", "age", make_field("岁数"))
+        versions_before = (await storage.get_storage_stats())["total_versions"]
+
+        assert await storage.restore_from_snapshot("inst", "db", "users", "s1") is True
+        assert (await storage.get_storage_stats())["total_versions"] == versions_before + 1
+        restored = await storage.get_field_semantic("inst", "db", "users", "age")
+        assert restored.business_meaning == "年龄"
+
+        # 恢复时刷新的 updated_at 不影响摘要，再次恢复无需写入
+        versions_before = (await storage.get_storage_stats())["total_versions"]
+        assert await storage.restore_from_snapshot("inst", "db", "users", "s1") is True
+        assert (await storage.get_storage_stats())["total_versions"] == versions_before
+
+    @pytest.mark.asyncio
+    async def test_versions_share_content_pool(self, storage):
+        """测试相同内容的版本共享内容池文件，不再引用时随版本一起删除"""
+        storage.max_versions = 2
+        field = make_field("用户名称")
+        version_dir = storage._get_version_path("inst", "db", "users", "name")
+        pool_dir = version_dir.parent / ".pool"
+
+        await storage._save_version("inst", "db", "users", "name", field.to_dict())
+        await storage._save_version("inst", "db", "users", "name", field.to_dict())
+
+        versions = sorted(version_dir.glob("*.json"))
+        assert len(versions) == 2
+        assert versions[0].stat().st_ino == versions[1].stat().st_ino
+        assert len(list(pool_dir.glob("*.json"))) == 1
+
+        # 新内容的版本挤掉最旧的版本，共享的内容池文件仍被另一个版本引用
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("姓名"))
+        assert len(list(version_dir.glob("*.json"))) == 2
+        assert len(list(pool_dir.glob("*.json"))) == 2
+
+        history = await storage.get_semantic_history("inst", "db", "users", "name")
+        assert [f.business_meaning for f in history] == ["姓名", "用户名称"]
+
+        await storage.delete_field_semantic("inst", "db", "users", "name")
+        assert not list(pool_dir.glob("*.json"))
+
+    @pytest.mark.asyncio
+    async def test_detect_conflicts(self, storage):
+        """测试业务含义不同时检测到冲突"""
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("用户名称", 0.9))
+
+        conflicts = await storage.detect_conflicts("inst", "db", "users", "name", make_field("昵称", 0.5))
+        assert len(conflicts) == 1
+        assert conflicts[0].existing_meaning == "用户名称"
+        assert conflicts[0].resolution_strategy == "prefer_higher_confidence"
+
+        assert await storage.detect_conflicts("inst", "db", "users", "name", make_field("用户名称")) == []
+        assert await storage.detect_conflicts("inst", "db", "users", "age", make_field("年龄")) == []
+
+    @pytest.mark.asyncio
+    async def test_batch_get_semantics(self, storage):
+        """测试批量获取，缺失字段返回None"""
+        await storage.batch_save_semantics("inst", "db", "users", {
+            f"f{i}": make_field(f"字段{i}") for i in range(20)
+        })
+
+        results = await storage.batch_get_semantics("inst", "db", "users", ["f3", "f17", "missing"])
+
+        assert results["f3"].business_meaning == "字段3"
+        assert results["f17"].business_meaning == "字段17"
+        assert results["missing"] is None
+
+    @pytest.mark.asyncio
+    async def test_snapshot_file_is_valid_json(self, storage):
+        """测试流式写入的快照文件可被完整解析"""
+        await storage.batch_save_semantics("inst", "db", "users", {
+            "name": make_field("用户\"名称\""),
+            "profile/email": make_field("邮箱"),
+        })
+        assert await storage.create_semantic_snapshot("inst", "db", "users", "s1") is True
+
+        snapshot_file = storage.snapshots_path / "inst_db_users_s1.json"
+        data = storage._load_file_sync(snapshot_file)
+        assert data["collection_name"] == "users"
+        assert set(data["semantics"]) == {"name", "profile/email"}
+        assert data["semantics"]["name"]["business_meaning"] == "用户\"名称\""
+
+        assert await storage.create_semantic_snapshot("inst", "db", "empty", "s1") is True
+        assert storage._load_file_sync(storage.snapshots_path / "inst_db_empty_s1.json")["semantics"] == {}
+
+    @pytest.mark.asyncio
+    async def test_large_collection_file_roundtrip(self, storage, tmp_path):
+        """测试超过mmap阈值的集合文件可正确读回"""
+        await storage.batch_save_semantics("inst", "db", "users", {
+            f"f{i}": make_field(f"字段{i}", examples=["x" * 50]) for i in range(100)
+        })
+        collection_file = storage._get_collection_file("inst", "db", "users")
+        assert collection_file.stat().st_size >= 4096
+
+        data = storage._load_file_sync(collection_file)
+        assert len(data["fields"]) == 100
+        assert storage._load_file_sync(tmp_path / "missing.json") is None
+
+    @pytest.mark.asyncio
+    async def test_batch_writes_are_synced_on_exit(self, storage):
+        """测试批量操作期间的写入延迟到退出时统一fsync"""
+        synced = []
+        storage._fsync_paths = synced.append
+
+        await storage.save_field_semantic("inst", "db", "users", "name", make_field("用户名称"))
+        assert synced == []
+
+        await storage.batch_save_semantics("inst", "db", "users", {"age": make_field("年龄")})
+        assert len(synced) == 1
+        assert storage._get_collection_file("inst", "db", "users") in synced[0]
+        assert not storage._pending_fsync
+
+    def test_rejects_unknown_durability(self, tmp_path):
+        """测试不支持的持久化策略"""
+        with pytest.raises(ValueError):
+            EnhancedLocalSemanticStorage(base_path=str(tmp_path), durability="sometimes")
+
+    def test_native_aio_context_follows_event_loop(self, tmp_path):
+        """测试caio上下文在切换事件循环与关闭时释放，短写的剩余部分由线程池补齐"""
+        storage = EnhancedLocalSemanticStorage(base_path=str(tmp_path / "semantics"))
+        if not storage.enable_native_aio:
+            pytest.skip("caio不可用")
+
+        async def save_with_short_writes():
+            aio_context = storage._get_aio_context()
+            original_write = aio_context.write
+
+            async def short_write(payload, fd, offset):
+                return await original_write(payload[:16], fd, offset)
+
+            aio_context.write = short_write
+            return await storage.save_field_semantic("inst", "db", "users", "name", make_field("用户名称"))
+
+        assert asyncio.run(save_with_short_writes())
+        first = storage._aio_context
+        closed = []
+        first.close = lambda: closed.append(first)
+
+        assert asyncio.run(storage.save_field_semantic("inst", "db", "orders", "id", make_field("订单号")))
+        assert closed == [first]
+        assert storage._load_file_sync(storage._get_collection_file("inst", "db", "users"))["fields"]
+        assert storage._aio_context is not first
+
+        asyncio.run(storage.close())
+        assert storage._aio_context is None
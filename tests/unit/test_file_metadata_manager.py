@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""文件元数据管理器单元测试"""
+
+import asyncio
+import pytest
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from storage.file_metadata_manager import FileMetadataManager
+
+
+@pytest.fixture(params=[True, False], ids=["native_aio", "thread_pool"])
+def manager(request, tmp_path):
+    """创建临时目录下的元数据管理器（分别覆盖caio与线程池读取路径）"""
+    manager = FileMetadataManager(str(tmp_path / "metadata"))
+    manager.enable_native_aio = manager.enable_native_aio and request.param
+    return manager
+
+
+class TestFileMetadataManager:
+    """文件元数据管理器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_reads_hit_cache(self, manager):
+        """测试重复读取命中缓存，写入后重新加载"""
+        await manager.save_instance("local", {"name": "local", "environment": "dev"})
+
+        first = await manager.get_instance_by_name("local", "local")
+        second = await manager.get_instance_by_name("local", "local")
+        assert first is second
+        assert manager._scan_stats['cache_hits'] == 1
+
+        await manager.save_instance("local", {"name": "local", "environment": "prod"})
+        updated = await manager.get_instance_by_name("local", "local")
+        assert updated["environment"] == "prod"
+
+    @pytest.mark.asyncio
+    async def test_fields_share_collection_shard(self, manager):
+        """测试同一集合的字段写入同一分片文件"""
+        for path in ("name", "age", "name"):
+            await manager.save_field("local", "inst-1", {
+                "database_name": "shop", "collection_name": "users",
+                "field_path": path, "field_type": "string"
+            })
+        await manager.save_field("local", "inst-1", {
+            "database_name": "shop", "collection_name": "users_archive",
+            "field_path": "name", "field_type": "string"
+        })
+
+        fields = await manager.get_fields_by_collection("local", "inst-1", "shop", "users")
+        assert sorted(f["field_path"] for f in fields) == ["age", "name"]
+        assert (await manager.get_statistics())["total_fields"] == 3
+
+        await manager.flush_fields()
+        assert len(list((manager.base_path / "fields").iterdir())) == 2
+        assert (await manager.get_statistics())["total_fields"] == 3
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_field_saves_are_coalesced(self, manager, monkeypatch):
+        """测试并发保存的字段合并写回，保存返回时已写入分片文件"""
+        writes = []
+        original_write = manager._write_json_file
+
+        async def counting_write(file_path, data):
+            writes.append(Path(file_path).name)
+            await original_write(file_path, data)
+
+        monkeypatch.setattr(manager, "_write_json_file", counting_write)
+        await asyncio.gather(*(manager.save_field("local", "inst-1", {
+            "database_name": "shop", "collection_name": "orders", "field_path": f"f{i}"
+        }) for i in range(20)))
+
+        assert len(writes) <= 2
+        assert set(writes) == {"local_shop_orders.json"}
+        assert not manager._pending_fields
+        fields = await manager.get_fields_by_collection("local", "inst-1", "shop", "orders")
+        assert len(fields) == 20
+
+    def test_field_save_is_durable_without_close(self, tmp_path):
+        """测试未调用close时事件循环结束后保存的字段也已写入"""
+        base_path = str(tmp_path / "metadata")
+        asyncio.run(FileMetadataManager(base_path).save_field("local", "inst-1", {
+            "database_name": "shop", "collection_name": "orders", "field_path": "amount"
+        }))
+
+        fields = asyncio.run(FileMetadataManager(base_path).get_fields_by_collection(
+            "local", "inst-1", "shop", "orders"))
+        assert [f["field_path"] for f in fields] == ["amount"]
+
+    @pytest.mark.asyncio
+    async def test_listing_filters_by_prefix(self, manager):
+        """测试目录遍历按实例前缀过滤并忽略非JSON文件"""
+        await manager.save_database("local", "inst-1", {"name": "shop"})
+        await manager.save_database("local", "inst-1", {"name": "crm"})
+        await manager.save_database("remote", "inst-2", {"name": "shop"})
+        (manager.base_path / "databases" / "local_tmp.txt").write_text("x")
+
+        databases = await manager.get_databases_by_instance("local", "inst-1")
+        assert sorted(d["database_name"] for d in databases) == ["crm", "shop"]
+        assert (await manager.get_statistics())["total_databases"] == 3
+
+    @pytest.mark.asyncio
+    async def test_query_history_appends_jsonl(self, manager):
+        """测试查询历史以JSONL追加，并兼容旧版JSON文件"""
+        queries_dir = manager.base_path / "queries"
+        (queries_dir / "local_2020-01-01.json").write_text('[{"id": "old"}]', encoding="utf-8")
+
+        ids = [await manager.save_query_history("local", {"query_type": "find"}) for _ in range(3)]
+        with open(next(queries_dir.glob("*.jsonl")), "ab") as f:
+            f.write(b'{"id": "torn"')
+
+        history = await manager.get_query_history("local", limit=10)
+        assert [q["id"] for q in history] == ids + ["old"]
+        assert [q["id"] for q in await manager.get_query_history("local", limit=2)] == ids[:2]
+
+    @pytest.mark.asyncio
+    async def test_compression_enabled_from_config(self, manager):
+        """测试配置启用压缩后写入gzip文件并可透明读取"""
+        await manager.save_instance("local", {"name": "local"})
+        (manager.base_path / "config.json").write_text('{"compression_enabled": true}', encoding="utf-8")
+        assert await manager.initialize()
+        assert manager.compression_enabled
+
+        await manager.save_instance("local", {"name": "local", "environment": "prod"})
+        instances_dir = manager.base_path / "instances"
+        assert [p.name for p in instances_dir.iterdir()] == ["local.json.gz"]
+
+        instance = await manager.get_instance_by_name("local", "local")
+        assert instance["environment"] == "prod"
+        assert len(await manager.get_all_instances("local")) == 1
+        assert (await manager.get_statistics())["total_instances"] == 1
+
+    @pytest.mark.asyncio
+    async def test_negative_lookups_are_remembered(self, manager, monkeypatch):
+        """测试不存在的实例被记住，保存后重新可见"""
+        assert await manager.get_instance_by_name("local", "ghost") is None
+
+        def fail_scan(*args, **kwargs):
+            raise AssertionError("不应再次扫描目录")
+
+        monkeypatch.setattr("storage.file_metadata_manager._iter_json", fail_scan)
+        assert await manager.get_instance_by_name("local", "ghost") is None
+        assert await manager._read_json_file(manager.base_path / "instances" / "ghost.json") is None
+        monkeypatch.undo()
+
+        await manager.save_instance("ghost", {"name": "ghost"})
+        assert (await manager.get_instance_by_name("local", "ghost"))["instance_name"] == "ghost"
+
+    @pytest.mark.asyncio
+    async def test_negative_lookups_expire_on_external_writes(self, manager, tmp_path, monkeypatch):
+        """测试不存在记录在TTL内命中不检查目录，其他进程新建的文件在TTL过后可见"""
+        import storage.file_metadata_manager as module
+
+        assert await manager.get_instance_by_name("local", "remote") is None
+        assert await manager._read_json_file(manager.base_path / "instances" / "remote.json") is None
+
+        other = FileMetadataManager(str(tmp_path / "metadata"))
+        await other.save_instance("remote", {"name": "remote"})
+
+        stats = []
+        original_mtime = module._dir_mtime_ns
+
+        def counting_mtime(directory):
+            stats.append(directory)
+            return original_mtime(directory)
+
+        monkeypatch.setattr(module, "_dir_mtime_ns", counting_mtime)
+        assert await manager._read_json_file(manager.base_path / "instances" / "remote.json") is None
+        assert stats == []
+
+        manager._negative_paths.ttl = manager._missing_instances.ttl = 0
+        assert (await manager._read_json_file(manager.base_path / "instances" / "remote.json"))["instance_name"] == "remote"
+        assert (await manager.get_instance_by_name("local", "remote"))["instance_name"] == "remote"
+
+    @pytest.mark.asyncio
+    async def test_inventory_rescans_only_changed_directories(self, manager, monkeypatch, tmp_path):
+        """测试目录清单在目录未变化时不再扫描，其他进程写入后按目录 mtime 重新扫描"""
+        import storage.file_metadata_manager as module
+
+        await manager.save_instance("a", {"name": "a"})
+        assert (await manager.get_statistics())["total_instances"] == 1
+
+        scans = []
+        original_iter = module._iter_json
+
+        def counting_iter(directory, *args, **kwargs):
+            scans.append(Path(directory).name)
+            return original_iter(directory, *args, **kwargs)
+
+        monkeypatch.setattr(module, "_iter_json", counting_iter)
+        assert (await manager.get_statistics())["total_instances"] == 1
+        assert scans == []
+
+        other = FileMetadataManager(str(tmp_path / "metadata"))
+        await other.save_instance("b", {"name": "b", "environment": "prod"})
+
+        assert (await manager.get_statistics())["total_instances"] == 2
+        assert scans == ["instances"]
+        prod = await manager.get_all_instances("local", environment="prod")
+        assert [i["instance_name"] for i in prod] == ["b"]
+        assert scans == ["instances"]
+
+    @pytest.mark.asyncio
+    async def test_msgpack_serialization_migrates_on_write(self, manager):
+        """测试配置msgpack格式后仍可读取旧JSON文件，写入时迁移为 .mp"""
+        pytest.importorskip("msgpack")
+        await manager.save_collection("local", "inst-1", {
+            "database_name": "shop", "name": "users", "sample_document": {"_id": 1}
+        })
+        (manager.base_path / "config.json").write_text('{"serialization": "msgpack"}', encoding="utf-8")
+        assert await manager.initialize()
+
+        legacy = await manager.get_collections_by_database("local", "inst-1", "shop")
+        assert legacy[0]["sample_document"] == {"_id": 1}
+
+        await manager.save_collection("local", "inst-1", {"database_name": "shop", "name": "users"})
+        collections_dir = manager.base_path / "collections"
+        assert [p.name for p in collections_dir.iterdir()] == ["local_shop_users.mp"]
+        migrated = await manager.get_collections_by_database("local", "inst-1", "shop")
+        assert migrated[0]["collection_name"] == "users"
+        assert (await manager.get_statistics())["total_collections"] == 1
+
+    @pytest.mark.asyncio
+    async def test_large_history_parsed_in_thread_pool(self, manager, monkeypatch):
+        """测试超过阈值的查询历史文件在线程池中读取并解析"""
+        import threading
+        import storage.file_metadata_manager as module
+
+        ids = [await manager.save_query_history("local", {"query_type": "find"}) for _ in range(3)]
+        manager.thread_parse_threshold = 0
+        threads = []
+        original_load_parse = module._load_parse
+
+        def recording_load_parse(path, loads):
+            threads.append(threading.current_thread())
+            return original_load_parse(path, loads)
+
+        monkeypatch.setattr(module, "_load_parse", recording_load_parse)
+        history = await manager.get_query_history("local", limit=10)
+        assert [q["id"] for q in history] == ids
+        assert threads and threading.main_thread() not in threads
+
+    @pytest.mark.asyncio
+    async def test_writes_replace_atomically(self, manager, monkeypatch):
+        """测试写入失败时保留原文件且不遗留临时文件"""
+        await manager.save_instance("local", {"name": "local", "environment": "dev"})
+
+        def fail_replace(src, dst):
+            raise OSError("磁盘已满")
+
+        monkeypatch.setattr("storage.file_metadata_manager.os.replace", fail_replace)
+        with pytest.raises(OSError):
+            await manager.save_instance("local", {"name": "local", "environment": "prod"})
+        monkeypatch.undo()
+
+        assert [p.name for p in (manager.base_path / "instances").iterdir()] == ["local.json"]
+        assert (await manager.get_instance_by_name("local", "local"))["environment"] == "dev"
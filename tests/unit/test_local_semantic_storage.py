@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+"""本地语义存储单元测试"""
+
+import asyncio
+import json
+import pytest
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from storage.local_semantic_storage import LocalSemanticStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """创建临时目录下的本地语义存储"""
+    return LocalSemanticStorage(str(tmp_path / "semantics"))
+
+
+class TestLocalSemanticStorage:
+    """本地语义存储测试类"""
+
+    @pytest.mark.asyncio
+    async def test_saves_are_coalesced_and_flushed(self, storage, monkeypatch):
+        """测试并发保存合并为一次写回，保存返回时内容已写入磁盘"""
+        writes = []
+        original_write = storage._write_files
+
+        async def counting_write(items, **kwargs):
+            writes.extend(file_path.name for file_path, _ in items)
+            return await original_write(items, **kwargs)
+
+        monkeypatch.setattr(storage, "_write_files", counting_write)
+        results = await asyncio.gather(*(
+            storage.save_field_semantics("inst", "db", "users", f"f{i}", f"含义{i}") for i in range(10)))
+
+        assert all(results)
+        assert writes == ["fields.json"]
+        fields_file = storage._get_fields_file_path("inst", "db", "users")
+        on_disk = json.loads(fields_file.read_text(encoding="utf-8"))
+        assert len(on_disk["fields"]) == 10
+
+    def test_save_is_durable_without_flush(self, tmp_path):
+        """测试不调用flush时事件循环结束后保存的内容也不丢失"""
+        base_path = str(tmp_path / "semantics")
+        assert asyncio.run(LocalSemanticStorage(base_path).save_field_semantics("inst", "db", "users", "name", "姓名"))
+
+        reader = LocalSemanticStorage(base_path)
+        saved = asyncio.run(reader.get_field_semantics("inst", "db", "users", "name"))
+        assert saved["business_meaning"] == "姓名"
+        index = asyncio.run(reader.get_semantic_index())
+        assert "姓名" in index["semantic_index"]
+
+    @pytest.mark.asyncio
+    async def test_index_log_replay_and_compaction(self, tmp_path):
+        """测试索引更新追加到日志，重启后重放一致，超过阈值时合并"""
+        base_path = str(tmp_path / "semantics")
+        storage = LocalSemanticStorage(base_path)
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await storage.save_field_semantics("inst", "db", "users", "name", "用户名")
+        await storage.save_field_semantics("inst", "db", "orders", "name", "商品名")
+        await storage.flush()
+        index = await storage.get_semantic_index()
+
+        reloaded = LocalSemanticStorage(base_path)
+        replayed = await reloaded.get_semantic_index()
+        assert replayed["field_index"] == index["field_index"]
+        assert [e["meaning"] for e in replayed["field_index"]["name"]] == ["用户名", "商品名"]
+
+        reloaded.index_compact_bytes = 1
+        await reloaded.save_field_semantics("inst", "db", "users", "age", "年龄")
+        await reloaded.flush()
+        assert (tmp_path / "semantics" / "semantic_index.log").stat().st_size == 0
+        compacted = json.loads((tmp_path / "semantics" / "semantic_index.json").read_text(encoding="utf-8"))
+        assert "年龄" in compacted["semantic_index"]
+
+    @pytest.mark.asyncio
+    async def test_compaction_keeps_other_instances_entries(self, tmp_path):
+        """测试同一目录上的两个实例交替保存与合并，不会丢失对方的索引记录"""
+        base_path = str(tmp_path / "semantics")
+        first = LocalSemanticStorage(base_path)
+        second = LocalSemanticStorage(base_path)
+        await first.get_semantic_index()
+        await second.get_semantic_index()
+
+        await first.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await second.save_field_semantics("inst", "db", "orders", "customer", "客户名称")
+        await first.compact_index()
+        await second.save_field_semantics("inst", "db", "orders", "amount", "金额")
+        await second.compact_index()
+        await first.save_field_semantics("inst", "db", "users", "age", "年龄")
+        await first.compact_index()
+
+        reloaded = await LocalSemanticStorage(base_path).get_semantic_index()
+        for meaning in ("姓名", "客户名称", "金额", "年龄"):
+            assert meaning in reloaded["semantic_index"]
+        assert (tmp_path / "semantics" / "semantic_index.log").stat().st_size == 0
+
+    @pytest.mark.asyncio
+    async def test_search_and_statistics_across_collections(self, storage):
+        """测试跨数据库与集合的搜索与统计"""
+        await storage.save_field_semantics("inst", "db1", "users", "user_name", "用户姓名", confidence=0.6)
+        await storage.save_field_semantics("inst", "db1", "users", "age", "")
+        await storage.save_field_semantics("inst", "db2", "orders", "buyer", "下单用户", confidence=0.9)
+        await storage.flush()
+        (storage._get_instance_path("inst") / "databases" / "empty_db").mkdir()
+
+        results = await storage.search_semantics("inst", "用户")
+        assert [(r["database_name"], r["field_path"]) for r in results] == [
+            ("db2", "buyer"), ("db1", "user_name")]
+        assert [r["field_path"] for r in await storage.search_semantics("inst", "USER")] == ["user_name"]
+
+        stats = await storage.get_instance_statistics("inst")
+        assert stats["total_databases"] == 3
+        assert stats["total_collections"] == 2
+        assert stats["total_fields"] == 3
+        assert stats["semantic_coverage"] == pytest.approx(2 / 3)
+
+    @pytest.mark.asyncio
+    async def test_layout_cache_tracks_saves_and_external_changes(self, storage, monkeypatch):
+        """测试目录结构缓存包含保存的集合，目录 mtime 变化时重新扫描磁盘"""
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        assert (await storage.get_instance_statistics("inst"))["total_collections"] == 1
+
+        import storage.local_semantic_storage as module
+        scans = []
+        original_scan = module._scan_layout
+
+        def counting_scan(databases_path):
+            scans.append(databases_path)
+            return original_scan(databases_path)
+
+        monkeypatch.setattr(module, "_scan_layout", counting_scan)
+        assert (await storage.get_instance_statistics("inst"))["total_collections"] == 1
+        assert scans == []
+
+        # 其他进程新建的集合与数据库
+        storage._get_collection_path("inst", "db", "external").mkdir(parents=True)
+        storage._get_collection_path("inst", "other_db", "logs").mkdir(parents=True)
+        stats = await storage.get_instance_statistics("inst")
+        assert stats["total_collections"] == 3
+        assert stats["total_databases"] == 2
+        assert stats["total_fields"] == 1
+        assert len(scans) == 1
+
+    @pytest.mark.asyncio
+    async def test_search_index_follows_saves(self, tmp_path):
+        """测试搜索索引从磁盘构建，并随后续保存更新"""
+        base_path = str(tmp_path / "semantics")
+        writer = LocalSemanticStorage(base_path)
+        await writer.save_field_semantics("inst", "db", "users", "mobile", "手机号码")
+        await writer.flush()
+
+        storage = LocalSemanticStorage(base_path)
+        assert [r["field_path"] for r in await storage.search_semantics("inst", "手机号")] == ["mobile"]
+
+        await storage.save_field_semantics("inst", "db", "users", "mobile", "联系电话")
+        await storage.batch_save_collection_semantics("inst", "db", "orders", {
+            "phone": {"business_meaning": "收货手机号", "confidence": 0.8}})
+
+        assert [r["field_path"] for r in await storage.search_semantics("inst", "手机号")] == ["phone"]
+        assert [r["field_path"] for r in await storage.search_semantics("inst", "电话")] == ["mobile"]
+        assert await storage.search_semantics("inst", "不存在的词") == []
+
+        await storage.batch_save_collection_semantics("inst", "db", "orders", {})
+        assert await storage.search_semantics("inst", "手机号") == []
+
+    @pytest.mark.asyncio
+    async def test_search_index_refreshes_changed_files(self, storage, monkeypatch):
+        """测试重复搜索不重新解析未变化的文件，外部修改后按修改时间刷新"""
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await storage.save_field_semantics("inst", "db", "orders", "amount", "金额")
+        await storage.flush()
+        assert len(await storage.search_semantics("inst", "姓名")) == 1
+
+        reads = []
+        original_read = storage._read_json_file
+
+        async def counting_read(file_path):
+            reads.append(file_path.parent.name)
+            return await original_read(file_path)
+
+        monkeypatch.setattr(storage, "_read_json_file", counting_read)
+        assert len(await storage.search_semantics("inst", "姓名")) == 1
+        assert reads == []
+
+        fields_file = storage._get_fields_file_path("inst", "db", "users")
+        data = json.loads(fields_file.read_text(encoding="utf-8"))
+        data["fields"]["name"]["business_meaning"] = "用户名称"
+        fields_file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        assert await storage.search_semantics("inst", "姓名") == []
+        assert len(await storage.search_semantics("inst", "名称")) == 1
+        assert reads == ["users"]
+
+    def test_search_index_replaces_collection_by_key_set(self):
+        """测试替换集合只移除该集合的字段，按集合维护的键集合随增删更新"""
+        from storage.local_semantic_storage import _TrigramIndex
+
+        index = _TrigramIndex()
+        index.set_collection("db", "users", {"name": {"business_meaning": "姓名"},
+                                             "age": {"business_meaning": "年龄"}})
+        index.set_collection("db", "orders", {"buyer": {"business_meaning": "下单用户"}})
+        index.set_collection("db", "users", {"name": {"business_meaning": "用户名"}})
+
+        assert set(index.rows) == {("db", "users", "name"), ("db", "orders", "buyer")}
+        assert index.collection_keys[("db", "users")] == {("db", "users", "name")}
+        index.set_collection("db", "orders", {})
+        assert ("db", "orders") not in index.collection_keys
+        assert [key for key, _ in index.search("用户名")] == [("db", "users", "name")]
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_all_dirty_files_in_one_batch(self, storage, monkeypatch):
+        """测试写回时多个文件合并为一次批量写入，失败的文件保留重试"""
+        batches = []
+        original_write = storage._write_files
+
+        async def recording_write(items, **kwargs):
+            batches.append(sorted(file_path.parent.name for file_path, _ in items))
+            return await original_write(items, **kwargs)
+
+        monkeypatch.setattr(storage, "_write_files", recording_write)
+        await asyncio.gather(*(storage.save_field_semantics("inst", "db", collection, "f", "含义")
+                               for collection in ("a", "b", "c")))
+
+        assert batches == [["a", "b", "c"]]
+        for collection in ("a", "b", "c"):
+            assert storage._get_fields_file_path("inst", "db", collection).exists()
+        assert not list(storage._get_collection_path("inst", "db", "a").glob("*.tmp"))
+
+        # 目标路径是目录时替换失败，内容保留在缓冲中
+        blocked = storage._get_fields_file_path("inst", "db", "blocked")
+        blocked.mkdir(parents=True)
+        assert not await storage.save_field_semantics("inst", "db", "blocked", "f", "含义")
+        assert blocked in storage._dirty
+        assert not list(blocked.parent.glob("*.tmp"))
+
+    @pytest.mark.asyncio
+    async def test_save_uses_single_timestamp(self, storage):
+        """测试一次保存中的各时间字段一致"""
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        collection = await storage.get_collection_semantics("inst", "db", "users")
+        field = collection["fields"]["name"]
+        index = await storage.get_semantic_index()
+
+        assert field["created_at"] == field["updated_at"] == collection["last_updated"]
+        assert index["last_updated"] == field["updated_at"]
+
+    @pytest.mark.asyncio
+    async def test_msgpack_file_format_round_trip(self, tmp_path):
+        """测试msgpack格式写入，读取时按内容识别格式兼容已有JSON文件"""
+        pytest.importorskip("msgpack")
+        base_path = str(tmp_path / "semantics")
+        json_storage = LocalSemanticStorage(base_path)
+        await json_storage.save_field_semantics("inst", "db", "legacy", "name", "姓名")
+        await json_storage.flush()
+
+        storage = LocalSemanticStorage(base_path, file_format="msgpack")
+        assert storage.file_format == "msgpack"
+        assert (await storage.get_field_semantics("inst", "db", "legacy", "name"))["business_meaning"] == "姓名"
+
+        await storage.save_field_semantics("inst", "db", "users", "age", "年龄")
+        await storage.flush()
+        content = storage._get_fields_file_path("inst", "db", "users").read_bytes()
+        assert not content.lstrip().startswith(b"{")
+
+        reader = LocalSemanticStorage(base_path)
+        assert (await reader.get_field_semantics("inst", "db", "users", "age"))["business_meaning"] == "年龄"
+        assert LocalSemanticStorage(base_path, file_format="xml").file_format == "json"
+
+    @pytest.mark.asyncio
+    async def test_parse_cache_reuses_unchanged_files(self, storage, monkeypatch):
+        """测试未变化的文件只解析一次，外部修改后重新解析，缓存大小受限"""
+        import storage.local_semantic_storage as module
+
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await storage.flush()
+
+        decodes = []
+        original_decode = module._decode_payload
+
+        def counting_decode(content):
+            decodes.append(len(content))
+            return original_decode(content)
+
+        monkeypatch.setattr(module, "_decode_payload", counting_decode)
+        for _ in range(3):
+            assert (await storage.get_field_semantics("inst", "db", "users", "name"))["business_meaning"] == "姓名"
+        # 写回时已记录解析结果
+        assert decodes == []
+
+        fields_file = storage._get_fields_file_path("inst", "db", "users")
+        data = json.loads(fields_file.read_text(encoding="utf-8"))
+        data["fields"]["name"]["business_meaning"] = "用户姓名"
+        fields_file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        assert (await storage.get_field_semantics("inst", "db", "users", "name"))["business_meaning"] == "用户姓名"
+        assert (await storage.get_field_semantics("inst", "db", "users", "name"))["business_meaning"] == "用户姓名"
+        assert len(decodes) == 1
+
+        storage.parse_cache_size = 2
+        for collection in ("a", "b", "c"):
+            await storage.save_field_semantics("inst", "db", collection, "name", "姓名")
+        assert len(storage._parse_cache) == 2
+
+    @pytest.mark.asyncio
+    async def test_read_data_is_not_modified_by_later_saves(self, storage):
+        """测试读到的共享数据（含缓冲中的内容）不会被之后的保存修改"""
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        fields_file = storage._get_fields_file_path("inst", "db", "users")
+        cached = await storage._read_json_file(fields_file)
+
+        await storage.save_field_semantics("inst", "db", "users", "age", "年龄")
+        assert set(cached["fields"]) == {"name"}
+
+        # 缓冲中的内容同样只读：后续保存写时复制
+        storage._dirty[fields_file] = await storage._read_json_file(fields_file)
+        buffered = await storage._read_json_file(fields_file)
+        assert buffered is storage._dirty[fields_file]
+        await storage.save_field_semantics("inst", "db", "users", "email", "邮箱")
+        assert set(buffered["fields"]) == {"name", "age"}
+        assert set((await storage._read_json_file(fields_file))["fields"]) == {"name", "age", "email"}
+
+        # 外部传入写入的数据不作为解析结果缓存
+        await storage.batch_save_collection_semantics("inst", "db", "users", {})
+        assert fields_file not in storage._parse_cache
+
+    @pytest.mark.asyncio
+    async def test_index_strings_are_interned(self, tmp_path):
+        """测试从文件加载与重放的索引共用驻留字符串"""
+        base_path = str(tmp_path / "semantics")
+        writer = LocalSemanticStorage(base_path)
+        for collection in ("users", "orders"):
+            await writer.save_field_semantics("inst", "db", collection, "created", "创建时间")
+        await writer.compact_index()
+        await writer.save_field_semantics("inst", "db", "items", "created", "创建时间")
+        await writer.flush()
+
+        index = await LocalSemanticStorage(base_path)._ensure_index_loaded()
+        entries = index["semantic_index"]["创建时间"]
+        assert len(entries) == 3
+        assert entries[0]["meaning"] is entries[2]["meaning"]
+        assert entries[0]["instance"] is entries[1]["instance"] is entries[2]["instance"]
+        assert next(iter(index["field_index"])) is sys.intern("created")
+
+    @pytest.mark.asyncio
+    async def test_semantic_index_sees_other_instances_and_is_a_copy(self, tmp_path):
+        """测试获取索引时补齐其他实例追加或合并的更新，返回的索引是独立副本"""
+        base_path = str(tmp_path / "semantics")
+        reader = LocalSemanticStorage(base_path)
+        writer = LocalSemanticStorage(base_path)
+        await reader.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await reader.flush()
+        index = await reader.get_semantic_index()
+        index["semantic_index"].clear()
+        assert "姓名" in (await reader.get_semantic_index())["semantic_index"]
+
+        await writer.save_field_semantics("inst", "db", "orders", "amount", "金额")
+        await writer.flush()
+        assert "金额" in (await reader.get_semantic_index())["semantic_index"]
+
+        await writer.save_field_semantics("inst", "db", "orders", "status", "状态")
+        await writer.compact_index()
+        index = await reader.get_semantic_index()
+        assert {"姓名", "金额", "状态"} <= set(index["semantic_index"])
+
+    @pytest.mark.asyncio
+    async def test_batch_save_appends_index_once(self, tmp_path, monkeypatch):
+        """测试并发批量保存的索引日志记录在写回时一次追加，重放后包含全部字段"""
+        import storage.local_semantic_storage as module
+
+        base_path = str(tmp_path / "semantics")
+        storage = LocalSemanticStorage(base_path)
+        appends = []
+        original_append = module._sync_append
+
+        def counting_append(file_path, payload):
+            appends.append(payload.count(b"\n"))
+            original_append(file_path, payload)
+
+        monkeypatch.setattr(module, "_sync_append", counting_append)
+        fields = {f"f{i}": {"business_meaning": f"含义{i}"} for i in range(20)}
+        fields["unnamed"] = {"business_meaning": ""}
+        assert all(await asyncio.gather(
+            storage.batch_save_collection_semantics("inst", "db", "users", fields),
+            storage.batch_save_collection_semantics("inst", "db", "orders", fields)))
+        assert appends == [40]
+
+        index = await LocalSemanticStorage(base_path).get_semantic_index()
+        assert len(index["field_index"]) == 20
+        assert len(index["field_index"]["f0"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_index_updates_are_deduplicated(self, storage):
+        """测试重复更新不产生重复的索引条目"""
+        for _ in range(3):
+            await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+            await storage.save_field_semantics("inst", "db", "orders", "name", "姓名")
+        await storage.save_field_semantics("inst", "db", "users", "name", "用户名")
+
+        index = await storage.get_semantic_index()
+        assert len(index["semantic_index"]["姓名"]) == 2
+        assert [e["meaning"] for e in index["field_index"]["name"]] == ["用户名", "姓名"]
+
+    @pytest.mark.asyncio
+    async def test_close_persists_index_into_index_file(self, tmp_path):
+        """测试关闭时写回缓冲并把日志合并到索引文件"""
+        base_path = tmp_path / "semantics"
+        storage = LocalSemanticStorage(str(base_path))
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        assert (base_path / "semantic_index.log").stat().st_size > 0
+
+        await storage.close()
+        assert (base_path / "semantic_index.log").stat().st_size == 0
+        on_disk = json.loads((base_path / "semantic_index.json").read_text(encoding="utf-8"))
+        assert "姓名" in on_disk["semantic_index"]
+        assert storage._get_fields_file_path("inst", "db", "users").exists()
+
+    @pytest.mark.asyncio
+    async def test_close_keeps_entries_of_running_instances(self, tmp_path):
+        """测试一个实例关闭时合并索引，不会丢失仍在运行的实例追加的记录"""
+        base_path = tmp_path / "semantics"
+        closing = LocalSemanticStorage(str(base_path))
+        running = LocalSemanticStorage(str(base_path))
+        await closing.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await running.save_field_semantics("inst", "db", "orders", "customer", "客户名称")
+
+        await closing.close()
+        on_disk = json.loads((base_path / "semantic_index.json").read_text(encoding="utf-8"))
+        assert {"姓名", "客户名称"} <= set(on_disk["semantic_index"])
+
+        await running.save_field_semantics("inst", "db", "orders", "amount", "金额")
+        await running.close()
+        reloaded = await LocalSemanticStorage(str(base_path)).get_semantic_index()
+        assert {"姓名", "客户名称", "金额"} <= set(reloaded["semantic_index"])
+
+    @pytest.mark.asyncio
+    async def test_concurrent_file_io_is_bounded(self, storage, monkeypatch):
+        """测试并发文件读取不超过配置的并发上限"""
+        import threading
+        import time
+        import storage.local_semantic_storage as module
+
+        for i in range(30):
+            await storage.batch_save_collection_semantics("inst", "db", f"c{i}", {"f": {"business_meaning": "含义"}})
+        storage._parse_cache.clear()
+
+        active = []
+        peak = []
+        lock = threading.Lock()
+        original_read = module._sync_read_if_changed
+
+        def slow_read(file_path, known):
+            with lock:
+                active.append(file_path)
+                peak.append(len(active))
+            time.sleep(0.01)
+            try:
+                return original_read(file_path, known)
+            finally:
+                with lock:
+                    active.remove(file_path)
+
+        monkeypatch.setattr(module, "_sync_read_if_changed", slow_read)
+        stats = await storage.get_instance_statistics("inst")
+
+        assert stats["total_fields"] == 30
+        assert max(peak) <= 10
+
+    @pytest.mark.asyncio
+    async def test_index_rebuilt_after_non_durable_compaction(self, tmp_path):
+        """测试运行期合并不落盘并留下标记，异常退出后从字段文件重建索引"""
+        base_path = tmp_path / "semantics"
+        storage = LocalSemanticStorage(str(base_path))
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await storage.save_field_semantics("inst", "db2", "orders", "amount", "金额")
+        await storage.flush()
+        await storage.compact_index()
+        assert (base_path / ".index.dirty").exists()
+
+        # 模拟未落盘的索引文件在崩溃后损坏
+        (base_path / "semantic_index.json").write_bytes(b"")
+        recovered = LocalSemanticStorage(str(base_path))
+        index = await recovered.get_semantic_index()
+        assert set(index["semantic_index"]) == {"姓名", "金额"}
+        assert not (base_path / ".index.dirty").exists()
+
+        await recovered.compact_index()
+        await recovered.close()
+        assert not (base_path / ".index.dirty").exists()
+
+    def test_instance_path_is_memoized(self, tmp_path, monkeypatch):
+        """测试实例目录路径按实例名缓存，超出上限时淘汰最早的条目"""
+        import storage.local_semantic_storage as module
+
+        monkeypatch.setattr(module, "_INSTANCE_PATH_CACHE_SIZE", 2)
+        storage = LocalSemanticStorage(str(tmp_path / "semantics"))
+        path = storage._get_instance_path("a")
+
+        assert path == tmp_path / "semantics" / "instances" / "a"
+        assert storage._get_instance_path("a") is path
+        storage._get_instance_path("b")
+        storage._get_instance_path("c")
+        assert list(storage._instance_paths) == ["b", "c"]
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""工作流状态内存存储单元测试"""
+
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from storage.memory_storage import MemoryWorkflowStateStorage
+from utils.workflow_state import WorkflowState, WorkflowStage
+
+
+def make_state(session_id: str) -> WorkflowState:
+    """创建测试用工作流状态"""
+    return WorkflowState(current_stage=WorkflowStage.INIT, session_id=session_id)
+
+
+class TestMemoryWorkflowStateStorage:
+    """内存工作流状态存储测试类"""
+
+    @pytest.mark.asyncio
+    async def test_crud_and_metadata(self):
+        """测试保存、加载、删除与元数据计数"""
+        storage = MemoryWorkflowStateStorage()
+        state = make_state("s1")
+        assert await storage.save(state)
+        assert await storage.save(state)
+
+        assert await storage.load("s1") is state
+        assert await storage.load("missing") is None
+        assert await storage.exists("s1")
+
+        sessions = await storage.list_sessions()
+        assert [(s["session_id"], s["save_count"], s["load_count"]) for s in sessions] == [("s1", 2, 1)]
+
+        assert await storage.delete("s1")
+        assert not await storage.delete("s1")
+        assert not await storage.exists("s1")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_access_does_not_serialize(self):
+        """测试大量并发读写结果一致"""
+        storage = MemoryWorkflowStateStorage()
+        await asyncio.gather(*(storage.save(make_state(f"s{i}")) for i in range(100)))
+        loaded = await asyncio.gather(*(storage.load(f"s{i}") for i in range(100)))
+
+        assert [s.session_id for s in loaded] == [f"s{i}" for i in range(100)]
+        assert (await storage.get_stats())["session_count"] == 100
+
+    @pytest.mark.asyncio
+    async def test_cleanup_removes_only_expired_sessions(self):
+        """测试清理只删除最近活动早于截止时间的会话"""
+        storage = MemoryWorkflowStateStorage()
+        long_ago = datetime.now() - timedelta(days=40)
+        for session_id in ("old", "reloaded", "fresh", "deleted"):
+            await storage.save(make_state(session_id))
+            storage._touch(session_id, long_ago)
+        await storage.save(make_state("fresh"))
+        await storage.load("reloaded")
+        await storage.delete("deleted")
+
+        assert await storage.cleanup(days=30) == 1
+        assert not await storage.exists("old")
+        assert await storage.exists("reloaded")
+        assert await storage.exists("fresh")
+        assert await storage.cleanup(days=30) == 0
+
+    @pytest.mark.asyncio
+    async def test_memory_estimate_is_maintained_incrementally(self):
+        """测试内存估算随保存、覆盖、删除与清理增量更新，保存时不序列化状态"""
+        storage = MemoryWorkflowStateStorage()
+        states = [make_state(f"s{i}") for i in range(3)]
+        for state in states:
+            for _ in range(5):
+                await storage.save(state)
+        assert storage._sizes == {}
+
+        def expected():
+            return sum(len(str(s.to_dict())) for s in storage._storage.values())
+
+        assert (await storage.get_stats())["memory_usage_estimate"] == expected()
+
+        states[0].query_description = "查询最近一周的订单" * 10
+        await storage.save(states[0])
+        await storage.delete("s1")
+        assert (await storage.get_stats())["memory_usage_estimate"] == expected()
+
+        storage._touch("s2", datetime.now() - timedelta(days=40))
+        await storage.cleanup(days=30)
+        assert (await storage.get_stats())["memory_usage_estimate"] == expected()
+
+    @pytest.mark.asyncio
+    async def test_load_returns_reference_and_load_copy_isolates(self):
+        """测试load返回存储对象本身，load_copy返回独立副本"""
+        storage = MemoryWorkflowStateStorage()
+        state = make_state("s1")
+        state.stage_data["filter"] = {"status": "paid"}
+        await storage.save(state)
+
+        copy = await storage.load_copy("s1")
+        assert copy is not state
+        assert copy.session_id == "s1"
+        assert copy.stage_data == {"filter": {"status": "paid"}}
+
+        copy.stage_data["filter"]["status"] = "refunded"
+        assert (await storage.load("s1")).stage_data["filter"]["status"] == "paid"
+        assert await storage.load_copy("missing") is None
+        assert (await storage.list_sessions())[0]["load_count"] == 2
@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""语义文件管理器单元测试"""
+
+import asyncio
+import pytest
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from storage.semantic_file_manager import TimedLRUCache, TimedValueLRUCache, TimedClockCache, _scan_fields_files
+
+
+@pytest.fixture(params=[TimedLRUCache, TimedValueLRUCache, TimedClockCache],
+                ids=["lru", "vlru", "clock"])
+def cache_cls(request):
+    """分别覆盖LRU、v-LRU与CLOCK缓存实现"""
+    return request.param
+
+
+class TestTimedCache:
+    """带TTL缓存测试类"""
+
+    @pytest.mark.asyncio
+    async def test_get_set_invalidate(self, cache_cls):
+        """测试读写与按模式失效"""
+        cache = cache_cls(maxsize=10, ttl=60)
+        await cache.set("inst1/a", 1)
+        await cache.set("inst1/b", 2)
+        await cache.set("inst2/a", 3)
+
+        assert await cache.get("inst1/a") == 1
+        assert await cache.get("missing") is None
+
+        await cache.invalidate("inst1")
+        assert await cache.get("inst1/a") is None
+        assert await cache.get("inst2/a") == 3
+
+        await cache.invalidate()
+        assert (await cache.get_stats())["total_entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_expired_entries(self, cache_cls):
+        """测试过期条目不返回且可被清理"""
+        cache = cache_cls(maxsize=10, ttl=0)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+
+        assert (await cache.get_stats())["expired_entries"] == 2
+        assert await cache.get("a") is None
+        assert await cache.cleanup_expired() == 1
+        assert (await cache.get_stats())["total_entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_capacity_bound(self, cache_cls):
+        """测试满载时淘汰，最近访问的条目保留"""
+        cache = cache_cls(maxsize=3, ttl=60)
+        for key in ("a", "b", "c"):
+            await cache.set(key, key)
+
+        assert await cache.get("a") == "a"
+        await cache.set("d", "d")
+
+        stats = await cache.get_stats()
+        assert stats["total_entries"] == 3
+        assert await cache.get("a") == "a"
+        assert await cache.get("d") == "d"
+
+
+class TestTimedValueLRUCache:
+    """价值感知LRU缓存测试类"""
+
+    @pytest.mark.asyncio
+    async def test_high_value_entries_survive_bulk_inserts(self):
+        """测试高置信度与常用条目在批量写入时保留"""
+        cache = TimedValueLRUCache(maxsize=10, ttl=60, window_ratio=0.3)
+        await cache.set("important", {"confidence": 0.95})
+        await cache.set("hot", {"confidence": 0.1})
+        for _ in range(3):
+            await cache.get("hot")
+
+        for i in range(20):
+            await cache.set(f"bulk{i}", {"confidence": 0.2})
+
+        assert await cache.get("important") == {"confidence": 0.95}
+        assert await cache.get("hot") == {"confidence": 0.1}
+        assert (await cache.get_stats())["total_entries"] == 10
+        assert set(cache.hits) <= set(cache.cache)
+
+
+class TestTimedLRUCache:
+    """LRU缓存测试类"""
+
+    def test_cache_usable_from_successive_event_loops(self, cache_cls):
+        """测试同一缓存在多个事件循环中使用时锁不会跨循环复用"""
+        cache = cache_cls(maxsize=10, ttl=60)
+
+        async def contend():
+            async with cache._lock:
+                # 让失效操作在锁上等待，使锁与当前事件循环绑定
+                task = asyncio.ensure_future(cache.invalidate())
+                await asyncio.sleep(0)
+            await task
+            await cache.set("inst1/a", 1)
+            return await cache.get("inst1/a")
+
+        assert asyncio.run(contend()) == 1
+        assert asyncio.run(contend()) == 1
+
+    @pytest.mark.asyncio
+    async def test_get_does_not_wait_for_lock(self):
+        """测试命中路径不等待写锁"""
+        cache = TimedLRUCache(maxsize=10, ttl=60)
+        await cache.set("a", 1)
+
+        async with cache._lock:
+            assert await cache.get("a") == 1
+            assert await cache.get("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_sets_do_not_queue_on_lock(self):
+        """测试写入与过期清理不等待锁，并发写入后容量仍受限"""
+        cache = TimedLRUCache(maxsize=5, ttl=60)
+        async with cache._lock:
+            await asyncio.gather(*(cache.set(f"k{i}", i) for i in range(20)))
+            assert await cache.cleanup_expired() == 0
+
+        assert list(cache.cache) == [f"k{i}" for i in range(15, 20)]
+
+    @pytest.mark.asyncio
+    async def test_overwrite_full_cache_keeps_other_entries(self):
+        """测试满载时覆盖已有键不触发淘汰，且该键成为最近使用"""
+        cache = TimedLRUCache(maxsize=3, ttl=60)
+        for key in ("a", "b", "c"):
+            await cache.set(key, key)
+
+        await cache.set("a", "A")
+
+        assert list(cache.cache) == ["b", "c", "a"]
+        assert await cache.get("a") == "A"
+
+    @pytest.mark.asyncio
+    async def test_expiry_heap_skips_overwritten_entries(self, monkeypatch):
+        """测试过期堆只清理当前条目，覆盖写入的旧记录被跳过"""
+        import storage.semantic_file_manager as module
+
+        now = [0.0]
+        monkeypatch.setattr(module.time, "time", lambda: now[0])
+        cache = TimedLRUCache(maxsize=10, ttl=60)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        now[0] = 30.0
+        await cache.set("a", 3)
+        await cache.set("c", 4)
+
+        now[0] = 70.0
+        assert (await cache.get_stats())["expired_entries"] == 1
+        assert await cache.cleanup_expired() == 1
+        assert list(cache.cache) == ["a", "c"]
+        assert await cache.get("a") == 3
+
+        now[0] = 100.0
+        assert (await cache.get_stats())["expired_entries"] == 2
+        assert await cache.cleanup_expired() == 2
+        assert not cache.cache
+
+
+class TestSemanticFileManager:
+    """语义文件管理器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_save_file_atomic_without_lock_file(self, tmp_path, monkeypatch):
+        """测试默认保存不创建锁文件，跨进程模式使用文件锁"""
+        import storage.semantic_file_manager as module
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager
+
+        locks = []
+        original_enter = module.FileLocker.__aenter__
+
+        async def recording_enter(self):
+            locks.append(self.file_path.name)
+            return await original_enter(self)
+
+        monkeypatch.setattr(module.FileLocker, "__aenter__", recording_enter)
+        manager = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "semantics")))
+        target = tmp_path / "semantics" / "instances" / "inst" / "metadata.json"
+
+        assert await manager.save_file_atomic(target, {"v": 1})
+        assert locks == []
+        assert await manager.load_file_with_cache(target) == {"v": 1}
+
+        assert await manager.save_file_atomic(target, {"v": 2}, cross_process=True)
+        assert locks == ["metadata.json"]
+        assert await manager.load_file_with_cache(target) == {"v": 2}
+
+    @pytest.mark.asyncio
+    async def test_preload_instance_data_loads_all_files(self, tmp_path):
+        """测试预加载把元数据与所有字段文件放入缓存"""
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager
+
+        storage = LocalSemanticStorage(str(tmp_path / "semantics"))
+        for db in ("db1", "db2"):
+            for collection in ("users", "orders"):
+                await storage.save_field_semantics("inst", db, collection, "f", "含义")
+        await storage.flush()
+        await storage.save_instance_metadata("inst", {"name": "inst"})
+
+        manager = SemanticFileManager(storage)
+        await manager.preload_instance_data("inst")
+
+        assert (await manager.get_cache_stats())["total_entries"] == 5
+        fields_file = storage._get_fields_file_path("inst", "db2", "orders")
+        assert (await manager.cache.get(str(fields_file)))["fields"]["f"]["business_meaning"] == "含义"
+
+        await manager.preload_instance_data("missing")
+        assert (await manager.get_cache_stats())["total_entries"] == 5
+
+    def test_scan_fields_files_skips_non_collections(self, tmp_path):
+        """测试扫描只返回存在字段文件的集合目录，忽略普通文件与缺失目录"""
+        databases = tmp_path / "databases"
+        (databases / "db1" / "collections" / "users").mkdir(parents=True)
+        (databases / "db1" / "collections" / "users" / "fields.json").write_text("{}")
+        (databases / "db1" / "collections" / "empty").mkdir()
+        (databases / "db1" / "collections" / "stray.json").write_text("{}")
+        (databases / "db2").mkdir()
+        (databases / "notes.txt").write_text("")
+
+        assert _scan_fields_files(databases) == [databases / "db1" / "collections" / "users" / "fields.json"]
+        assert _scan_fields_files(tmp_path / "missing") == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("use_zstd", [True, False], ids=["zstd", "gzip"])
+    async def test_backup_and_restore_round_trip(self, tmp_path, monkeypatch, use_zstd):
+        """测试zstd与gzip备份归档均可恢复出原有字段语义"""
+        import shutil
+        import storage.semantic_file_manager as module
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager
+
+        if use_zstd:
+            if module.zstandard is None:
+                pytest.skip("未安装zstandard")
+        else:
+            monkeypatch.setattr(module, "zstandard", None)
+
+        storage = LocalSemanticStorage(str(tmp_path / "semantics"))
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await storage.flush()
+        manager = SemanticFileManager(storage)
+
+        assert await manager.backup_semantic_data("inst", tmp_path / "backups")
+        backup_file, = (tmp_path / "backups").iterdir()
+        assert backup_file.name.endswith(".tar.zst" if use_zstd else ".tar.gz")
+
+        shutil.rmtree(storage._get_instance_path("inst"))
+        assert await manager.restore_semantic_data(backup_file, "inst")
+        fields = await storage._read_json_file(storage._get_fields_file_path("inst", "db", "users"))
+        assert fields["fields"]["name"]["business_meaning"] == "姓名"
+
+    @pytest.mark.asyncio
+    async def test_optimize_storage_strips_empty_entries(self, tmp_path):
+        """测试存储优化移除空示例与空分析结果"""
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager
+
+        storage = LocalSemanticStorage(str(tmp_path / "semantics"))
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await storage.save_field_semantics("inst", "db", "orders", "amount", "金额", examples=["1"],
+                                           analysis_result={"kind": "money"})
+        await storage.flush()
+        manager = SemanticFileManager(storage)
+
+        stats = await manager.optimize_storage("inst")
+
+        assert stats["files_processed"] == 2
+        assert stats["files_optimized"] == 1
+        users = await storage._read_json_file(storage._get_fields_file_path("inst", "db", "users"))
+        assert "examples" not in users["fields"]["name"]
+        assert "analysis_result" not in users["fields"]["name"]
+
+    @pytest.mark.asyncio
+    async def test_restore_over_existing_instance(self, tmp_path):
+        """测试恢复时已有实例目录被移到.backup后再解包"""
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager
+
+        storage = LocalSemanticStorage(str(tmp_path / "semantics"))
+        await storage.save_field_semantics("inst", "db", "users", "name", "姓名")
+        await storage.flush()
+        manager = SemanticFileManager(storage)
+        assert await manager.backup_semantic_data("inst", tmp_path / "backups")
+        backup_file, = (tmp_path / "backups").iterdir()
+
+        assert await manager.restore_semantic_data(backup_file, "inst")
+        instance_path = storage._get_instance_path("inst")
+        assert (instance_path / "databases" / "db" / "collections" / "users" / "fields.json").exists()
+        assert instance_path.with_suffix(".backup").is_dir()
+
+    @pytest.mark.asyncio
+    async def test_cross_process_lock_fd_is_reused(self, tmp_path):
+        """测试跨进程保存复用锁文件描述符，锁文件保留，同一进程内的持有者依次获得锁"""
+        import os
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager, FileLocker
+
+        manager = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "semantics")))
+        target = tmp_path / "semantics" / "instances" / "inst" / "metadata.json"
+
+        assert await manager.save_file_atomic(target, {"v": 1}, cross_process=True)
+        fd = manager._lock_fds[target].fd
+        assert manager._lock_fds[target].users == 0
+        assert target.with_suffix(".lock").exists()
+
+        assert await manager.save_file_atomic(target, {"v": 2}, cross_process=True)
+        assert manager._lock_fds[target].fd == fd
+
+        order = []
+
+        async def hold(name):
+            async with FileLocker(target, manager._lock_fds):
+                order.append(f"{name}+")
+                await asyncio.sleep(0.01)
+                order.append(f"{name}-")
+
+        await asyncio.gather(hold("a"), hold("b"))
+        assert order == ["a+", "a-", "b+", "b-"]
+        assert manager._lock_fds[target].users == 0
+
+        await manager.close()
+        assert not manager._lock_fds
+        with pytest.raises(OSError):
+            os.fstat(fd)
+
+    @pytest.mark.asyncio
+    async def test_idle_lock_fds_are_closed_past_limit(self, tmp_path):
+        """测试锁文件描述符表超出容量时关闭最久未用的空闲描述符，持有中的保留"""
+        import os
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager, FileLocker
+
+        manager = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "semantics")))
+        manager.max_lock_fds = 2
+        targets = [tmp_path / "locks" / f"{name}.json" for name in ("a", "b", "c", "d")]
+
+        async with FileLocker(targets[0], manager._lock_fds, manager.max_lock_fds):
+            held_fd = manager._lock_fds[targets[0]].fd
+            for target in targets[1:3]:
+                assert await manager.save_file_atomic(target, {"v": 1}, cross_process=True)
+            assert list(manager._lock_fds) == [targets[0], targets[2]]
+
+        # 释放后成为最久未用的空闲描述符
+        assert await manager.save_file_atomic(targets[3], {"v": 1}, cross_process=True)
+        assert list(manager._lock_fds) == [targets[2], targets[3]]
+        with pytest.raises(OSError):
+            os.fstat(held_fd)
+
+    @pytest.mark.asyncio
+    async def test_managers_share_cache_per_base_path(self, tmp_path):
+        """测试同一存储目录上的管理器共享缓存，不同目录或关闭共享时各自独立"""
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager
+
+        first = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "a")))
+        second = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "a")))
+        other = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "b")))
+        private = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "a")), shared_cache=False)
+
+        assert first.cache is second.cache
+        assert first.cache is not other.cache
+        assert first.cache is not private.cache
+
+        target = tmp_path / "a" / "instances" / "inst" / "metadata.json"
+        assert await first.save_file_atomic(target, {"v": 1})
+        assert await second.cache.get(str(target)) == {"v": 1}
+
+    def test_shared_cache_registry_releases_unused_caches(self, tmp_path):
+        """测试共享缓存登记表不持有缓存，管理器全部回收后条目移除"""
+        import gc
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager, _shared_caches
+
+        manager = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "released")))
+        key = (str((tmp_path / "released").resolve()), "lru", 1000, 300)
+        assert _shared_caches[key] is manager.cache
+
+        del manager
+        gc.collect()
+        assert key not in _shared_caches
+
+    @pytest.mark.asyncio
+    async def test_cache_updates_happen_outside_semaphore(self, tmp_path):
+        """测试保存与加载后的缓存更新不占用操作信号量"""
+        from storage.local_semantic_storage import LocalSemanticStorage
+        from storage.semantic_file_manager import SemanticFileManager
+
+        manager = SemanticFileManager(LocalSemanticStorage(str(tmp_path / "semantics")), shared_cache=False)
+        held = []
+        original_set = manager.cache.set
+
+        async def recording_set(key, value):
+            held.append(manager._operation_semaphore._value)
+            await original_set(key, value)
+
+        manager.cache.set = recording_set
+        target = tmp_path / "semantics" / "instances" / "inst" / "metadata.json"
+        assert await manager.save_file_atomic(target, {"v": 1})
+        await manager.cache.invalidate()
+        assert await manager.load_file_with_cache(target) == {"v": 1}
+
+        assert held == [10, 10]
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""语义存储工厂单元测试"""
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from storage.semantic_storage_factory import SemanticStorageFactory
+from storage.semantic_storage_interface import SemanticStorageInterface, SemanticStorageType
+
+
+class TestSemanticStorageFactory:
+    """语义存储工厂测试类"""
+
+    def test_implementations_discovered_once_on_first_use(self, monkeypatch):
+        """测试存储实现在首次使用时发现，导入模块与创建工厂不扫描，之后不再重复扫描"""
+        monkeypatch.setattr(SemanticStorageFactory, "_storage_implementations", {})
+        monkeypatch.setattr(SemanticStorageFactory, "_discovered", False)
+        calls = []
+        original_discover = SemanticStorageFactory._discover_storage_implementations.__func__
+
+        def counting_discover(cls):
+            calls.append(cls)
+            original_discover(cls)
+
+        monkeypatch.setattr(SemanticStorageFactory, "_discover_storage_implementations",
+                            classmethod(counting_discover))
+        factory = SemanticStorageFactory()
+        assert calls == []
+
+        assert SemanticStorageType.FILE in factory.get_available_storage_types()
+        assert SemanticStorageType.FILE in SemanticStorageFactory().get_available_storage_types()
+        assert len(calls) == 1
+
+    def test_try_import_storage_uses_storage_class(self, monkeypatch):
+        """测试按模块声明的STORAGE_CLASS注册实现，未声明且模块中未定义实现类时不注册"""
+        import types
+
+        class DummyStorage(SemanticStorageInterface):
+            pass
+
+        declared = types.ModuleType("storage.semantic_dummy_storage")
+        declared.STORAGE_CLASS = DummyStorage
+        undeclared = types.ModuleType("storage.semantic_plain_storage")
+        undeclared.DummyStorage = DummyStorage
+        monkeypatch.setitem(sys.modules, declared.__name__, declared)
+        monkeypatch.setitem(sys.modules, undeclared.__name__, undeclared)
+        monkeypatch.setattr(SemanticStorageFactory, "_storage_implementations", {})
+
+        SemanticStorageFactory._try_import_storage("semantic_plain_storage", SemanticStorageType.REDIS)
+        assert SemanticStorageFactory._storage_implementations == {}
+
+        SemanticStorageFactory._try_import_storage("semantic_dummy_storage", SemanticStorageType.MEMORY)
+        assert SemanticStorageFactory._storage_implementations == {SemanticStorageType.MEMORY: DummyStorage}
+
+    def test_try_import_storage_falls_back_to_subclass_scan(self, monkeypatch):
+        """测试未声明STORAGE_CLASS时注册模块中定义的唯一具体实现类，不唯一时不注册"""
+        import types
+
+        def make_storage(name, module_name):
+            methods = {method: (lambda self, *args, **kwargs: None)
+                       for method in SemanticStorageInterface.__abstractmethods__}
+            return type(name, (SemanticStorageInterface,), dict(methods, __module__=module_name))
+
+        scanned = types.ModuleType("storage.semantic_scanned_storage")
+        scanned.ScannedStorage = make_storage("ScannedStorage", scanned.__name__)
+        scanned.SemanticStorageInterface = SemanticStorageInterface
+        ambiguous = types.ModuleType("storage.semantic_ambiguous_storage")
+        ambiguous.First = make_storage("First", ambiguous.__name__)
+        ambiguous.Second = make_storage("Second", ambiguous.__name__)
+        monkeypatch.setitem(sys.modules, scanned.__name__, scanned)
+        monkeypatch.setitem(sys.modules, ambiguous.__name__, ambiguous)
+        monkeypatch.setattr(SemanticStorageFactory, "_storage_implementations", {})
+
+        SemanticStorageFactory._try_import_storage("semantic_ambiguous_storage", SemanticStorageType.REDIS)
+        assert SemanticStorageFactory._storage_implementations == {}
+
+        SemanticStorageFactory._try_import_storage("semantic_scanned_storage", SemanticStorageType.MEMORY)
+        assert SemanticStorageFactory._storage_implementations == {
+            SemanticStorageType.MEMORY: scanned.ScannedStorage}
+
+    def test_in_tree_backend_declares_storage_class(self):
+        """测试内置文件存储声明了STORAGE_CLASS"""
+        import storage.enhanced_local_semantic_storage as module
+
+        assert module.STORAGE_CLASS is module.EnhancedLocalSemanticStorage